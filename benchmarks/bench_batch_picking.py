@@ -0,0 +1,43 @@
+"""
+Batch pixel picking: a per-point get_hex_by_pixel_coord loop against the
+array-based HexagonGridImpl.get_coords_by_pixel_arrays. Requires NumPy.
+
+Usage: python benchmarks/bench_batch_picking.py [points] [grid size]
+"""
+import sys
+import time
+
+import numpy
+
+from mixite.builder import GridControlBuilder
+from mixite.coord import CubeCoordinate
+
+
+def main(points: int, size: int):
+    grid_control = GridControlBuilder().build_rectangle(CubeCoordinate.POINTY_TOP, 10.0, size, size)
+    grid = grid_control.hex_grid
+    grid_data = grid_control.grid_data
+
+    rng = numpy.random.default_rng(0)
+    pixels_x = rng.uniform(0, size * grid_data.hexagonWidth, points)
+    pixels_y = rng.uniform(0, size * grid_data.hexagonHeight, points)
+
+    start = time.perf_counter()
+    for x, y in zip(pixels_x.tolist(), pixels_y.tolist()):
+        grid.get_hex_by_pixel_coord(x, y)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    grid.get_coords_by_pixel_arrays(pixels_x, pixels_y)
+    batch_time = time.perf_counter() - start
+
+    print("{} points on a {}x{} grid".format(points, size, size))
+    print("per-point loop: {:8.3f} s".format(loop_time))
+    print("batch arrays:   {:8.3f} s".format(batch_time))
+    print("speedup:        {:8.1f}x".format(loop_time / batch_time))
+
+
+if __name__ == '__main__':
+    arguments = [int(arg) for arg in sys.argv[1:]]
+    main(arguments[0] if len(arguments) > 0 else 1000000,
+         arguments[1] if len(arguments) > 1 else 100)
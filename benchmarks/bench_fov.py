@@ -0,0 +1,63 @@
+"""
+Field of view for many units: HexagonGridCalculator.calc_field_of_view against
+calling is_visible for every hexagon in range, with and without the
+line-of-sight cache, on a rectangle with random opaque hexagons.
+
+Usage: python benchmarks/bench_fov.py [grid size] [units] [radius]
+"""
+import random
+import sys
+import time
+
+from mixite.builder import GridControlBuilder
+from mixite.coord import CubeCoordinate
+from mixite.location_metadata import SatelliteData
+
+OPAQUE_DENSITY = 0.15
+
+
+def main(size: int, units: int, radius: int):
+    grid_control = GridControlBuilder().build_rectangle(CubeCoordinate.POINTY_TOP, 10.0, size, size)
+    calculator = grid_control.calculator
+    hexagons = list(grid_control.hex_grid.storage.iter_data())
+    rng = random.Random(42)
+    for hexagon in hexagons:
+        if rng.random() < OPAQUE_DENSITY:
+            satellite = SatelliteData()
+            satellite.isOpaque = True
+            hexagon.set_satellite(satellite)
+    origins = [rng.choice(hexagons) for _ in range(units)]
+
+    start = time.perf_counter()
+    shadowcast_count = sum(len(calculator.calc_field_of_view(origin, radius)) for origin in origins)
+    shadowcast = time.perf_counter() - start
+
+    start = time.perf_counter()
+    line_count = sum(sum(1 for target in calculator.iter_move_range_from(origin, radius)
+                         if calculator.is_visible(origin, target)) for origin in origins)
+    lines = time.perf_counter() - start
+
+    # The same queries again with the line-of-sight cache: the first tick fills it, the
+    # second one is served from it.
+    cache = calculator.enable_los_cache(1 << 20)
+    cached_ticks = []
+    for _ in range(2):
+        start = time.perf_counter()
+        for origin in origins:
+            for target in calculator.iter_move_range_from(origin, radius):
+                calculator.is_visible(origin, target)
+        cached_ticks.append(time.perf_counter() - start)
+
+    print("{} units, radius {}".format(units, radius))
+    print("shadowcasting: {:8.1f} ms per tick, {:.1f} visible per unit".format(shadowcast * 1000,
+                                                                              shadowcast_count / units))
+    print("is_visible:    {:8.1f} ms per tick, {:.1f} visible per unit".format(lines * 1000, line_count / units))
+    print("cached:        {:8.1f} ms first tick, {:.1f} ms second tick ({} hits, {} misses)".format(
+        cached_ticks[0] * 1000, cached_ticks[1] * 1000, cache.hits, cache.misses))
+
+
+if __name__ == '__main__':
+    arguments = [int(arg) for arg in sys.argv[1:]]
+    main(arguments[0] if len(arguments) > 0 else 300,
+         arguments[1] if len(arguments) > 1 else 200,
+         arguments[2] if len(arguments) > 2 else 10)
@@ -0,0 +1,69 @@
+"""
+A* pathfinding (HexagonGridCalculator.find_path) and budgeted reachable sets
+(calc_reachable_from) on a large rectangle with random impassable hexagons at
+several obstacle densities. Passing 1 as the third argument keeps the satellites
+in columns (HexagonGridImpl.enable_satellite_columns) instead of objects.
+
+Usage: python benchmarks/bench_pathfinding.py [grid size] [queries per density] [columns]
+"""
+import random
+import sys
+import time
+
+from mixite.builder import GridControlBuilder
+from mixite.coord import CubeCoordinate
+from mixite.location_metadata import SatelliteData
+
+DENSITIES = [0.1, 0.2, 0.3, 0.4]
+REACH_BUDGET = 12
+
+
+def main(size: int, queries: int, columns: bool):
+    start = time.perf_counter()
+    grid_control = GridControlBuilder().build_rectangle(CubeCoordinate.POINTY_TOP, 10.0, size, size)
+    print("built {0}x{0} grid in {1:.2f} s".format(size, time.perf_counter() - start))
+    grid = grid_control.hex_grid
+    calculator = grid_control.calculator
+    hexagons = list(grid.storage.iter_data())
+    if columns:
+        grid.enable_satellite_columns()
+
+    print("{:>8} {:>8} {:>12} {:>12} {:>12} {:>12}".format("density", "found", "avg ms", "avg length",
+                                                          "reach ms", "avg reached"))
+    for density in DENSITIES:
+        rng = random.Random(int(density * 100))
+        for hexagon in hexagons:
+            if rng.random() < density:
+                satellite = SatelliteData()
+                satellite.isPassable = False
+                hexagon.set_satellite(satellite)
+            else:
+                hexagon.clear_satellite()
+
+        passable = [hexagon for hexagon in hexagons if hexagon.get_satellite() is None]
+        found = 0
+        total_length = 0
+        start = time.perf_counter()
+        for _ in range(queries):
+            # Every passable hexagon costs 1, so the heuristic bound is known up front.
+            path = calculator.find_path(rng.choice(passable), rng.choice(passable), 1.0)
+            if path:
+                found += 1
+                total_length += len(path)
+        elapsed = time.perf_counter() - start
+
+        reached = 0
+        start = time.perf_counter()
+        for _ in range(queries):
+            reached += len(calculator.calc_reachable_from(rng.choice(passable), REACH_BUDGET))
+        reach_elapsed = time.perf_counter() - start
+        print("{:>8.0%} {:>8} {:>12.1f} {:>12.1f} {:>12.2f} {:>12.1f}".format(
+            density, "{}/{}".format(found, queries), elapsed / queries * 1000, total_length / max(found, 1),
+            reach_elapsed / queries * 1000, reached / queries))
+
+
+if __name__ == '__main__':
+    arguments = [int(arg) for arg in sys.argv[1:]]
+    main(arguments[0] if len(arguments) > 0 else 1000,
+         arguments[1] if len(arguments) > 1 else 10,
+         len(arguments) > 2 and arguments[2] == 1)
@@ -0,0 +1,50 @@
+"""
+Pixel picking latency across grid sizes.
+
+Latency should stay flat as the grid grows, since picking resolves the
+estimated cell through the storage's hashed lookup. Both the nearest-center
+picking and the closed-form exact picking are measured.
+
+Usage: python benchmarks/bench_picking.py [size ...]
+"""
+import random
+import sys
+import time
+
+from mixite.builder import GridControlBuilder
+from mixite.coord import CubeCoordinate
+
+DEFAULT_SIZES = [10, 100, 500, 1000]
+QUERIES = 20000
+
+
+def time_picks(pick, pixels) -> float:
+    start = time.perf_counter()
+    for x, y in pixels:
+        pick(x, y)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(pixels) * 1e6
+
+
+def bench_size(size: int) -> tuple[float, float]:
+    grid_control = GridControlBuilder().build_rectangle(CubeCoordinate.POINTY_TOP, 10.0, size, size)
+    grid = grid_control.hex_grid
+    grid_data = grid_control.grid_data
+    max_x = size * grid_data.hexagonWidth
+    max_y = size * grid_data.hexagonHeight
+
+    rng = random.Random(size)
+    pixels = [(rng.uniform(0, max_x), rng.uniform(0, max_y)) for _ in range(QUERIES)]
+
+    return time_picks(grid.get_hex_by_pixel_coord, pixels), time_picks(grid.get_hex_by_pixel_coord_exact, pixels)
+
+
+def main(sizes: list[int]):
+    print("{:>10} {:>16} {:>16}".format("grid", "nearest us/pick", "exact us/pick"))
+    for size in sizes:
+        nearest, exact = bench_size(size)
+        print("{:>10} {:>16.2f} {:>16.2f}".format("{0}x{0}".format(size), nearest, exact))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,60 @@
+"""
+Saving, loading and mapping a rectangle with random satellites through
+mixite.snapshot, compared with building the same grid through GridControlBuilder.
+Also times the first query on each, which builds the index unless the snapshot
+carries it.
+
+Usage: python benchmarks/bench_snapshot.py [grid size] [snapshot path]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from mixite.builder import GridControlBuilder
+from mixite.coord import CubeCoordinate
+from mixite.location_metadata import SatelliteData
+from mixite.snapshot import load_snapshot, map_snapshot, save_snapshot
+
+SATELLITE_DENSITY = 0.2
+
+
+def main(size: int, path: str):
+    start = time.perf_counter()
+    grid_control = GridControlBuilder().build_rectangle(CubeCoordinate.POINTY_TOP, 10.0, size, size)
+    print("built {0}x{0} grid in {1:.2f} s".format(size, time.perf_counter() - start))
+    grid = grid_control.hex_grid
+    grid.enable_satellite_columns()
+    rng = random.Random(5)
+    for hexagon in grid.storage.iter_data():
+        if rng.random() < SATELLITE_DENSITY:
+            satellite = SatelliteData()
+            satellite.isPassable = rng.random() < 0.5
+            satellite.movementCost = 2.0
+            hexagon.set_satellite(satellite)
+
+    for include_index in (False, True):
+        start = time.perf_counter()
+        save_snapshot(grid, path, include_index)
+        print("saved {} cells {} the index ({:.1f} MB) in {:.2f} s".format(
+            len(grid.get_index()), "with" if include_index else "without", os.path.getsize(path) / 1e6,
+            time.perf_counter() - start))
+        time_first_query("load_snapshot", load_snapshot, path)
+        if include_index:
+            time_first_query("map_snapshot", map_snapshot, path)
+
+
+def time_first_query(name: str, load, path: str):
+    start = time.perf_counter()
+    loaded = load(path)
+    loaded_at = time.perf_counter()
+    first = loaded.hex_grid.get_hex_by_cube_coord(CubeCoordinate(0, 0))
+    last = loaded.hex_grid.get_hex_by_cube_coord(CubeCoordinate(-5, 10))
+    loaded.calculator.find_path(first, last)
+    print("  {}: {:.3f} s, then {:.3f} s for the first path query".format(
+        name, loaded_at - start, time.perf_counter() - loaded_at))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+         sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), 'mixite_bench.snapshot'))
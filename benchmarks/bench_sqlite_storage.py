@@ -0,0 +1,104 @@
+"""
+Throughput of SQLiteHexagonDataStorage against DefaultHexagonDataStorage: bulk and
+one-at-a-time inserts, random point reads with a cold and a warm page cache, and
+range reads of 50x50 windows.
+
+Usage: python benchmarks/bench_sqlite_storage.py [grid size] [database path]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from mixite.coord import CubeCoordinate
+from mixite.hex import GridData, HexagonImpl
+from mixite.location_metadata import SatelliteData
+from mixite.sqlite_storage import SQLiteHexagonDataStorage
+from mixite.storage import DefaultHexagonDataStorage
+
+POINT_READS = 200000
+RANGE_READS = 200
+WINDOW = 50
+
+
+def create_hexagon(grid_data: GridData, cube_x: int, cube_z: int) -> HexagonImpl:
+    hexagon = HexagonImpl(grid_data, CubeCoordinate(cube_x, cube_z))
+    satellite = SatelliteData()
+    satellite.movementCost = 1.0 + (cube_x + cube_z) % 3
+    hexagon.set_satellite(satellite)
+    return hexagon
+
+
+def timed(name: str, count: int, action):
+    start = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - start
+    print("  {}: {:.2f} s, {:,.0f} per second".format(name, elapsed, count / elapsed))
+
+
+def point_reads(storage, keys: list[int]):
+    get_data_for_key = storage.get_data_for_key
+    for packed_key in keys:
+        get_data_for_key(packed_key)
+
+
+def range_reads(storage, corners: list[tuple[int, int]]):
+    for cube_x, cube_z in corners:
+        for _ in storage.iter_data_by_cube_range(CubeCoordinate(cube_x, cube_z),
+                                                 CubeCoordinate(cube_x + WINDOW - 1, cube_z + WINDOW - 1)):
+            pass
+
+
+def run(name: str, storage, size: int, bulk: bool):
+    print(name)
+    grid_data = GridData(CubeCoordinate.POINTY_TOP, 10.0, size, size)
+    coords = [(cube_x, cube_z) for cube_x in range(size) for cube_z in range(size)]
+
+    def insert():
+        if bulk:
+            xs, zs = zip(*coords)
+            storage.add_coord_arrays_with_data(IntList(xs), IntList(zs),
+                                               [create_hexagon(grid_data, *coord) for coord in coords])
+        else:
+            for coord in coords:
+                storage.add_coord_with_data(CubeCoordinate(*coord), create_hexagon(grid_data, *coord))
+            if isinstance(storage, SQLiteHexagonDataStorage):
+                storage.flush()
+    timed("insert {:,} cells{}".format(len(coords), " in one batch" if bulk else ""), len(coords), insert)
+
+    rng = random.Random(3)
+    keys = [CubeCoordinate.pack(rng.randrange(size), rng.randrange(size)) for _ in range(POINT_READS)]
+    if isinstance(storage, SQLiteHexagonDataStorage):
+        storage.clear_cache()
+    timed("random point reads, cold cache", len(keys), lambda: point_reads(storage, keys))
+    timed("random point reads, warm cache", len(keys), lambda: point_reads(storage, keys))
+    if isinstance(storage, SQLiteHexagonDataStorage):
+        print("  cache: {:,} hits, {:,} misses, {:,} evictions".format(storage.hits, storage.misses, storage.evictions))
+
+    corners = [(rng.randrange(size - WINDOW), rng.randrange(size - WINDOW)) for _ in range(RANGE_READS)]
+    timed("{}x{} range reads, cells".format(WINDOW, WINDOW), RANGE_READS * WINDOW * WINDOW,
+          lambda: range_reads(storage, corners))
+
+
+class IntList(list):
+    """Stands in for the NumPy arrays add_coord_arrays_with_data usually gets."""
+
+    def tolist(self) -> list:
+        return self
+
+
+def main(size: int, path: str):
+    run("DefaultHexagonDataStorage", DefaultHexagonDataStorage(), size, bulk=False)
+    for bulk in (False, True):
+        if os.path.exists(path):
+            os.remove(path)
+        storage = SQLiteHexagonDataStorage(path, GridData(CubeCoordinate.POINTY_TOP, 10.0, size, size))
+        run("SQLiteHexagonDataStorage", storage, size, bulk)
+        storage.close()
+        print("  database: {:.1f} MB".format(os.path.getsize(path) / 1e6))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+         sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), 'mixite_bench.db'))
@@ -1,6 +1,6 @@
 # Order matters! Unlike Java et al., the imports are fully processed in the given order.
 # This means that if a module imports
-from .coord import CubeCoordinate, RotationDirection, CoordinateConverter
+from .coord import CubeCoordinate, CubeCoordinatePool, RotationDirection, CoordinateConverter
 from .hex import Hexagon, HexagonDataType, GridData, HexagonImpl
 from .storage import HexagonDataStorage, DefaultHexagonDataStorage
 from .grid import HexagonGrid, HexagonGridImpl
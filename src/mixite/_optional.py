@@ -0,0 +1,21 @@
+"""Access to optional third-party dependencies.
+
+The core library is pure Python. The array-based APIs use NumPy, which is only
+imported when one of them is called; install it with `pip install pymixite[numpy]`.
+"""
+
+
+def require_numpy():
+    try:
+        import numpy
+    except ImportError as error:
+        raise ImportError("This feature requires NumPy. Install it with 'pip install pymixite[numpy]'.") from error
+    return numpy
+
+
+def has_numpy() -> bool:
+    try:
+        import numpy
+    except ImportError:
+        return False
+    return True
@@ -1,5 +1,6 @@
+from mixite._optional import has_numpy
 from mixite.coord import CubeCoordinate
-from mixite.storage import DefaultHexagonDataStorage
+from mixite.storage import DefaultHexagonDataStorage, DenseHexagonDataStorage, HexagonDataStorage
 from mixite.grid import HexagonGrid, HexagonGridImpl
 from mixite.hex import GridData, HexagonImpl
 from mixite.calculator import HexagonGridCalculator
@@ -22,42 +23,67 @@ class GridControl:
 
 class GridControlBuilder:
 
+    def __init__(self, dense_storage: bool = False):
+        """
+        :param dense_storage: Build grids on a DenseHexagonDataStorage sized to the layout
+                              instead of a DefaultHexagonDataStorage. It takes far less memory
+                              on large grids, but coordinates outside of the layout's bounding
+                              box cannot be added to it later.
+        """
+        self.dense_storage = dense_storage
+
     def build_rectangle(self, orientation: str, radius: float, width: int, height: int) -> GridControl:
         grid_data = self.build_grid_data(orientation, radius, width, height)
         strategy = RectangleGridLayoutStrategy()
         self.check_size(strategy, width, height)
-        grid = HexagonGridImpl(grid_data, DefaultHexagonDataStorage())
-        self.populate_storage(grid, grid_data, strategy.fetch_grid_coords(width, height, orientation))
+        grid = self.build_grid(strategy, grid_data)
         return GridControl(grid, HexagonGridCalculator(grid), grid_data)
 
     def build_hexagon(self, orientation: str, radius: float, width: int, height: int) -> GridControl:
         grid_data = self.build_grid_data(orientation, radius, width, height)
         strategy = HexagonGridLayoutStrategy()
         self.check_size(strategy, width, height)
-        grid = HexagonGridImpl(grid_data, DefaultHexagonDataStorage())
-        self.populate_storage(grid, grid_data, strategy.fetch_grid_coords(width, height, orientation))
+        grid = self.build_grid(strategy, grid_data)
         return GridControl(grid, HexagonGridCalculator(grid), grid_data)
 
     def build_triangle(self, orientation: str, radius: float, width: int, height: int) -> GridControl:
         grid_data = self.build_grid_data(orientation, radius, width, height)
         strategy = TriangleGridLayoutStrategy()
         self.check_size(strategy, width, height)
-        grid = HexagonGridImpl(grid_data, DefaultHexagonDataStorage())
-        self.populate_storage(grid, grid_data, strategy.fetch_grid_coords(width, height, orientation))
+        grid = self.build_grid(strategy, grid_data)
         return GridControl(grid, HexagonGridCalculator(grid), grid_data)
 
     def build_trapezoid(self, orientation: str, radius: float, width: int, height: int) -> GridControl:
         grid_data = self.build_grid_data(orientation, radius, width, height)
         strategy = TrapezoidGridLayoutStrategy()
         self.check_size(strategy, width, height)
-        grid = HexagonGridImpl(grid_data, DefaultHexagonDataStorage())
-        self.populate_storage(grid, grid_data, strategy.fetch_grid_coords(width, height, orientation))
+        grid = self.build_grid(strategy, grid_data)
         return GridControl(grid, HexagonGridCalculator(grid), grid_data)
 
     @staticmethod
     def build_grid_data(orientation: str, radius: float, width: int, height: int) -> GridData:
         return GridData(orientation, radius, width, height)
 
+    def build_grid(self, strategy: GridLayoutStrategy, grid_data: GridData) -> HexagonGridImpl:
+        width, height, orientation = grid_data.gridWidth, grid_data.gridHeight, grid_data.orientation
+        if has_numpy():
+            # Generate the layout as arrays and fill the storage in bulk.
+            cube_xs, cube_zs = strategy.fetch_grid_coord_arrays(width, height, orientation)
+            storage = DenseHexagonDataStorage.for_coord_arrays(cube_xs, cube_zs) if self.dense_storage \
+                else DefaultHexagonDataStorage()
+            grid = HexagonGridImpl(grid_data, storage, layout=strategy)
+            self.populate_storage_from_arrays(grid, grid_data, cube_xs, cube_zs)
+        else:
+            coords = strategy.fetch_grid_coords(width, height, orientation)
+            grid = HexagonGridImpl(grid_data, self.build_storage(coords), layout=strategy)
+            self.populate_storage(grid, grid_data, coords)
+        return grid
+
+    def build_storage(self, coords: list[CubeCoordinate]) -> HexagonDataStorage:
+        if self.dense_storage:
+            return DenseHexagonDataStorage.for_coords(coords)
+        return DefaultHexagonDataStorage()
+
     @staticmethod
     def check_size(strategy: GridLayoutStrategy, width: int, height: int):
         strategy.check_size(width, height)
@@ -65,6 +91,16 @@ class GridControlBuilder:
     @staticmethod
     def populate_storage(grid: HexagonGridImpl, grid_data: GridData, coords: list[CubeCoordinate]):
         for coord in coords:
+            if grid.coord_pool is not None:
+                coord = grid.coord_pool.intern(coord)
             hexagon = HexagonImpl(grid_data, coord)
             grid.storage.add_coord_with_data(coord, hexagon)
             grid.hexagons.append(hexagon)
+
+    @staticmethod
+    def populate_storage_from_arrays(grid: HexagonGridImpl, grid_data: GridData, cube_xs, cube_zs):
+        get_coord = grid.get_coord
+        hexagons = [HexagonImpl(grid_data, get_coord(cube_x, cube_z))
+                    for cube_x, cube_z in zip(cube_xs.tolist(), cube_zs.tolist())]
+        grid.storage.add_coord_arrays_with_data(cube_xs, cube_zs, hexagons)
+        grid.hexagons.extend(hexagons)
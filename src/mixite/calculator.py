@@ -1,15 +1,436 @@
-from typing import Generic
+from __future__ import annotations
 
-from mixite.coord import CubeCoordinate, RotationDirection
-from mixite.grid import HexagonGrid
-from mixite.location_metadata import SatelliteDataType
-from mixite.hex import HexagonDataType
+import heapq
+from collections import OrderedDict, deque
+from bisect import bisect_left, bisect_right
+from array import array
+from typing import Callable, Generic, Iterable, Iterator, Optional
+
+from mixite._optional import require_numpy
+from mixite.coord import CubeCoordinate, RotationDirection, CoordinateConverter
+from mixite.grid import GridIndex, HexagonGrid, HexagonGridImpl
+from mixite.location_metadata import SatelliteData, SatelliteDataType
+from mixite.hex import Hexagon, HexagonDataType
+from mixite.storage import DefaultHexagonDataStorage
+
+
+INFINITY = float('inf')
+
+
+class _SatelliteEntryCosts:
+    """
+    Entry costs read from the hexagons' satellite objects, indexed like the satellite columns'
+    entry_costs so that the searches can treat both the same.
+    """
+
+    __slots__ = ('hexagons',)
+
+    def __init__(self, hexagons: list[Hexagon]):
+        self.hexagons = hexagons
+
+    def __getitem__(self, slot: int) -> float:
+        satellite = self.hexagons[slot].get_satellite()
+        if satellite is None:
+            return 1.0
+        if not satellite.isPassable:
+            return INFINITY
+        return satellite.movementCost
+
+
+class _KeyEntryCosts(dict):
+    """
+    Entry costs by packed key, for searching grids without a GridIndex. Each hexagon is looked
+    up the first time its cost is asked for. Keys that are not on the grid cost infinity, like
+    impassable hexagons, so the searches skip both the same way.
+    """
+
+    __slots__ = ('get_hex_by_packed_key',)
+
+    def __init__(self, get_hex_by_packed_key: Callable[[int], Optional[Hexagon]]):
+        super().__init__()
+        self.get_hex_by_packed_key = get_hex_by_packed_key
+
+    def __missing__(self, packed_key: int) -> float:
+        hexagon = self.get_hex_by_packed_key(packed_key)
+        if hexagon is None:
+            cost = INFINITY
+        else:
+            satellite = hexagon.get_satellite()
+            if satellite is None:
+                cost = 1.0
+            else:
+                cost = satellite.movementCost if satellite.isPassable else INFINITY
+        self[packed_key] = cost
+        return cost
+
+
+class FlowField(Generic[HexagonDataType]):
+    """
+    The result of HexagonGridCalculator.calc_flow_field: for every hexagon that can reach
+    one of the goals, the cost of getting there and the neighbor index
+    (see HexagonGridImpl.NEIGHBOR_COORDS) of the next step. Agents follow the field by
+    repeatedly calling next_hex, which is O(1).
+
+    costs and directions are indexed by the slots of index: the grid's GridIndex, or for grids
+    without one (see HexagonGrid.get_index) an index over the reached hexagons. Hexagons that
+    cannot reach a goal have an infinite cost.
+    """
+
+    NO_DIRECTION = -1
+
+    def __init__(self, index: GridIndex):
+        self.index = index
+        self.costs = array('d', [float('inf')]) * len(index)
+        self.directions = array('b', [self.NO_DIRECTION]) * len(index)
+        self.reached_count = 0
+
+    def cost_of(self, hexagon: HexagonDataType) -> Optional[float]:
+        """
+        :return: The cost of the cheapest path from the given hexagon to a goal, or None
+                 if no goal can be reached from it.
+        """
+        slot = self.index.slot_of_key(hexagon.get_coords().to_packed_key())
+        if slot < 0 or self.costs[slot] == float('inf'):
+            return None
+        return self.costs[slot]
+
+    def direction_of(self, hexagon: HexagonDataType) -> int:
+        """
+        :return: The neighbor index to step towards, or NO_DIRECTION for goals and for
+                 hexagons that cannot reach a goal.
+        """
+        slot = self.index.slot_of_key(hexagon.get_coords().to_packed_key())
+        return self.NO_DIRECTION if slot < 0 else self.directions[slot]
+
+    def next_hex(self, hexagon: HexagonDataType) -> Optional[HexagonDataType]:
+        """
+        :return: The next hexagon on the way to the nearest goal, or None if the given
+                 hexagon is a goal or cannot reach one.
+        """
+        slot = self.index.slot_of_key(hexagon.get_coords().to_packed_key())
+        if slot < 0 or self.directions[slot] == self.NO_DIRECTION:
+            return None
+        return self.index.hexagons[self.index.neighbor_slots[6 * slot + self.directions[slot]]]
+
+    def __len__(self) -> int:
+        return self.reached_count
+
+
+class LineOfSightCache:
+    """
+    Bounded LRU cache of is_visible results, see HexagonGridCalculator.enable_los_cache.
+
+    Entries are keyed on the packed keys of both ends, combined into one int. Each entry also
+    remembers the hexagons its line checked (up to and including the first blocker), and
+    crossed_by maps a hexagon's packed key back to the entries that checked it. When a
+    hexagon's opacity changes, only those entries are dropped.
+    """
+
+    def __init__(self, max_entries: int):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1, got {}".format(max_entries))
+        self.max_entries = max_entries
+        self.entries: OrderedDict[int, tuple[bool, list[int]]] = OrderedDict()
+        self.crossed_by: dict[int, set[int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def pair_key(from_key: int, to_key: int) -> int:
+        # Packed keys fit in a signed 64 bit int, so shifting one past the other keeps pairs unique.
+        return (from_key << 64) + to_key
+
+    def lookup(self, pair_key: int) -> Optional[bool]:
+        """
+        :return: The cached visibility, or None on a miss.
+        """
+        entry = self.entries.get(pair_key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(pair_key)
+        return entry[0]
+
+    def store(self, pair_key: int, visible: bool, crossed_keys: list[int]):
+        if pair_key in self.entries:
+            self.__forget(pair_key)
+        self.entries[pair_key] = (visible, crossed_keys)
+        crossed_by = self.crossed_by
+        for crossed_key in crossed_keys:
+            pairs = crossed_by.get(crossed_key)
+            if pairs is None:
+                crossed_by[crossed_key] = {pair_key}
+            else:
+                pairs.add(pair_key)
+        while len(self.entries) > self.max_entries:
+            self.__forget(next(iter(self.entries)))
+            self.evictions += 1
+
+    def invalidate_hex(self, packed_key: int):
+        """
+        Drops every entry whose line checked the hexagon with the given key.
+        """
+        pairs = self.crossed_by.get(packed_key)
+        if pairs:
+            for pair_key in list(pairs):
+                self.__forget(pair_key)
+                self.invalidations += 1
+
+    def satellite_changed(self, hexagon: Hexagon, old_satellite: Optional[SatelliteData]):
+        """
+        Satellite listener (see GridData.add_satellite_listener). Only opacity changes matter.
+        """
+        new_satellite = hexagon.get_satellite()
+        was_opaque = old_satellite is not None and old_satellite.isOpaque
+        is_opaque = new_satellite is not None and new_satellite.isOpaque
+        if was_opaque != is_opaque:
+            self.invalidate_hex(hexagon.get_coords().to_packed_key())
+
+    def clear(self):
+        self.entries.clear()
+        self.crossed_by.clear()
+
+    def __forget(self, pair_key: int):
+        _, crossed_keys = self.entries.pop(pair_key)
+        crossed_by = self.crossed_by
+        for crossed_key in crossed_keys:
+            pairs = crossed_by[crossed_key]
+            pairs.discard(pair_key)
+            if not pairs:
+                del crossed_by[crossed_key]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class ComponentLabels(Generic[HexagonDataType]):
+    """
+    Connected components of the passable hexagons of a grid, see
+    HexagonGridCalculator.enable_component_tracking. Two hexagons with the same component
+    can reach each other; find_path uses this to reject impossible queries up front.
+
+    labels is indexed by the slots of the grid's GridIndex and holds a component label, or
+    NO_COMPONENT for impassable hexagons. Labels are merged with union-find: a label's
+    component is found by following parents until a label is its own parent.
+    """
+
+    NO_COMPONENT = -1
+
+    def __init__(self, index: GridIndex):
+        self.index = index
+        self.labels = array('q', [self.NO_COMPONENT]) * len(index)
+        self.parents: list[int] = []
+        self.component_count = 0
+
+        hexagons = index.hexagons
+        neighbor_slots = index.neighbor_slots
+        labels = self.labels
+        for start_slot in range(len(index)):
+            if labels[start_slot] != self.NO_COMPONENT or not self.is_passable(hexagons[start_slot]):
+                continue
+            label = self.__new_label()
+            labels[start_slot] = label
+            pending = [start_slot]
+            while pending:
+                current_slot = pending.pop()
+                for neighbor_slot in neighbor_slots[6 * current_slot:6 * current_slot + 6]:
+                    if neighbor_slot >= 0 and labels[neighbor_slot] == self.NO_COMPONENT \
+                            and self.is_passable(hexagons[neighbor_slot]):
+                        labels[neighbor_slot] = label
+                        pending.append(neighbor_slot)
+
+    @staticmethod
+    def is_passable(hexagon: HexagonDataType) -> bool:
+        satellite = hexagon.get_satellite()
+        return satellite is None or satellite.isPassable
+
+    def component_of_slot(self, slot: int) -> int:
+        label = self.labels[slot]
+        if label == self.NO_COMPONENT:
+            return label
+        parents = self.parents
+        root = label
+        while parents[root] != root:
+            root = parents[root]
+        # Path compression, so later lookups take a single step.
+        while parents[label] != root:
+            parents[label], label = root, parents[label]
+        self.labels[slot] = root
+        return root
+
+    def component_of(self, hexagon: HexagonDataType) -> int:
+        """
+        :return: The component of the given hexagon, or NO_COMPONENT if it is impassable or
+                 not on the grid.
+        """
+        slot = self.index.slot_of_key(hexagon.get_coords().to_packed_key())
+        return self.NO_COMPONENT if slot < 0 else self.component_of_slot(slot)
+
+    def are_connected(self, first: HexagonDataType, second: HexagonDataType) -> bool:
+        """
+        :return: True if both hexagons are passable and in the same component.
+        """
+        component = self.component_of(first)
+        return component != self.NO_COMPONENT and component == self.component_of(second)
+
+    def satellite_changed(self, hexagon: HexagonDataType, old_satellite: Optional[SatelliteData]):
+        """
+        Satellite listener (see GridData.add_satellite_listener). Only passability changes matter.
+        """
+        was_passable = old_satellite is None or old_satellite.isPassable
+        if was_passable == self.is_passable(hexagon):
+            return
+        slot = self.index.slot_of_key(hexagon.get_coords().to_packed_key())
+        if slot < 0:
+            return
+        if was_passable:
+            self.__remove(slot)
+        else:
+            self.__add(slot)
+
+    def __new_label(self) -> int:
+        self.parents.append(len(self.parents))
+        self.component_count += 1
+        return len(self.parents) - 1
+
+    def __passable_neighbors(self, slot: int) -> list[int]:
+        labels = self.labels
+        return [neighbor_slot for neighbor_slot in self.index.neighbor_slots[6 * slot:6 * slot + 6]
+                if neighbor_slot >= 0 and labels[neighbor_slot] != self.NO_COMPONENT]
+
+    def __add(self, slot: int):
+        # The new cell joins its neighbors' components, merging them if there are several.
+        roots = {self.component_of_slot(neighbor_slot) for neighbor_slot in self.__passable_neighbors(slot)}
+        if not roots:
+            self.labels[slot] = self.__new_label()
+            return
+        root = roots.pop()
+        for other_root in roots:
+            self.parents[other_root] = root
+            self.component_count -= 1
+        self.labels[slot] = root
+
+    def __remove(self, slot: int):
+        labels = self.labels
+        labels[slot] = self.NO_COMPONENT
+        start_slots = self.__passable_neighbors(slot)
+        if not start_slots:
+            self.component_count -= 1
+            return
+        if len(start_slots) == 1:
+            return
+
+        # The component may have split. Flood fill from every neighbor at once, one cell per
+        # search in turn, and merge searches that meet. A group of searches that runs out of
+        # cells has filled a whole component; if other groups are still running, that
+        # component is separate and gets a new label. The work is bounded by the smaller
+        # pieces rather than by the whole component.
+        neighbor_slots = self.index.neighbor_slots
+        groups = list(range(len(start_slots)))
+        owner: dict[int, int] = {start_slot: search for search, start_slot in enumerate(start_slots)}
+        frontiers = [deque([start_slot]) for start_slot in start_slots]
+        running = set(range(len(start_slots)))
+
+        def group_of(search: int) -> int:
+            while groups[search] != search:
+                search = groups[search]
+            return search
+
+        while len({group_of(search) for search in running}) > 1:
+            for search in running:
+                if not frontiers[search]:
+                    continue
+                current_slot = frontiers[search].popleft()
+                for neighbor_slot in neighbor_slots[6 * current_slot:6 * current_slot + 6]:
+                    if neighbor_slot < 0 or labels[neighbor_slot] == self.NO_COMPONENT:
+                        continue
+                    other = owner.get(neighbor_slot)
+                    if other is None:
+                        owner[neighbor_slot] = search
+                        frontiers[search].append(neighbor_slot)
+                    elif group_of(other) != group_of(search):
+                        groups[group_of(other)] = group_of(search)
+
+            for group in {group_of(search) for search in running}:
+                members = {search for search in running if group_of(search) == group}
+                if any(frontiers[search] for search in members) or members == running:
+                    continue
+                label = self.__new_label()
+                for owned_slot, search in owner.items():
+                    if search in members:
+                        labels[owned_slot] = label
+                running -= members
+
+    def __len__(self) -> int:
+        return self.component_count
 
 
 class HexagonGridCalculator(Generic[HexagonDataType, SatelliteDataType]):
 
     def __init__(self, grid: HexagonGrid):
         self.grid = grid
+        # Visit buffers for find_path and calc_reachable_from, indexed by GridIndex slot and
+        # kept between calls. An entry only counts when its stamp matches the current search,
+        # so nothing has to be cleared.
+        self.__search_index: Optional[GridIndex] = None
+        self.__search = 0
+        self.__search_stamps = array('q')
+        self.__search_costs = array('d')
+        self.__search_came_from = array('q')
+        self.los_cache: Optional[LineOfSightCache] = None
+        self.components: Optional[ComponentLabels] = None
+
+    def enable_los_cache(self, max_entries: int = 65536) -> LineOfSightCache:
+        """
+        Makes is_visible remember its results, keeping at most max_entries of them. Cached
+        results are dropped when a hexagon on their line changes opacity through set_satellite
+        or clear_satellite. Satellites changed in place are not noticed, see
+        GridData.notify_satellite_changed.
+        :return: The cache, for its hit and miss counters.
+        """
+        self.disable_los_cache()
+        self.los_cache = LineOfSightCache(max_entries)
+        self.grid.grid_data.add_satellite_listener(self.los_cache.satellite_changed)
+        return self.los_cache
+
+    def disable_los_cache(self):
+        if self.los_cache is not None:
+            self.grid.grid_data.remove_satellite_listener(self.los_cache.satellite_changed)
+            self.los_cache = None
+
+    def enable_component_tracking(self) -> ComponentLabels:
+        """
+        Labels the connected components of the passable hexagons and keeps the labels up to date
+        as hexagons become passable or impassable through set_satellite or clear_satellite.
+        find_path then returns right away for hexagons in different components. Satellites
+        changed in place are not noticed, see GridData.notify_satellite_changed.
+        :return: The labels, for are_connected and component_of.
+        :raises TypeError: If the grid has no index, see HexagonGrid.get_index.
+        """
+        index = self.grid.get_index()
+        if index is None:
+            raise TypeError("Component tracking needs a grid index, which this grid's storage does not support.")
+        self.disable_component_tracking()
+        self.components = ComponentLabels(index)
+        self.grid.grid_data.add_satellite_listener(self.components.satellite_changed)
+        return self.components
+
+    def disable_component_tracking(self):
+        if self.components is not None:
+            self.grid.grid_data.remove_satellite_listener(self.components.satellite_changed)
+            self.components = None
+
+    def get_components(self) -> Optional[ComponentLabels]:
+        """
+        :return: The tracked components (see enable_component_tracking), relabeled first if the
+                 grid's storage changed since, or None if tracking is off.
+        """
+        if self.components is not None and self.components.index is not self.grid.get_index():
+            self.enable_component_tracking()
+        return self.components
 
     @staticmethod
     def calc_distance_between(first: HexagonDataType, second: HexagonDataType) -> int:
@@ -18,17 +439,97 @@ class HexagonGridCalculator(Generic[HexagonDataType, SatelliteDataType]):
         diff_z = abs(first.get_coords().gridZ - second.get_coords().gridZ)
         return max(diff_x, diff_y, diff_z)
 
+    @staticmethod
+    def calc_distances_from(origin_x: int, origin_z: int, cube_xs, cube_zs):
+        """
+        Vectorized form of calc_distance_between, from one origin to many coordinates.
+        Requires NumPy.
+        :param origin_x: Cube x of the origin.
+        :param origin_z: Cube z of the origin.
+        :param cube_xs: Array of cube x values, e.g. from GridLayoutStrategy.fetch_grid_coord_arrays.
+        :param cube_zs: Array of cube z values, the same shape as cube_xs.
+        :return: int64 NumPy array of hex distances, the same shape as the inputs.
+        """
+        np = require_numpy()
+        diff_x = np.asarray(cube_xs, dtype=np.int64) - origin_x
+        diff_z = np.asarray(cube_zs, dtype=np.int64) - origin_z
+        # The y difference is -(diff_x + diff_z), and only its magnitude matters.
+        diff_y = np.abs(diff_x + diff_z)
+        np.abs(diff_x, out=diff_x)
+        np.abs(diff_z, out=diff_z)
+        np.maximum(diff_x, diff_z, out=diff_x)
+        return np.maximum(diff_x, diff_y, out=diff_x)
+
+    @staticmethod
+    def iter_pairwise_distance_tiles(cube_xs, cube_zs, other_xs=None, other_zs=None, tile_size: int = 1024):
+        """
+        Hex distances between every coordinate of one set and every coordinate of another (or
+        the same) set, computed one tile_size x tile_size block at a time so that memory stays
+        bounded no matter how many coordinates there are. Requires NumPy.
+        :return: A generator of (row_start, column_start, block) tuples. block is an int64 array
+                 whose entry [i, j] is the distance between coordinate row_start + i of the first
+                 set and coordinate column_start + j of the second.
+        :raises ValueError: If only one of other_xs and other_zs is given.
+        """
+        np = require_numpy()
+        if tile_size < 1:
+            raise ValueError("tile_size must be at least 1, got {}".format(tile_size))
+        if (other_xs is None) != (other_zs is None):
+            raise ValueError("other_xs and other_zs must be given together.")
+        cube_xs = np.asarray(cube_xs, dtype=np.int64)
+        cube_zs = np.asarray(cube_zs, dtype=np.int64)
+        other_xs = cube_xs if other_xs is None else np.asarray(other_xs, dtype=np.int64)
+        other_zs = cube_zs if other_zs is None else np.asarray(other_zs, dtype=np.int64)
+        for row_start in range(0, len(cube_xs), tile_size):
+            row_xs = cube_xs[row_start:row_start + tile_size, np.newaxis]
+            row_zs = cube_zs[row_start:row_start + tile_size, np.newaxis]
+            for column_start in range(0, len(other_xs), tile_size):
+                diff_x = row_xs - other_xs[np.newaxis, column_start:column_start + tile_size]
+                diff_z = row_zs - other_zs[np.newaxis, column_start:column_start + tile_size]
+                diff_y = np.abs(diff_x + diff_z)
+                np.abs(diff_x, out=diff_x)
+                np.abs(diff_z, out=diff_z)
+                np.maximum(diff_x, diff_z, out=diff_x)
+                yield row_start, column_start, np.maximum(diff_x, diff_y, out=diff_x)
+
+    @staticmethod
+    def calc_pairwise_distances(cube_xs, cube_zs, other_xs=None, other_zs=None, tile_size: int = 1024,
+                                dtype='int64'):
+        """
+        The full distance matrix of iter_pairwise_distance_tiles: entry [i, j] is the distance
+        between coordinate i of the first set and coordinate j of the second (the first set
+        again when other_xs and other_zs are left out). Only the result is allocated at full
+        size; the work happens in tiles. Requires NumPy.
+        :param dtype: dtype of the result. Coordinates that fit CubeCoordinate.pack can be up to
+                      2 ** 32 apart, which only int64 always holds. int32 halves the memory and
+                      is enough when no distance reaches 2 ** 31.
+        :raises ValueError: If only one of other_xs and other_zs is given.
+        """
+        np = require_numpy()
+        if (other_xs is None) != (other_zs is None):
+            raise ValueError("other_xs and other_zs must be given together.")
+        other_count = len(cube_xs) if other_xs is None else len(other_xs)
+        result = np.empty((len(cube_xs), other_count), dtype=dtype)
+        for row_start, column_start, block in HexagonGridCalculator.iter_pairwise_distance_tiles(
+                cube_xs, cube_zs, other_xs, other_zs, tile_size):
+            result[row_start:row_start + block.shape[0], column_start:column_start + block.shape[1]] = block
+        return result
+
     def calc_move_range_from(self, hexagon: HexagonDataType, distance: int) -> list[HexagonDataType]:
-        in_range: list[HexagonDataType] = []
+        return list(self.iter_move_range_from(hexagon, distance))
+
+    def iter_move_range_from(self, hexagon: HexagonDataType, distance: int) -> Iterator[HexagonDataType]:
+        """
+        Generator form of calc_move_range_from. Yields the same hexagons in the same order.
+        """
+        center_key = hexagon.get_coords().to_packed_key()
+        get_hex_by_packed_key = self.grid.get_hex_by_packed_key
         for x in range(-distance, distance+1):
             for y in range(max(-distance, -x - distance), min(distance, -x + distance) + 1):
                 z = -x - y
-                coord = self.grid.get_hex_by_cube_coord(
-                    CubeCoordinate(hexagon.get_coords().gridX + x, hexagon.get_coords().gridZ + z))
+                coord = get_hex_by_packed_key(center_key + CubeCoordinate.pack(x, z))
                 if coord is not None:
-                    in_range.append(coord)
-
-        return in_range
+                    yield coord
 
     def rotate_hex(self, original: HexagonDataType, target: HexagonDataType, direction: RotationDirection) \
             -> HexagonDataType:
@@ -45,45 +546,718 @@ class HexagonGridCalculator(Generic[HexagonDataType, SatelliteDataType]):
         because we rely on some coordinates that don't exist on the grid (particularly for
         the edges of the grid).
         """
+        return list(self.iter_ring_from(center_hex, radius))
+
+    def iter_ring_from(self, center_hex: HexagonDataType, radius: int) -> Iterator[HexagonDataType]:
+        """
+        Generator form of calc_ring_from. Yields the same hexagons in the same order. When the
+        grid knows its layout (see HexagonGridImpl.get_row_bounds), positions outside of it are
+        skipped by comparing against the row bounds, and only positions inside are looked up.
+        """
+        center_x = center_hex.get_coords().gridX
+        center_z = center_hex.get_coords().gridZ
+        get_hex_by_packed_key = self.grid.get_hex_by_packed_key
+        current_x = center_x - radius
+        current_z = center_z + radius
 
-        results: list[HexagonDataType] = []
+        row_range = self.grid.get_row_range()
+        if row_range is None:
+            for step_x, step_z in HexagonGridImpl.NEIGHBOR_COORDS:
+                for _ in range(radius):
+                    current_x += step_x
+                    current_z += step_z
+                    current_hex = get_hex_by_packed_key((current_x << 32) + current_z)
+                    if current_hex is not None:
+                        yield current_hex
+            return
 
-        current_coord = CubeCoordinate(center_hex.get_coords().gridX - radius,
-                                       center_hex.get_coords().gridZ + radius)
-        current_hex = self.grid.get_hex_by_cube_coord(current_coord)
+        # The ring spans rows center_z - radius to center_z + radius.
+        first_row = center_z - radius
+        row_bounds = [self.grid.get_row_bounds(z) if row_range[0] <= z <= row_range[1] else None
+                      for z in range(first_row, center_z + radius + 1)]
+        for step_x, step_z in HexagonGridImpl.NEIGHBOR_COORDS:
+            if step_z == 0:
+                # This side stays in one row, so its overlap with the row is a single run of steps.
+                bounds = row_bounds[current_z - first_row]
+                if bounds is not None:
+                    if step_x > 0:
+                        first_step = max(1, bounds[0] - current_x)
+                        last_step = min(radius, bounds[1] - current_x)
+                    else:
+                        first_step = max(1, current_x - bounds[1])
+                        last_step = min(radius, current_x - bounds[0])
+                    for step in range(first_step, last_step + 1):
+                        current_hex = get_hex_by_packed_key(((current_x + step_x * step) << 32) + current_z)
+                        if current_hex is not None:
+                            yield current_hex
+                current_x += step_x * radius
+            else:
+                for _ in range(radius):
+                    current_x += step_x
+                    current_z += step_z
+                    bounds = row_bounds[current_z - first_row]
+                    if bounds is not None and bounds[0] <= current_x <= bounds[1]:
+                        current_hex = get_hex_by_packed_key((current_x << 32) + current_z)
+                        if current_hex is not None:
+                            yield current_hex
 
-        for neighbor_index in range(6):
-            for distance in range(radius):
-                # Hex must come first because coord changes.
-                current_hex = self.grid.get_hex_by_coord_neighbor_index(current_coord, neighbor_index)
-                current_coord = self.grid.get_coord_by_neighbor_index(current_coord, neighbor_index)
+    def iter_spiral_from(self, center_hex: HexagonDataType, max_radius: Optional[int] = None) \
+            -> Iterator[HexagonDataType]:
+        """
+        Yields the grid's hexagons ring by ring, nearest first: the center (if it is on the
+        grid), then iter_ring_from for radius 1, 2 and so on. Stop iterating once the hexagon
+        you are looking for turns up, e.g. the nearest free one.
+
+        When the grid knows its layout, rings that lie entirely off the grid are never walked:
+        the spiral starts at the first ring that touches the layout and ends after the last one.
+        :param max_radius: The largest ring to visit. Required when the grid has no layout.
+        """
+        center_x = center_hex.get_coords().gridX
+        center_z = center_hex.get_coords().gridZ
+        reach = self.__layout_reach(center_x, center_z)
+        if reach is None:
+            if max_radius is None:
+                raise ValueError("max_radius is required when the grid has no layout.")
+            first_radius, last_radius = 0, max_radius
+        else:
+            first_radius, last_radius = reach
+            if max_radius is not None:
+                last_radius = min(last_radius, max_radius)
+
+        for radius in range(first_radius, last_radius + 1):
+            if radius == 0:
+                current_hex = self.grid.get_hex_by_packed_key(CubeCoordinate.pack(center_x, center_z))
                 if current_hex is not None:
-                    results.append(current_hex)
+                    yield current_hex
+            else:
+                yield from self.iter_ring_from(center_hex, radius)
 
-        return results
+    def __layout_reach(self, center_x: int, center_z: int) -> Optional[tuple[int, int]]:
+        """
+        :return: The distances from the center to the nearest and farthest coordinates of the
+                 grid's layout, or None if the grid has no layout.
+        """
+        row_range = self.grid.get_row_range()
+        if row_range is None:
+            return None
+        nearest = None
+        farthest = None
+        for z in range(row_range[0], row_range[1] + 1):
+            bounds = self.grid.get_row_bounds(z)
+            if bounds is None:
+                continue
+            diff_z = z - center_z
+            # Along a row the distance is convex in x: it bottoms out at abs(diff_z) for x
+            # between center_x and center_x - diff_z, and grows towards both ends.
+            first_distance = max(abs(bounds[0] - center_x), abs(diff_z), abs(bounds[0] - center_x + diff_z))
+            last_distance = max(abs(bounds[1] - center_x), abs(diff_z), abs(bounds[1] - center_x + diff_z))
+            if bounds[0] <= center_x + max(0, -diff_z) and center_x + min(0, -diff_z) <= bounds[1]:
+                row_nearest = abs(diff_z)
+            else:
+                row_nearest = min(first_distance, last_distance)
+            row_farthest = max(first_distance, last_distance)
+            nearest = row_nearest if nearest is None else min(nearest, row_nearest)
+            farthest = row_farthest if farthest is None else max(farthest, row_farthest)
+        if nearest is None:
+            # An empty layout: no ring touches it.
+            return 1, 0
+        return nearest, farthest
 
     def draw_line(self, from_hex: HexagonDataType, to_hex: HexagonDataType) -> list[HexagonDataType]:
-        results: list[HexagonDataType] = []
-        distance = self.calc_distance_between(from_hex, to_hex)
+        return list(self.iter_line(from_hex, to_hex))
+
+    def iter_line(self, from_hex: HexagonDataType, to_hex: HexagonDataType) -> Iterator[HexagonDataType]:
+        """
+        Generator form of draw_line. Yields the same hexagons in the same order, but the caller
+        can stop early (see is_visible).
+        """
+        get_hex_by_packed_key = self.grid.get_hex_by_packed_key
+        for packed_key in self.__iter_line_keys(from_hex.get_coords(), to_hex.get_coords()):
+            line_hex = get_hex_by_packed_key(packed_key)
+            if line_hex is not None:
+                yield line_hex
+
+    def is_visible(self, from_hex: HexagonDataType, to_hex: HexagonDataType) -> bool:
+        los_cache = self.los_cache
+        if los_cache is None:
+            return self.__trace_visibility(from_hex, to_hex, None)
+        pair_key = LineOfSightCache.pair_key(from_hex.get_coords().to_packed_key(), to_hex.get_coords().to_packed_key())
+        visible = los_cache.lookup(pair_key)
+        if visible is None:
+            crossed_keys: list[int] = []
+            visible = self.__trace_visibility(from_hex, to_hex, crossed_keys)
+            los_cache.store(pair_key, visible, crossed_keys)
+        return visible
+
+    def __trace_visibility(self, from_hex: HexagonDataType, to_hex: HexagonDataType,
+                           crossed_keys: Optional[list[int]]) -> bool:
+        """
+        Walks the line until the first opaque hexagon. If crossed_keys is given, the keys of the
+        hexagons checked along the way are appended to it.
+        """
+        from_key = from_hex.get_coords().to_packed_key()
+        to_key = to_hex.get_coords().to_packed_key()
+        get_hex_by_packed_key = self.grid.get_hex_by_packed_key
+        satellite_columns = self.grid.grid_data.satellite_columns
+        if satellite_columns is not None:
+            index = self.grid.get_index()
+            satellite_columns.align(index)
+            opaque_column = satellite_columns.columns['isOpaque']
+        for packed_key in self.__iter_line_keys(from_hex.get_coords(), to_hex.get_coords()):
+            if packed_key == from_key or packed_key == to_key:
+                continue
+            if satellite_columns is not None:
+                slot = index.slot_of_key(packed_key)
+                if slot < 0:
+                    continue
+                opaque = opaque_column[slot]
+            else:
+                path_hex = get_hex_by_packed_key(packed_key)
+                if path_hex is None:
+                    continue
+                satellite = path_hex.get_satellite()
+                opaque = satellite is not None and satellite.isOpaque
+            if crossed_keys is not None:
+                crossed_keys.append(packed_key)
+            if opaque:
+                return False
+        return True
+
+    def __iter_line_keys(self, from_coord: CubeCoordinate, to_coord: CubeCoordinate) -> Iterator[int]:
+        """
+        Packed keys of the line from from_coord to to_coord, in integer arithmetic. Step i of
+        distance n lies at from + (to - from) * i / n, so every cube component is tracked as a
+        numerator over n and rounded exactly. The only case the integers cannot decide on their
+        own is a component sitting exactly halfway between two values: draw_line has always
+        resolved those with floating point error, so that step falls back to
+        cube_linear_interpolate to keep the lines identical.
+        """
+        from_x = from_coord.gridX
+        from_z = from_coord.gridZ
+        from_y = -from_x - from_z
+        diff_x = to_coord.gridX - from_x
+        diff_z = to_coord.gridZ - from_z
+        diff_y = -diff_x - diff_z
+        distance = max(abs(diff_x), abs(diff_y), abs(diff_z))
         if distance == 0:
-            return results
+            return
 
+        numerator_x = from_x * distance
+        numerator_y = from_y * distance
+        numerator_z = from_z * distance
         for curr_dist in range(distance + 1):
-            interp_coord = self.cube_linear_interpolate(from_hex.get_coords(),
-                                                        to_hex.get_coords(), 1.0 / distance * curr_dist)
-            interp_hex = self.grid.get_hex_by_cube_coord(interp_coord)
-            if interp_hex is not None:
-                results.append(interp_hex)
+            quotient_x, remainder_x = divmod(numerator_x, distance)
+            quotient_y, remainder_y = divmod(numerator_y, distance)
+            quotient_z, remainder_z = divmod(numerator_z, distance)
+            if 2 * remainder_x == distance or 2 * remainder_y == distance or 2 * remainder_z == distance:
+                yield self.cube_linear_interpolate(from_coord, to_coord, 1.0 / distance * curr_dist).to_packed_key()
+            else:
+                round_x = quotient_x + (2 * remainder_x > distance)
+                round_y = quotient_y + (2 * remainder_y > distance)
+                round_z = quotient_z + (2 * remainder_z > distance)
+                # Same correction as CoordinateConverter.round_to_cube_coord, on errors scaled by
+                # the distance. It only changes anything when the rounded values do not sum to 0.
+                if round_x + round_y + round_z != 0:
+                    error_x = abs(round_x * distance - numerator_x)
+                    error_y = abs(round_y * distance - numerator_y)
+                    error_z = abs(round_z * distance - numerator_z)
+                    if error_x > error_y and error_x > error_z:
+                        round_x = -round_y - round_z
+                    elif error_y <= error_z:
+                        round_z = -round_x - round_y
+                yield (round_x << 32) + round_z
+            numerator_x += diff_x
+            numerator_y += diff_y
+            numerator_z += diff_z
+
+    def calc_field_of_view(self, origin: HexagonDataType, radius: int) -> list[HexagonDataType]:
+        """
+        Every hexagon within the radius that can be seen from the origin, computed by
+        shadowcasting ring by ring instead of calling is_visible for every target.
+
+        The 6k hexagons of ring k split the full turn (0 to 1) into equal parts, and hexagon j
+        covers [(2j - 1) / 12k, (2j + 1) / 12k]. Opaque hexagons cast a shadow over their part
+        of the turn. A hexagon is visible unless its part is entirely in shadow, so the walls
+        that block the view are visible themselves. The origin is always visible and never
+        blocks. Each hexagon is visited once, which makes this O(radius^2).
+
+        Every hexagon for which is_visible is true is part of the result. The line to a
+        hexagon keeps the same position in the turn on every ring, so it is only blocked where
+        that position is inside a wall's part, or on the edge between two walls of one ring.
+        Shadows of different rings that merely touch are therefore not joined, since
+        is_visible may find the line passes between them. The result can hold more: hexagons
+        whose part is only partly in shadow are visible here, but not to is_visible when the
+        line to their center is blocked.
+        :return: The visible hexagons, ring by ring, starting with the origin.
+        """
+        results: list[HexagonDataType] = [origin]
+        get_hex_by_packed_key = self.grid.get_hex_by_packed_key
+        satellite_columns = self.grid.grid_data.satellite_columns
+        opaque_column = None
+        if satellite_columns is not None:
+            index = self.grid.get_index()
+            satellite_columns.align(index)
+            opaque_column = satellite_columns.columns['isOpaque']
+        neighbor_offsets = HexagonGridImpl.NEIGHBOR_KEY_OFFSETS
+        # Sorted shadow intervals that do not overlap, though they may touch. A hexagon is only
+        # in shadow if a single interval covers its part.
+        shadow_starts: list[float] = []
+        shadow_ends: list[float] = []
+        center_x = origin.get_coords().gridX
+        center_z = origin.get_coords().gridZ
 
+        for ring in range(1, radius + 1):
+            if shadow_starts and shadow_starts[0] <= 0.0 and shadow_ends[0] >= 1.0:
+                break
+            denominator = 12 * ring
+            # Same walk as calc_ring_from: start on the corner in direction 4, then follow
+            # each neighbor direction for a side's worth of steps.
+            current_key = CubeCoordinate.pack(center_x - ring, center_z + ring)
+            opaque_parts: list[tuple[float, float]] = []
+            position = 0
+            for offset in neighbor_offsets:
+                for _ in range(ring):
+                    current_key += offset
+                    position += 1
+                    if opaque_column is not None:
+                        slot = index.slot_of_key(current_key)
+                        if slot < 0:
+                            continue
+                        current_hex = index.hexagons[slot]
+                        opaque = opaque_column[slot]
+                    else:
+                        current_hex = get_hex_by_packed_key(current_key)
+                        if current_hex is None:
+                            continue
+                        satellite = current_hex.get_satellite()
+                        opaque = satellite is not None and satellite.isOpaque
+                    part = position % (6 * ring)
+                    if part == 0:
+                        # The part around angle 0 wraps, so it is checked as two pieces.
+                        parts = [((denominator - 1) / denominator, 1.0), (0.0, 1 / denominator)]
+                    else:
+                        parts = [((2 * part - 1) / denominator, (2 * part + 1) / denominator)]
+                    if all(self.__is_in_shadow(shadow_starts, shadow_ends, start, end) for start, end in parts):
+                        continue
+                    results.append(current_hex)
+                    if opaque:
+                        opaque_parts.extend(parts)
+            # Shadows only apply to the rings further out. Neighboring walls of one ring block
+            # the line between them, so they are joined into one shadow first.
+            opaque_parts.sort()
+            joined_parts: list[list[float]] = []
+            for start, end in opaque_parts:
+                if joined_parts and joined_parts[-1][1] >= start:
+                    joined_parts[-1][1] = max(joined_parts[-1][1], end)
+                else:
+                    joined_parts.append([start, end])
+            for start, end in joined_parts:
+                self.__add_shadow(shadow_starts, shadow_ends, start, end)
         return results
 
-    def is_visible(self, from_hex: HexagonDataType, to_hex: HexagonDataType) -> bool:
-        path = self.draw_line(from_hex, to_hex)
-        for path_hex in path:
-            if not (path_hex == from_hex or path_hex == to_hex) and path_hex.satellite is not None:
-                if path_hex.satellite.isOpaque:
-                    return False
-        return True
+    @staticmethod
+    def __is_in_shadow(starts: list[float], ends: list[float], start: float, end: float) -> bool:
+        index = bisect_right(starts, start) - 1
+        return index >= 0 and ends[index] >= end
+
+    @staticmethod
+    def __add_shadow(starts: list[float], ends: list[float], start: float, end: float):
+        # Shadows that only touch are kept apart: a line can pass exactly between walls of
+        # different rings (is_visible settles the tie on each ring separately).
+        first = bisect_left(starts, start)
+        if first > 0 and ends[first - 1] > start:
+            first -= 1
+            start = starts[first]
+        last = first
+        while last < len(starts) and starts[last] < end:
+            end = max(end, ends[last])
+            last += 1
+        starts[first:last] = [start]
+        ends[first:last] = [end]
+
+    def find_path(self, from_hex: HexagonDataType, to_hex: HexagonDataType,
+                  min_cost: Optional[float] = None) -> list[HexagonDataType]:
+        """
+        A* shortest path between two hexagons. Entering a hexagon costs its satellite's
+        movementCost (1.0 when it has no satellite), and hexagons whose satellite is not
+        passable are never entered. The heuristic is the hex distance (calc_distance_between)
+        times min_cost.
+        :param min_cost: A lower bound on the movementCost of the passable hexagons, which only
+                         scales the heuristic. By default it is the smallest movementCost on the
+                         grid, found with a scan of every hexagon, or 0 (Dijkstra's search) for
+                         grids without a GridIndex. Callers running many searches on the same
+                         costs can pass it once they know it. A bound above the real smallest
+                         cost makes the search faster but the path may no longer be the cheapest.
+        :return: The hexagons along the cheapest path, from from_hex to to_hex inclusive,
+                 or an empty list if to_hex cannot be reached or either end is not on the grid.
+        """
+        index = self.grid.get_index()
+        if index is None:
+            return self.__find_path_by_key(from_hex, to_hex, min_cost)
+        start_slot = index.slot_of_key(from_hex.get_coords().to_packed_key())
+        goal_slot = index.slot_of_key(to_hex.get_coords().to_packed_key())
+        if start_slot < 0 or goal_slot < 0:
+            return []
+        if start_slot == goal_slot:
+            return [from_hex]
+        entry_costs = self.__entry_costs(index)
+        if entry_costs[goal_slot] == INFINITY:
+            return []
+        if min_cost is None:
+            min_cost = self.__smallest_entry_cost(index, entry_costs)
+        components = self.get_components()
+        if components is not None:
+            # The start may be impassable itself (only entering hexagons costs anything), in
+            # which case its component says nothing about where it can go.
+            start_component = components.component_of_slot(start_slot)
+            if start_component != ComponentLabels.NO_COMPONENT \
+                    and start_component != components.component_of_slot(goal_slot):
+                return []
+
+        search = self.__start_search(index)
+        stamps = self.__search_stamps
+        costs = self.__search_costs
+        came_from = self.__search_came_from
+        keys = index.keys
+        hexagons = index.hexagons
+        neighbor_slots = index.neighbor_slots
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        goal_x, goal_z = CubeCoordinate.unpack(keys[goal_slot])
+
+        stamps[start_slot] = search
+        costs[start_slot] = 0.0
+        # Entries are (estimate, cost so far, slot). Entries are only pushed when they improve
+        # on the best cost, so any entry whose cost no longer matches it is stale.
+        open_heap: list[tuple[float, float, int]] = [(0.0, 0.0, start_slot)]
+        while open_heap:
+            _, current_cost, current_slot = heappop(open_heap)
+            if current_slot == goal_slot:
+                return self.__rebuild_path(index, start_slot, goal_slot)
+            if current_cost > costs[current_slot]:
+                continue
+
+            first_neighbor = 6 * current_slot
+            for neighbor_slot in neighbor_slots[first_neighbor:first_neighbor + 6]:
+                if neighbor_slot < 0:
+                    continue
+                step_cost = entry_costs[neighbor_slot]
+                if step_cost == INFINITY:
+                    continue
+                new_cost = current_cost + step_cost
+                if stamps[neighbor_slot] != search or new_cost < costs[neighbor_slot]:
+                    stamps[neighbor_slot] = search
+                    costs[neighbor_slot] = new_cost
+                    came_from[neighbor_slot] = current_slot
+                    neighbor_key = keys[neighbor_slot]
+                    neighbor_x = (neighbor_key + 0x80000000) >> 32
+                    diff_x = neighbor_x - goal_x
+                    diff_z = neighbor_key - (neighbor_x << 32) - goal_z
+                    heappush(open_heap, (new_cost + min_cost * max(abs(diff_x), abs(diff_z), abs(diff_x + diff_z)),
+                                         new_cost, neighbor_slot))
+        return []
+
+    def calc_flow_field(self, goals: Iterable[HexagonDataType], max_cost: float = float('inf')) -> FlowField:
+        """
+        Runs one Dijkstra pass outward from the goals and records, for every hexagon that can
+        reach a goal, the cost to get there and the direction of the first step. Costs follow
+        the same rules as find_path: entering a hexagon costs its movementCost, and impassable
+        hexagons are never entered (so they are not part of the field).
+        :param goals: One or more target hexagons. Impassable goals and goals that are not on
+                      the grid are ignored.
+        :param max_cost: Hexagons further than this from every goal are left out of the field.
+        """
+        index = self.grid.get_index()
+        if index is None:
+            return self.__flow_field_by_key(goals, max_cost)
+        field = FlowField(index)
+        costs = field.costs
+        directions = field.directions
+        neighbor_slots = index.neighbor_slots
+        entry_costs = self.__entry_costs(index)
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        open_heap: list[tuple[float, int]] = []
+        for goal in goals:
+            goal_slot = index.slot_of_key(goal.get_coords().to_packed_key())
+            if goal_slot >= 0 and entry_costs[goal_slot] != INFINITY:
+                costs[goal_slot] = 0.0
+                open_heap.append((0.0, goal_slot))
+        heapq.heapify(open_heap)
+
+        settled = bytearray(len(index))
+        while open_heap:
+            current_cost, current_slot = heappop(open_heap)
+            if settled[current_slot]:
+                continue
+            settled[current_slot] = 1
+            field.reached_count += 1
+
+            # Stepping from a neighbor into this hexagon costs this hexagon's movementCost.
+            new_cost = current_cost + entry_costs[current_slot]
+            if new_cost > max_cost:
+                continue
+            first_neighbor = 6 * current_slot
+            for direction in range(6):
+                neighbor_slot = neighbor_slots[first_neighbor + direction]
+                if neighbor_slot < 0 or settled[neighbor_slot] or new_cost >= costs[neighbor_slot]:
+                    continue
+                if entry_costs[neighbor_slot] == INFINITY:
+                    continue
+                costs[neighbor_slot] = new_cost
+                # The neighbor steps back towards this hexagon, the opposite direction.
+                directions[neighbor_slot] = (direction + 3) % 6
+                heappush(open_heap, (new_cost, neighbor_slot))
+        return field
+
+    def calc_reachable_from(self, hexagon: HexagonDataType, budget: float) \
+            -> list[tuple[HexagonDataType, float]]:
+        """
+        Every hexagon that can be reached from the given one without spending more than the
+        budget. Unlike calc_move_range_from, this honors the satellites: entering a hexagon
+        costs its movementCost and impassable hexagons are never entered (see find_path).
+        The visit buffers are reused between calls, so repeated queries do not rebuild them.
+        :return: (hexagon, remaining budget) pairs, cheapest first. The starting hexagon comes
+                 first, with the whole budget. Empty if the hexagon is not on the grid.
+        """
+        index = self.grid.get_index()
+        if index is None:
+            return self.__reachable_by_key(hexagon, budget)
+        start_slot = index.slot_of_key(hexagon.get_coords().to_packed_key())
+        if start_slot < 0:
+            return []
+
+        search = self.__start_search(index)
+        stamps = self.__search_stamps
+        costs = self.__search_costs
+        hexagons = index.hexagons
+        neighbor_slots = index.neighbor_slots
+        entry_costs = self.__entry_costs(index)
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        results: list[tuple[HexagonDataType, float]] = []
+        stamps[start_slot] = search
+        costs[start_slot] = 0.0
+        open_heap: list[tuple[float, int]] = [(0.0, start_slot)]
+        while open_heap:
+            current_cost, current_slot = heappop(open_heap)
+            # Entries are only pushed when they improve on the best cost, so any entry that
+            # no longer matches it is stale.
+            if current_cost > costs[current_slot]:
+                continue
+            results.append((hexagons[current_slot], budget - current_cost))
+
+            first_neighbor = 6 * current_slot
+            for neighbor_slot in neighbor_slots[first_neighbor:first_neighbor + 6]:
+                if neighbor_slot < 0:
+                    continue
+                step_cost = entry_costs[neighbor_slot]
+                if step_cost == INFINITY:
+                    continue
+                new_cost = current_cost + step_cost
+                if new_cost > budget:
+                    continue
+                if stamps[neighbor_slot] != search or new_cost < costs[neighbor_slot]:
+                    stamps[neighbor_slot] = search
+                    costs[neighbor_slot] = new_cost
+                    heappush(open_heap, (new_cost, neighbor_slot))
+        return results
+
+    def __find_path_by_key(self, from_hex: HexagonDataType, to_hex: HexagonDataType,
+                           min_cost: Optional[float]) -> list[HexagonDataType]:
+        """
+        find_path for grids without a GridIndex: the same search, over packed keys, with
+        every hexagon looked up in the grid as it is reached.
+        """
+        get_hex_by_packed_key = self.grid.get_hex_by_packed_key
+        start_key = from_hex.get_coords().to_packed_key()
+        goal_key = to_hex.get_coords().to_packed_key()
+        if get_hex_by_packed_key(start_key) is None or get_hex_by_packed_key(goal_key) is None:
+            return []
+        if start_key == goal_key:
+            return [from_hex]
+        entry_costs = _KeyEntryCosts(get_hex_by_packed_key)
+        if entry_costs[goal_key] == INFINITY:
+            return []
+        if min_cost is None:
+            # Finding the smallest cost would mean reading every hexagon of the storage.
+            min_cost = 0.0
+
+        neighbor_offsets = HexagonGridImpl.NEIGHBOR_KEY_OFFSETS
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        goal_x, goal_z = CubeCoordinate.unpack(goal_key)
+        costs = {start_key: 0.0}
+        came_from: dict[int, int] = {}
+        open_heap: list[tuple[float, float, int]] = [(0.0, 0.0, start_key)]
+        while open_heap:
+            _, current_cost, current_key = heappop(open_heap)
+            if current_key == goal_key:
+                path_keys = [goal_key]
+                while path_keys[-1] != start_key:
+                    path_keys.append(came_from[path_keys[-1]])
+                return [get_hex_by_packed_key(packed_key) for packed_key in reversed(path_keys)]
+            if current_cost > costs[current_key]:
+                continue
+
+            for offset in neighbor_offsets:
+                neighbor_key = current_key + offset
+                step_cost = entry_costs[neighbor_key]
+                if step_cost == INFINITY:
+                    continue
+                new_cost = current_cost + step_cost
+                if new_cost < costs.get(neighbor_key, INFINITY):
+                    costs[neighbor_key] = new_cost
+                    came_from[neighbor_key] = current_key
+                    neighbor_x = (neighbor_key + 0x80000000) >> 32
+                    diff_x = neighbor_x - goal_x
+                    diff_z = neighbor_key - (neighbor_x << 32) - goal_z
+                    heappush(open_heap, (new_cost + min_cost * max(abs(diff_x), abs(diff_z), abs(diff_x + diff_z)),
+                                         new_cost, neighbor_key))
+        return []
+
+    def __flow_field_by_key(self, goals: Iterable[HexagonDataType], max_cost: float) -> FlowField:
+        """
+        calc_flow_field for grids without a GridIndex. The search runs over packed keys, and
+        the field gets an index over the hexagons it reached.
+        """
+        get_hex_by_packed_key = self.grid.get_hex_by_packed_key
+        entry_costs = _KeyEntryCosts(get_hex_by_packed_key)
+        neighbor_offsets = HexagonGridImpl.NEIGHBOR_KEY_OFFSETS
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        costs: dict[int, float] = {}
+        directions: dict[int, int] = {}
+        open_heap: list[tuple[float, int]] = []
+        for goal in goals:
+            goal_key = goal.get_coords().to_packed_key()
+            if entry_costs[goal_key] != INFINITY:
+                costs[goal_key] = 0.0
+                directions[goal_key] = FlowField.NO_DIRECTION
+                open_heap.append((0.0, goal_key))
+        heapq.heapify(open_heap)
+
+        reached = DefaultHexagonDataStorage()
+        while open_heap:
+            current_cost, current_key = heappop(open_heap)
+            if reached.contains_key(current_key):
+                continue
+            current_hex = get_hex_by_packed_key(current_key)
+            reached.add_coord_with_data(current_hex.get_coords(), current_hex)
+
+            new_cost = current_cost + entry_costs[current_key]
+            if new_cost > max_cost:
+                continue
+            for direction, offset in enumerate(neighbor_offsets):
+                neighbor_key = current_key + offset
+                if reached.contains_key(neighbor_key) or new_cost >= costs.get(neighbor_key, INFINITY):
+                    continue
+                if entry_costs[neighbor_key] == INFINITY:
+                    continue
+                costs[neighbor_key] = new_cost
+                directions[neighbor_key] = (direction + 3) % 6
+                heappush(open_heap, (new_cost, neighbor_key))
+
+        field = FlowField(GridIndex.for_storage(reached))
+        for slot, packed_key in enumerate(field.index.keys):
+            field.costs[slot] = costs[packed_key]
+            field.directions[slot] = directions[packed_key]
+        field.reached_count = len(field.index)
+        return field
+
+    def __reachable_by_key(self, hexagon: HexagonDataType, budget: float) -> list[tuple[HexagonDataType, float]]:
+        """
+        calc_reachable_from for grids without a GridIndex, searching over packed keys.
+        """
+        get_hex_by_packed_key = self.grid.get_hex_by_packed_key
+        start_key = hexagon.get_coords().to_packed_key()
+        if get_hex_by_packed_key(start_key) is None:
+            return []
+        entry_costs = _KeyEntryCosts(get_hex_by_packed_key)
+        neighbor_offsets = HexagonGridImpl.NEIGHBOR_KEY_OFFSETS
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        results: list[tuple[HexagonDataType, float]] = []
+        costs = {start_key: 0.0}
+        open_heap: list[tuple[float, int]] = [(0.0, start_key)]
+        while open_heap:
+            current_cost, current_key = heappop(open_heap)
+            if current_cost > costs[current_key]:
+                continue
+            results.append((get_hex_by_packed_key(current_key), budget - current_cost))
+
+            for offset in neighbor_offsets:
+                neighbor_key = current_key + offset
+                step_cost = entry_costs[neighbor_key]
+                if step_cost == INFINITY:
+                    continue
+                new_cost = current_cost + step_cost
+                if new_cost <= budget and new_cost < costs.get(neighbor_key, INFINITY):
+                    costs[neighbor_key] = new_cost
+                    heappush(open_heap, (new_cost, neighbor_key))
+        return results
+
+    def __start_search(self, index: GridIndex) -> int:
+        """
+        Sizes the visit buffers for the given index and returns the stamp of a new search.
+        """
+        if self.__search_index is not index:
+            self.__search_index = index
+            self.__search = 0
+            self.__search_stamps = array('q', [0]) * len(index)
+            self.__search_costs = array('d', [0.0]) * len(index)
+            self.__search_came_from = array('q', [0]) * len(index)
+        self.__search += 1
+        return self.__search
+
+    def __entry_costs(self, index: GridIndex):
+        """
+        :return: The cost of entering each slot of the index, infinity where it is not passable.
+                 With satellite columns enabled this is their entry_costs column, read as is.
+        """
+        satellite_columns = self.grid.grid_data.satellite_columns
+        if satellite_columns is None:
+            return _SatelliteEntryCosts(index.hexagons)
+        satellite_columns.align(index)
+        return satellite_columns.entry_costs
+
+    @staticmethod
+    def __smallest_entry_cost(index: GridIndex, entry_costs) -> float:
+        """
+        :return: The smallest cost of entering a passable slot, for scaling the find_path
+                 heuristic. Never negative, and 0 if no slot is passable.
+        """
+        if isinstance(entry_costs, array):
+            smallest = min(entry_costs, default=0.0)
+        else:
+            smallest = min((entry_costs[slot] for slot in range(len(index))), default=0.0)
+        if smallest == INFINITY or smallest < 0.0:
+            return 0.0
+        return smallest
+
+    def __rebuild_path(self, index: GridIndex, start_slot: int, goal_slot: int) -> list[HexagonDataType]:
+        came_from = self.__search_came_from
+        path_slots = [goal_slot]
+        while path_slots[-1] != start_slot:
+            path_slots.append(came_from[path_slots[-1]])
+        hexagons = index.hexagons
+        return [hexagons[slot] for slot in reversed(path_slots)]
+
+    @staticmethod
+    def movement_cost_of(hexagon: HexagonDataType) -> float | None:
+        """
+        :return: The cost of entering the given hexagon, or None if it is not passable.
+        """
+        satellite = hexagon.get_satellite()
+        if satellite is None:
+            return 1.0
+        if not satellite.isPassable:
+            return None
+        return satellite.movementCost
 
     def cube_linear_interpolate(self, from_cube: CubeCoordinate, to_cube: CubeCoordinate, sample: float) \
             -> CubeCoordinate:
@@ -97,23 +1271,4 @@ class HexagonGridCalculator(Generic[HexagonDataType, SatelliteDataType]):
 
     @staticmethod
     def round_to_cube_coord(grid_x: float, grid_y: float, grid_z: float) -> CubeCoordinate:
-        round_x = round(grid_x)
-        round_y = round(grid_y)
-        round_z = round(grid_z)
-
-        diff_x = abs(round_x - grid_x)
-        diff_y = abs(round_y - grid_y)
-        diff_z = abs(round_z - grid_z)
-
-        result_x = round_x
-        result_z = round_z
-
-        if diff_x > diff_y and diff_x > diff_z:
-            result_x = -round_y - round_z
-        elif diff_y <= diff_z:
-            result_z = -round_x - round_y
-
-        return CubeCoordinate(result_x, result_z)
-
-
-
+        return CoordinateConverter.round_to_cube_coord(grid_x, grid_y, grid_z)
@@ -6,6 +6,15 @@ from enum import Enum
 
 
 class CubeCoordinate:
+    """
+    An immutable cube coordinate. Only x and z are stored; y is derived.
+
+    Instances use __slots__ and hash without building a tuple, since they are
+    created and looked up constantly by the grid and calculator. Use a
+    CubeCoordinatePool to share one object between equal coordinates.
+    """
+
+    __slots__ = ('gridX', 'gridZ')
 
     POINTY_TOP = 'POINTY_TOP'
     FLAT_TOP = 'FLAT_TOP'
@@ -14,8 +23,8 @@ class CubeCoordinate:
     orientation_offsets: dict[str, float] = {POINTY_TOP: 0.5, FLAT_TOP: 0.0}
 
     def __init__(self, x: int, z: int):
-        self.gridX = x
-        self.gridZ = z
+        _set_attribute(self, 'gridX', x)
+        _set_attribute(self, 'gridZ', z)
 
     def grid_y(self) -> int:
         return -(self.gridX + self.gridZ)
@@ -28,22 +37,94 @@ class CubeCoordinate:
         key_parts = axial_key.split(",")
         return CubeCoordinate(int(key_parts[0]), int(key_parts[1]))
 
-    def __key(self):
-        return self.gridX, self.gridZ
+    @staticmethod
+    def pack(x: int, z: int) -> int:
+        """
+        Packs axial (x, z) into a single int: x in the high 32 bits and z in the low
+        32 bits, both signed. Both values must fit in a signed 32 bit int. This is the
+        key the storage, grid and calculator use internally, and it fits in an int64.
+        """
+        return (x << 32) + z
+
+    @staticmethod
+    def unpack(packed_key: int) -> tuple[int, int]:
+        """
+        :param packed_key: A key produced by pack.
+        :return: The (x, z) pair that was packed.
+        """
+        x = (packed_key + 0x80000000) >> 32
+        return x, packed_key - (x << 32)
+
+    def to_packed_key(self) -> int:
+        return (self.gridX << 32) + self.gridZ
+
+    @staticmethod
+    def from_packed_key(packed_key: int) -> CubeCoordinate:
+        x = (packed_key + 0x80000000) >> 32
+        return CubeCoordinate(x, packed_key - (x << 32))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CubeCoordinate is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CubeCoordinate is immutable")
+
+    def __reduce__(self):
+        return CubeCoordinate, (self.gridX, self.gridZ)
 
     def __lt__(self, o: object) -> bool:
-        return self.__key() < o.__key()
+        return (self.gridX, self.gridZ) < (o.gridX, o.gridZ)
 
     def __hash__(self):
-        return hash(self.__key())
+        # The packed key, so no tuple is built per call.
+        return (self.gridX << 32) + self.gridZ
 
     def __eq__(self, other):
-        return self.__key() == other.__key()
+        try:
+            return self.gridX == other.gridX and self.gridZ == other.gridZ
+        except AttributeError:
+            return NotImplemented
 
     def __repr__(self) -> str:
         return "Coord: " + str(self.gridX) + ", " + str(self.grid_y()) + ", " + str(self.gridZ)
 
 
+# CubeCoordinate blocks normal attribute assignment, so __init__ goes through object directly.
+_set_attribute = object.__setattr__
+
+
+class CubeCoordinatePool:
+    """
+    Interns CubeCoordinates so that equal coordinates share a single object. A grid
+    can own one of these to keep the number of live coordinates down to one per cell.
+    The pool holds on to everything interned until it is cleared, so only intern
+    coordinates that are meant to stay around (HexagonGridImpl only interns the ones
+    in its storage).
+    """
+
+    __slots__ = ('_coords',)
+
+    def __init__(self):
+        self._coords: dict[CubeCoordinate, CubeCoordinate] = {}
+
+    def intern(self, coord: CubeCoordinate) -> CubeCoordinate:
+        """
+        :param coord:
+        :return: The pooled coordinate equal to the given one. The given coordinate
+                 is added to the pool if no equal coordinate exists yet.
+        """
+        return self._coords.setdefault(coord, coord)
+
+    def get(self, x: int, z: int) -> CubeCoordinate:
+        return self.intern(CubeCoordinate(x, z))
+
+    def clear(self):
+        self._coords.clear()
+
+    def __len__(self) -> int:
+        return len(self._coords)
+
+
 class RotationBase(ABC):
 
     @abstractmethod
@@ -92,6 +173,31 @@ class CoordinateConverter:
         else:
             return offset_y
 
+    @staticmethod
+    def round_to_cube_coord(grid_x: float, grid_y: float, grid_z: float) -> CubeCoordinate:
+        """
+        Rounds fractional cube values to the nearest valid cube coordinate. The component
+        with the largest rounding error is recomputed from the other two so that the
+        result still satisfies x + y + z == 0.
+        """
+        round_x = round(grid_x)
+        round_y = round(grid_y)
+        round_z = round(grid_z)
+
+        diff_x = abs(round_x - grid_x)
+        diff_y = abs(round_y - grid_y)
+        diff_z = abs(round_z - grid_z)
+
+        result_x = round_x
+        result_z = round_z
+
+        if diff_x > diff_y and diff_x > diff_z:
+            result_x = -round_y - round_z
+        elif diff_y <= diff_z:
+            result_z = -round_x - round_y
+
+        return CubeCoordinate(result_x, result_z)
+
     @staticmethod
     def cube_coords_to_offset_row(coord: CubeCoordinate, orientation: str):
         if CubeCoordinate.FLAT_TOP == orientation:
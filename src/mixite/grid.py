@@ -2,13 +2,16 @@ from __future__ import annotations  # This enables us to type hint a class withi
 
 import math
 from abc import abstractmethod, ABC
-from typing import Generic, Type
+from array import array
+from typing import Generic, Iterable, Iterator, Optional, Type
 
+from mixite._optional import has_numpy, require_numpy
 from mixite.shapes import Point
 from mixite.hex import HexagonDataType, GridData
-from mixite.storage import HexagonDataStorage
-from mixite.coord import CoordinateConverter, CubeCoordinate
-from mixite.location_metadata import SatelliteDataType
+from mixite.storage import DenseHexagonDataStorage, HexagonDataStorage, LazyDenseHexagonDataStorage
+from mixite.coord import CoordinateConverter, CubeCoordinate, CubeCoordinatePool
+from mixite.layout import GridLayoutStrategy
+from mixite.location_metadata import SatelliteColumns, SatelliteData, SatelliteDataType
 
 
 class HexagonGrid(ABC, Generic[HexagonDataType, SatelliteDataType]):
@@ -21,6 +24,14 @@ class HexagonGrid(ABC, Generic[HexagonDataType, SatelliteDataType]):
     def get_hexagons_by_offset_range(self, from_x: int, to_x: int, from_y: int, to_y: int) -> list[HexagonDataType]:
         pass
 
+    def iter_hexagons_by_cube_range(self, from_coord: CubeCoordinate, to_coord: CubeCoordinate) \
+            -> Iterator[HexagonDataType]:
+        return iter(self.get_hexagons_by_cube_range(from_coord, to_coord))
+
+    def iter_hexagons_by_offset_range(self, from_x: int, to_x: int, from_y: int, to_y: int) \
+            -> Iterator[HexagonDataType]:
+        return iter(self.get_hexagons_by_offset_range(from_x, to_x, from_y, to_y))
+
     @abstractmethod
     def contains_coord(self, coord: CubeCoordinate) -> bool:
         pass
@@ -29,10 +40,41 @@ class HexagonGrid(ABC, Generic[HexagonDataType, SatelliteDataType]):
     def get_hex_by_cube_coord(self, coord: CubeCoordinate) -> HexagonDataType:
         pass
 
+    def get_hex_by_packed_key(self, packed_key: int) -> HexagonDataType | None:
+        coord = CubeCoordinate.from_packed_key(packed_key)
+        return self.get_hex_by_cube_coord(coord) if self.contains_coord(coord) else None
+
     @abstractmethod
     def get_hex_by_pixel_coord(self, coord_x: float, coord_y: float) -> HexagonDataType:
         pass
 
+    def get_index(self) -> GridIndex | None:
+        """
+        :return: The grid's GridIndex, or None if it has none. Without one, searches look
+                 hexagons up one key at a time.
+        """
+        return None
+
+    def get_row_range(self) -> tuple[int, int] | None:
+        """
+        :return: The smallest and largest cube z of the grid's layout, or None if it is not known.
+        """
+        return None
+
+    def get_row_bounds(self, z: int) -> tuple[int, int] | None:
+        """
+        :return: The first and last cube x of row z of the grid's layout, or None if the row
+                 is empty or the layout is not known.
+        """
+        return None
+
+    def get_hex_by_pixel_coord_exact(self, coord_x: float, coord_y: float) -> HexagonDataType | None:
+        """
+        Grids that know their geometry return the hexagon whose area contains the pixel. This
+        default falls back to get_hex_by_pixel_coord.
+        """
+        return self.get_hex_by_pixel_coord(coord_x, coord_y)
+
     @abstractmethod
     def get_coord_by_neighbor_index(self, coord: CubeCoordinate, index: int) -> CubeCoordinate:
         pass
@@ -50,40 +92,353 @@ class HexagonGrid(ABC, Generic[HexagonDataType, SatelliteDataType]):
         pass
 
 
+class GridIndex(Generic[HexagonDataType]):
+    """
+    A snapshot of a grid's storage that numbers every hexagon with a slot (0 to n - 1) and
+    precomputes its neighbors, so searches can walk the grid with integer indexing instead of
+    building coordinates and hashing them. Use for_storage to get the best index for a storage.
+
+    keys and hexagons are indexed by slot, and slot_of_key maps a packed key back to its slot.
+    neighbor_slots is the adjacency table: the neighbors of slot s are at
+    neighbor_slots[6 * s:6 * s + 6], in NEIGHBOR_COORDS order, with NO_NEIGHBOR where the
+    grid has no hexagon. Every hexagon has at most six neighbors, so a fixed stride of six
+    replaces the row offsets of a CSR layout.
+    """
+
+    NO_NEIGHBOR = -1
+
+    def __init__(self, storage: HexagonDataStorage):
+        self.version = storage.version
+        self.keys = array('q')
+        self.hexagons: list[HexagonDataType] = []
+        self.neighbor_slots = array('q')
+        self._load(storage)
+
+    @staticmethod
+    def for_storage(storage: HexagonDataStorage) -> GridIndex:
+        if isinstance(storage, DenseHexagonDataStorage):
+            return DenseGridIndex(storage)
+        return GridIndex(storage)
+
+    def _load(self, storage: HexagonDataStorage):
+        keys = self.keys
+        hexagons = self.hexagons
+        get_data_for_key = storage.get_data_for_key
+        for packed_key in storage.iter_keys():
+            hexagon = get_data_for_key(packed_key)
+            if hexagon is not None:
+                keys.append(packed_key)
+                hexagons.append(hexagon)
+
+        self._slot_of: dict[int, int] = {packed_key: slot for slot, packed_key in enumerate(keys)}
+        if has_numpy() and len(keys) > 0:
+            np = require_numpy()
+            # With the keys sorted, each neighbor direction is a single searchsorted call.
+            order = np.argsort(np.frombuffer(keys, dtype=np.int64), kind='stable')
+            sorted_keys = np.frombuffer(keys, dtype=np.int64)[order]
+            table = np.full((len(keys), 6), self.NO_NEIGHBOR, dtype=np.int64)
+            for index, offset in enumerate(HexagonGridImpl.NEIGHBOR_KEY_OFFSETS):
+                wanted = sorted_keys + offset
+                positions = np.minimum(np.searchsorted(sorted_keys, wanted), len(keys) - 1)
+                table[order, index] = np.where(sorted_keys[positions] == wanted, order[positions], self.NO_NEIGHBOR)
+            self.neighbor_slots.frombytes(table.data.cast('B'))
+        else:
+            slot_of_get = self._slot_of.get
+            no_neighbor = self.NO_NEIGHBOR
+            for packed_key in keys:
+                self.neighbor_slots.extend([slot_of_get(packed_key + offset, no_neighbor)
+                                            for offset in HexagonGridImpl.NEIGHBOR_KEY_OFFSETS])
+
+    def slot_of_key(self, packed_key: int) -> int:
+        """
+        :return: The slot of the hexagon with the given key, or NO_NEIGHBOR if there is none.
+        """
+        return self._slot_of.get(packed_key, self.NO_NEIGHBOR)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+class DenseGridIndex(GridIndex):
+    """
+    GridIndex for a DenseHexagonDataStorage. Instead of a dict, the slot lookup reuses the
+    storage's bounding box: one int per storage slot, holding the index slot or NO_NEIGHBOR.
+    Neighbors are found with the same index arithmetic.
+
+    For a LazyDenseHexagonDataStorage, hexagons is a PendingHexagons sequence, so building
+    the index does not make the storage create its pending hexagons.
+    """
+
+    def _load(self, storage: DenseHexagonDataStorage):
+        self.min_x = storage.min_x
+        self.min_z = storage.min_z
+        self.span_x = storage.span_x
+        self.span_z = storage.span_z
+        if has_numpy():
+            self.__load_numpy(storage)
+            return
+
+        storage_slots = storage.slots
+        pending = storage.pending if isinstance(storage, LazyDenseHexagonDataStorage) else None
+        self._storage_to_slot = array('q', [self.NO_NEIGHBOR]) * (self.span_x * self.span_z)
+        for storage_slot, occupied in enumerate(storage.occupied):
+            # Pending slots go first, a read-only storage has no slot list to check.
+            has_data = (pending is not None and pending[storage_slot]) or storage_slots[storage_slot] is not None
+            if occupied and has_data:
+                offset_z, offset_x = divmod(storage_slot, self.span_x)
+                self._storage_to_slot[storage_slot] = len(self.keys)
+                self.keys.append(CubeCoordinate.pack(self.min_x + offset_x, self.min_z + offset_z))
+                if pending is None:
+                    self.hexagons.append(storage_slots[storage_slot])
+        if pending is not None:
+            self.hexagons = PendingHexagons(storage, self.keys)
+        slot_of_key = self.slot_of_key
+        for packed_key in self.keys:
+            self.neighbor_slots.extend([slot_of_key(packed_key + offset)
+                                        for offset in HexagonGridImpl.NEIGHBOR_KEY_OFFSETS])
+
+    @classmethod
+    def from_arrays(cls, storage: LazyDenseHexagonDataStorage, keys, neighbor_slots, storage_to_slot) -> DenseGridIndex:
+        """
+        An index over arrays that were built before, such as the ones a snapshot was saved
+        with (see mixite.snapshot). They can be any int64 sequences, including memoryviews
+        over a mapped file, and are used as is. The hexagons are a PendingHexagons sequence.
+        :param storage_to_slot: The index slot of every storage slot, or NO_NEIGHBOR.
+        """
+        index = cls.__new__(cls)
+        index.version = storage.version
+        index.min_x = storage.min_x
+        index.min_z = storage.min_z
+        index.span_x = storage.span_x
+        index.span_z = storage.span_z
+        index.keys = keys
+        index.neighbor_slots = neighbor_slots
+        index._storage_to_slot = storage_to_slot
+        index.hexagons = PendingHexagons(storage, keys)
+        return index
+
+    def __load_numpy(self, storage: DenseHexagonDataStorage):
+        np = require_numpy()
+        storage_slots = storage.slots
+        candidates = np.flatnonzero(np.frombuffer(storage.occupied, dtype=np.uint8))
+        if isinstance(storage, LazyDenseHexagonDataStorage):
+            # Pending slots have data by definition, so only the others need their hexagon checked.
+            has_data = np.frombuffer(storage.pending, dtype=np.uint8)[candidates] == 1
+            created = candidates[~has_data]
+            has_data[~has_data] = np.fromiter((storage_slots[storage_slot] is not None
+                                               for storage_slot in created.tolist()), dtype=bool, count=len(created))
+            used_slots = candidates[has_data]
+            self.hexagons = PendingHexagons(storage, self.keys)
+        else:
+            hexagons = [storage_slots[storage_slot] for storage_slot in candidates.tolist()]
+            has_data = np.fromiter((hexagon is not None for hexagon in hexagons), dtype=bool, count=len(hexagons))
+            used_slots = candidates[has_data]
+            self.hexagons.extend(hexagon for hexagon in hexagons if hexagon is not None)
+
+        offset_zs, offset_xs = np.divmod(used_slots, self.span_x)
+        keys = ((offset_xs + self.min_x) << 32) + offset_zs + self.min_z
+        self.keys.frombytes(keys.astype(np.int64).data.cast('B'))
+        storage_to_slot = np.full(self.span_x * self.span_z, self.NO_NEIGHBOR, dtype=np.int64)
+        storage_to_slot[used_slots] = np.arange(len(used_slots))
+        self._storage_to_slot = array('q')
+        self._storage_to_slot.frombytes(storage_to_slot.data.cast('B'))
+
+        table = np.empty((len(used_slots), 6), dtype=np.int64)
+        for index, (step_x, step_z) in enumerate(HexagonGridImpl.NEIGHBOR_COORDS):
+            neighbor_xs = offset_xs + step_x
+            neighbor_zs = offset_zs + step_z
+            in_bounds = (neighbor_xs >= 0) & (neighbor_xs < self.span_x) & (neighbor_zs >= 0) & (neighbor_zs < self.span_z)
+            neighbor_storage_slots = np.where(in_bounds, neighbor_zs * self.span_x + neighbor_xs, 0)
+            table[:, index] = np.where(in_bounds, storage_to_slot[neighbor_storage_slots], self.NO_NEIGHBOR)
+        # Viewed as flat bytes rather than cast, which memoryview refuses for empty grids.
+        self.neighbor_slots.frombytes(table.reshape(-1).view(np.uint8))
+
+    def slot_of_key(self, packed_key: int) -> int:
+        cube_x = (packed_key + 0x80000000) >> 32
+        offset_x = cube_x - self.min_x
+        offset_z = packed_key - (cube_x << 32) - self.min_z
+        if 0 <= offset_x < self.span_x and 0 <= offset_z < self.span_z:
+            return self._storage_to_slot[offset_z * self.span_x + offset_x]
+        return self.NO_NEIGHBOR
+
+
+class PendingHexagons(Generic[HexagonDataType]):
+    """
+    The hexagons of a DenseGridIndex over a LazyDenseHexagonDataStorage. Indexing by slot
+    asks the storage for the hexagon with that slot's key, which creates it the first time.
+    """
+
+    __slots__ = ('storage', 'keys')
+
+    def __init__(self, storage: LazyDenseHexagonDataStorage, keys):
+        self.storage = storage
+        self.keys = keys
+
+    def __getitem__(self, slot: int) -> HexagonDataType:
+        return self.storage.get_data_for_key(self.keys[slot])
+
+    def __iter__(self) -> Iterator[HexagonDataType]:
+        get_data_for_key = self.storage.get_data_for_key
+        return (get_data_for_key(packed_key) for packed_key in self.keys)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
 class HexagonGridImpl(HexagonGrid):
 
     NEIGHBOR_COORDS: list[list[int]] = [[1, 0], [1, -1], [0, -1], [-1, 0], [-1, 1], [0, 1]]
     NEIGHBOR_X_INDEX = 0
     NEIGHBOR_Z_INDEX = 1
-
-    def __init__(self, grid_data: GridData, storage: HexagonDataStorage):
+    # NEIGHBOR_COORDS as packed key deltas. Packing is linear, so key + delta is the neighbor's key.
+    NEIGHBOR_KEY_OFFSETS: list[int] = [CubeCoordinate.pack(x, z) for x, z in NEIGHBOR_COORDS]
+
+    def __init__(self, grid_data: GridData, storage: HexagonDataStorage,
+                 coord_pool: Optional[CubeCoordinatePool] = None, layout: Optional[GridLayoutStrategy] = None,
+                 index: Optional[GridIndex] = None):
+        """
+        :param grid_data:
+        :param storage:
+        :param coord_pool: Optional pool used to intern the coordinates this grid hands out,
+                           so that equal coordinates share one object.
+        :param layout: The layout the storage was filled from, if any. It lets ring and spiral
+                       traversals clip against the grid's shape without lookups.
+        :param index: An index already built for the storage in its current state, used by
+                      get_index until the storage changes.
+        """
         self.grid_data: GridData = grid_data
         self.hexagons: list[HexagonDataType] = []
         self.storage: HexagonDataStorage = storage
+        self.coord_pool: Optional[CubeCoordinatePool] = coord_pool
+        self._index: Optional[GridIndex] = index
+        self.layout: Optional[GridLayoutStrategy] = layout
+
+    def get_row_range(self) -> tuple[int, int] | None:
+        """
+        :return: The smallest and largest cube z of the grid's layout, or None without a layout.
+        """
+        if self.layout is None:
+            return None
+        grid_data = self.grid_data
+        return self.layout.get_row_range(grid_data.gridWidth, grid_data.gridHeight, grid_data.orientation)
+
+    def get_row_bounds(self, z: int) -> tuple[int, int] | None:
+        """
+        :return: The first and last cube x of row z in the grid's layout (see
+                 GridLayoutStrategy.get_row_bounds), or None if the row is empty or the grid
+                 has no layout.
+        """
+        if self.layout is None:
+            return None
+        grid_data = self.grid_data
+        return self.layout.get_row_bounds(z, grid_data.gridWidth, grid_data.gridHeight, grid_data.orientation)
+
+    def get_index(self) -> GridIndex | None:
+        """
+        :return: The slot and adjacency index of this grid. It is built on first use and
+                 rebuilt whenever the storage's version has moved on since. None if the
+                 storage does not track its changes (see HexagonDataStorage.version), since
+                 an index over it could not tell when it is stale, or if it is paged, since
+                 an index would hold every hexagon in memory.
+        """
+        version = self.storage.version
+        if version is None or self.storage.paged:
+            return None
+        index = self._index
+        if index is None or index.version != version:
+            index = self._index = GridIndex.for_storage(self.storage)
+        return index
+
+    def enable_satellite_columns(self, columns: Optional[SatelliteColumns] = None) -> SatelliteColumns:
+        """
+        Moves the satellites of the hexagons on this grid into a SatelliteColumns store, one
+        typed array per field indexed by the slots of get_index. From then on get_satellite
+        returns views over the columns and set_satellite copies into them. Hexagons that are
+        not in the storage keep holding their satellite objects.
+        :param columns: A store already filled for this grid (see SatelliteColumns.from_buffers)
+                        to use as is, instead of copying the hexagons' satellites.
+        :raises TypeError, ValueError: If the grid has no index (see get_index), or a satellite
+                                       cannot be stored in the columns without losing
+                                       something (see SatelliteColumns.write). The hexagons
+                                       are left as they were.
+        :return: The store, which is also kept as grid_data.satellite_columns.
+        """
+        if self.get_index() is None:
+            raise TypeError("Satellite columns need a grid index, which this grid's storage does not support.")
+        if columns is not None:
+            columns.notify = self.__satellite_column_changed
+            self.grid_data.satellite_columns = columns
+            return columns
+        if self.grid_data.satellite_columns is not None:
+            return self.grid_data.satellite_columns
+        columns = SatelliteColumns(self.get_index, self.__satellite_column_changed)
+        moved = []
+        for slot, hexagon in enumerate(columns.index.hexagons):
+            satellite = hexagon.get_satellite()
+            if satellite is not None:
+                columns.write(slot, satellite)
+                moved.append(hexagon)
+        # Only let go of the satellite objects once every one of them fit the columns.
+        for hexagon in moved:
+            hexagon._satellite = None
+        self.grid_data.satellite_columns = columns
+        return columns
+
+    def disable_satellite_columns(self):
+        """
+        Gives every hexagon on this grid its own SatelliteData object back, copied from the columns.
+        """
+        columns = self.grid_data.satellite_columns
+        if columns is None:
+            return
+        columns.align(self.get_index())
+        self.grid_data.satellite_columns = None
+        for slot, hexagon in enumerate(columns.index.hexagons):
+            hexagon._satellite = columns.snapshot(slot)
+
+    def __satellite_column_changed(self, slot: int, old_satellite: SatelliteData):
+        if self.grid_data.satellite_listeners:
+            hexagon = self.get_index().hexagons[slot]
+            self.grid_data.notify_satellite_changed(hexagon, old_satellite)
+
+    def get_coord(self, x: int, z: int) -> CubeCoordinate:
+        """
+        :return: A coordinate for the given cube values. If this grid has a coordinate pool and
+                 the coordinate is in the storage, it is interned. Coordinates off the grid,
+                 such as the neighbors of edge hexagons, are not, so the pool stays bounded by
+                 the size of the grid.
+        """
+        if self.coord_pool is None or not self.storage.contains_key(CubeCoordinate.pack(x, z)):
+            return CubeCoordinate(x, z)
+        return self.coord_pool.get(x, z)
 
     def get_hexagons_by_cube_range(self, from_coord: CubeCoordinate, to_coord: CubeCoordinate) -> list[HexagonDataType]:
-        coords: list[HexagonDataType] = []
+        return list(self.iter_hexagons_by_cube_range(from_coord, to_coord))
 
-        for grid_z in range(from_coord.gridZ, to_coord.gridZ + 1):
-            for grid_x in range(from_coord.gridX, to_coord.gridX + 1):
-                coord: CubeCoordinate = CubeCoordinate(grid_x, grid_z)
-                if self.contains_coord(coord):
-                    coords.append(self.storage.get_data_for(coord))
-
-        return coords
+    def iter_hexagons_by_cube_range(self, from_coord: CubeCoordinate, to_coord: CubeCoordinate) \
+            -> Iterator[HexagonDataType]:
+        """
+        Generator form of get_hexagons_by_cube_range. Yields the same hexagons in the same
+        order, one at a time, so callers can stop early without visiting the whole range.
+        """
+        return self.storage.iter_data_by_cube_range(from_coord, to_coord)
 
     def get_hexagons_by_offset_range(self, from_x: int, to_x: int, from_y: int, to_y: int) -> list[HexagonDataType]:
-        coords: list[HexagonDataType] = []
-
+        return list(self.iter_hexagons_by_offset_range(from_x, to_x, from_y, to_y))
+
+    def iter_hexagons_by_offset_range(self, from_x: int, to_x: int, from_y: int, to_y: int) \
+            -> Iterator[HexagonDataType]:
+        """
+        Generator form of get_hexagons_by_offset_range.
+        """
+        storage = self.storage
         for grid_x in range(from_x, to_x + 1):
             for grid_y in range(from_y, to_y + 1):
                 cube_x = CoordinateConverter.offset_coords_to_cube_x(grid_x, grid_y, self.grid_data.orientation)
                 cube_z = CoordinateConverter.offset_coords_to_cube_z(grid_x, grid_y, self.grid_data.orientation)
-                coord: CubeCoordinate = CubeCoordinate(cube_x, cube_z)
-                if self.contains_coord(coord):
-                    coords.append(self.storage.get_data_for(coord))
-
-        return coords
+                packed_key = CubeCoordinate.pack(cube_x, cube_z)
+                if storage.contains_key(packed_key):
+                    yield storage.get_data_for_key(packed_key)
 
     def contains_coord(self, coord: CubeCoordinate) -> bool:
         return self.storage.contains(coord)
@@ -91,19 +446,85 @@ class HexagonGridImpl(HexagonGrid):
     def get_hex_by_cube_coord(self, coord: CubeCoordinate) -> HexagonDataType:
         return self.storage.get_data_for(coord)
 
+    def get_hex_by_packed_key(self, packed_key: int) -> HexagonDataType | None:
+        return self.storage.get_data_for_key(packed_key)
+
     def get_hex_by_pixel_coord(self, coord_x: float, coord_y: float) -> HexagonDataType | None:
         est_grid_x = math.floor(coord_x / self.grid_data.hexagonWidth)
         est_grid_y = math.floor(coord_y / self.grid_data.hexagonHeight)
         # Warning: This does not match the Kotlin code!
         grid_x = CoordinateConverter.offset_coords_to_cube_x(est_grid_x, est_grid_y, self.grid_data.orientation)
         grid_z = CoordinateConverter.offset_coords_to_cube_z(est_grid_x, est_grid_y, self.grid_data.orientation)
-        hexagon = self.storage.get_data_for(self.storage.get_for_coords(grid_x, grid_z))
+        hexagon = self.storage.get_data_for_key(CubeCoordinate.pack(grid_x, grid_z))
 
         if hexagon is None:
             return None
 
         return self.get_nearest_hex_by_pixel(hexagon, Point(coord_x, coord_y))
 
+    def get_hex_by_pixel_coord_exact(self, coord_x: float, coord_y: float) -> HexagonDataType | None:
+        """
+        Returns the hexagon whose area contains the given pixel, or None if that hexagon is
+        not on the grid. Unlike get_hex_by_pixel_coord, this never probes neighbors: the
+        pixel is converted to fractional axial coordinates and cube-rounded, then looked up once.
+        """
+        return self.storage.get_data_for_key(self.get_coord_by_pixel_coord(coord_x, coord_y).to_packed_key())
+
+    def get_coord_by_pixel_coord(self, coord_x: float, coord_y: float) -> CubeCoordinate:
+        """
+        Converts a pixel to the coordinate of the hexagon containing it. The coordinate
+        is not guaranteed to be on the grid.
+
+        This inverts HexagonImpl.calculate_center:
+            FLAT_TOP:   x = (px - radius) / width,  z = py / height - (x + 1) / 2
+            POINTY_TOP: z = (py - radius) / height, x = px / width - (z + 1) / 2
+        """
+        grid_data = self.grid_data
+        if CubeCoordinate.FLAT_TOP == grid_data.orientation:
+            frac_x = (coord_x - grid_data.radius) / grid_data.hexagonWidth
+            frac_z = coord_y / grid_data.hexagonHeight - (frac_x + 1.0) / 2.0
+        else:
+            frac_z = (coord_y - grid_data.radius) / grid_data.hexagonHeight
+            frac_x = coord_x / grid_data.hexagonWidth - (frac_z + 1.0) / 2.0
+        return CoordinateConverter.round_to_cube_coord(frac_x, -frac_x - frac_z, frac_z)
+
+    def get_coords_by_pixel_arrays(self, coords_x, coords_y):
+        """
+        Vectorized form of get_coord_by_pixel_coord for batches of pixels. Requires NumPy.
+        :param coords_x: Array-like of pixel x values.
+        :param coords_y: Array-like of pixel y values, the same length as coords_x.
+        :return: A tuple (cube_x, cube_z, valid) of NumPy arrays. valid is a boolean mask
+                 that is True where the coordinate is on the grid.
+        """
+        np = require_numpy()
+        grid_data = self.grid_data
+        coords_x = np.asarray(coords_x, dtype=np.float64)
+        coords_y = np.asarray(coords_y, dtype=np.float64)
+
+        if CubeCoordinate.FLAT_TOP == grid_data.orientation:
+            frac_x = (coords_x - grid_data.radius) / grid_data.hexagonWidth
+            frac_z = coords_y / grid_data.hexagonHeight - (frac_x + 1.0) / 2.0
+        else:
+            frac_z = (coords_y - grid_data.radius) / grid_data.hexagonHeight
+            frac_x = coords_x / grid_data.hexagonWidth - (frac_z + 1.0) / 2.0
+        frac_y = -frac_x - frac_z
+
+        # Same rounding as CoordinateConverter.round_to_cube_coord, applied to whole arrays.
+        round_x = np.rint(frac_x)
+        round_y = np.rint(frac_y)
+        round_z = np.rint(frac_z)
+        diff_x = np.abs(round_x - frac_x)
+        diff_y = np.abs(round_y - frac_y)
+        diff_z = np.abs(round_z - frac_z)
+        fix_x = (diff_x > diff_y) & (diff_x > diff_z)
+        fix_z = ~fix_x & (diff_y <= diff_z)
+        cube_x = np.where(fix_x, -round_y - round_z, round_x).astype(np.int64)
+        cube_z = np.where(fix_z, -round_x - round_y, round_z).astype(np.int64)
+
+        # Membership is checked once per distinct cell rather than once per pixel.
+        # Keys are packed the same way as CubeCoordinate.pack.
+        return cube_x, cube_z, self.storage.contains_key_array((cube_x << 32) + cube_z)
+
     def get_nearest_hex_by_pixel(self, hexagon: HexagonDataType, pixel: Point) -> HexagonDataType:
         if pixel.distance_from(hexagon.center) < self.grid_data.innerRadius:
             return hexagon
@@ -125,24 +546,61 @@ class HexagonGridImpl(HexagonGrid):
 
         return nearest_hex
 
+    def get_vertex_buffer(self, hexagons: Optional[Iterable[HexagonDataType]] = None) -> array:
+        """
+        Emits the vertices of many hexagons as one contiguous float array, for renderers.
+        Each hexagon contributes 12 values, x0, y0, x1, y1 ... x5, y5, in the same order
+        as HexagonImpl.points. The array supports the buffer protocol, so it can be handed
+        to numpy.frombuffer or a graphics API without copying.
+        :param hexagons: The hexagons to emit, in order. Defaults to every hexagon in storage.
+        :return: An array of doubles ('d') with 12 entries per hexagon.
+        """
+        if hexagons is None:
+            hexagons = self.storage.iter_data()
+        grid_data = self.grid_data
+        offsets = [value for offset in grid_data.vertex_offsets for value in offset]
+        vertices = array('d')
+        for hexagon in hexagons:
+            coords = hexagon.get_coords()
+            center_x, center_y = grid_data.calc_center(coords.gridX, coords.gridZ)
+            vertices.extend([center_x + offsets[0], center_y + offsets[1],
+                             center_x + offsets[2], center_y + offsets[3],
+                             center_x + offsets[4], center_y + offsets[5],
+                             center_x + offsets[6], center_y + offsets[7],
+                             center_x + offsets[8], center_y + offsets[9],
+                             center_x + offsets[10], center_y + offsets[11]])
+        return vertices
+
     def get_coord_by_neighbor_index(self, coord: CubeCoordinate, index: int) -> CubeCoordinate | None:
-        return CubeCoordinate(coord.gridX + self.NEIGHBOR_COORDS[index][self.NEIGHBOR_X_INDEX],
+        return self.get_coord(coord.gridX + self.NEIGHBOR_COORDS[index][self.NEIGHBOR_X_INDEX],
                               coord.gridZ + self.NEIGHBOR_COORDS[index][self.NEIGHBOR_Z_INDEX])
 
     def get_hex_by_neighbor_index(self, hexagon: HexagonDataType, index: int) -> HexagonDataType:
-        neighbor_coord = self.get_coord_by_neighbor_index(hexagon.get_coords(), index)
-        return self.storage.get_data_for(neighbor_coord)
+        return self.get_hex_by_coord_neighbor_index(hexagon.get_coords(), index)
 
     def get_hex_by_coord_neighbor_index(self, coord: CubeCoordinate, index: int) -> HexagonDataType | None:
-        neighbor_coord = self.get_coord_by_neighbor_index(coord, index)
-        return self.storage.get_data_for(neighbor_coord)
+        offset = self.NEIGHBOR_COORDS[index]
+        return self.storage.get_data_for_key(CubeCoordinate.pack(coord.gridX + offset[self.NEIGHBOR_X_INDEX],
+                                                                 coord.gridZ + offset[self.NEIGHBOR_Z_INDEX]))
 
     def get_neighbors_of(self, hexagon: HexagonDataType) -> list[HexagonDataType]:
+        packed_key = hexagon.get_coords().to_packed_key()
+        index = self.get_index()
+        if index is not None:
+            slot = index.slot_of_key(packed_key)
+            if slot >= 0:
+                hexagons = index.hexagons
+                return [hexagons[neighbor_slot] for neighbor_slot in index.neighbor_slots[6 * slot:6 * slot + 6]
+                        if neighbor_slot >= 0]
+
+        # Storages without an index are asked key by key, as are hexagons that are not part
+        # of the grid but can still have neighbors on it.
+        get_data_for_key = self.storage.get_data_for_key
         neighbors: list[HexagonDataType] = []
-        for index in range(6):
-            neighbor = self.get_hex_by_neighbor_index(hexagon, index)
+        for offset in self.NEIGHBOR_KEY_OFFSETS:
+            neighbor = get_data_for_key(packed_key + offset)
             if neighbor is not None:
-                neighbors.append(self.get_hex_by_neighbor_index(hexagon, index))
+                neighbors.append(neighbor)
         return neighbors
 
     # TODO: Verify that this worked.
@@ -2,15 +2,17 @@ from __future__ import annotations
 
 import math
 from abc import ABC, abstractmethod
-from typing import Generic, Optional, TypeVar
+from typing import Callable, Generic, Optional, TypeVar
 
-from mixite.location_metadata import SatelliteDataType
+from mixite.location_metadata import SatelliteColumns, SatelliteDataType
 from mixite.coord import CubeCoordinate
 from mixite.shapes import Point, Rectangle
 
 
 class Hexagon(ABC, Generic[SatelliteDataType]):
 
+    __slots__ = ()
+
     @abstractmethod
     def get_satellite(self):
         pass
@@ -52,6 +54,53 @@ class GridData:
             self.hexagonWidth = self.calc_height(radius)
             self.innerRadius = self.hexagonHeight / 2.0
 
+        # Vertex positions relative to the center. They are the same for every hexagon
+        # sharing this GridData, so hexagons add these to their center instead of doing trig.
+        self.vertex_offsets: list[tuple[float, float]] = []
+        for i in range(6):
+            angle: float = 2.0 * math.pi / 6.0 * (i + CubeCoordinate.orientation_offsets[orientation])
+            self.vertex_offsets.append((radius * math.cos(angle), radius * math.sin(angle)))
+
+        # Bounding box extents relative to the center, in the same vertex terms
+        # HexagonImpl.calc_bounding_boxes uses: left = vertex 3, top = vertex 2,
+        # right = vertex 0, bottom = vertex 5.
+        self.external_box_offsets: tuple[float, float, float, float] = (
+            self.vertex_offsets[3][0], self.vertex_offsets[2][1],
+            self.vertex_offsets[0][0], self.vertex_offsets[5][1])
+
+        # Called as listener(hexagon, old_satellite) whenever a hexagon sharing this GridData
+        # gets a new satellite through set_satellite or clear_satellite.
+        self.satellite_listeners: list[Callable[[Hexagon, Optional[SatelliteDataType]], None]] = []
+        # Set by HexagonGridImpl.enable_satellite_columns. While set, the hexagons on the grid
+        # keep their satellites in these columns instead of holding satellite objects.
+        self.satellite_columns: Optional[SatelliteColumns] = None
+
+    def add_satellite_listener(self, listener: Callable[[Hexagon, Optional[SatelliteDataType]], None]):
+        self.satellite_listeners.append(listener)
+
+    def remove_satellite_listener(self, listener: Callable[[Hexagon, Optional[SatelliteDataType]], None]):
+        self.satellite_listeners.remove(listener)
+
+    def notify_satellite_changed(self, hexagon: Hexagon, old_satellite: Optional[SatelliteDataType]):
+        """
+        Tells the listeners that the hexagon's satellite was replaced. Changing the fields of a
+        satellite in place is not noticed, so callers doing that should call this themselves.
+        The exception are the views handed out with satellite columns enabled, which call it.
+        """
+        for listener in self.satellite_listeners:
+            listener(hexagon, old_satellite)
+
+    def calc_center(self, grid_x: int, grid_z: int) -> tuple[float, float]:
+        """
+        :return: The pixel position (x, y) of the center of the hexagon at the given coordinate.
+        """
+        if CubeCoordinate.FLAT_TOP == self.orientation:
+            return ((grid_x * self.hexagonWidth) + self.radius,
+                    (grid_z * self.hexagonHeight) + (grid_x * self.hexagonHeight / 2) + (self.hexagonHeight / 2))
+        else:
+            return ((grid_x * self.hexagonWidth) + (grid_z * self.hexagonWidth / 2) + (self.hexagonWidth / 2),
+                    (grid_z * self.hexagonHeight) + self.radius)
+
     @staticmethod
     def calc_height(radius) -> float:
         return math.sqrt(3.0) * radius
@@ -62,27 +111,95 @@ class GridData:
 
 
 class HexagonImpl(Hexagon):
+    """
+    Geometry (center, points and bounding boxes) is computed on first access and then
+    cached, so grids that are never rendered only pay for the coordinate and satellite.
+    """
+
+    # __weakref__ lets storages such as SQLiteHexagonDataStorage keep track of hexagons handed out.
+    __slots__ = ('_satellite', 'gridData', 'coords',
+                 '_center', '_points', '_external_bounding_box', '_internal_bounding_box', '__weakref__')
 
     def __init__(self, grid_data: GridData, coords: CubeCoordinate):
-        self.satellite: Optional[SatelliteDataType] = None
+        self._satellite: Optional[SatelliteDataType] = None
         self.gridData = grid_data
         self.coords = coords
 
-        self.center: Point = self.calculate_center()
-        self.points: list[Point] = self.calculate_points(self.center)
-
-        self.external_bounding_box: Rectangle = None
-        self.internal_bounding_box: Rectangle = None
-        self.calc_bounding_boxes()
+        self._center: Optional[Point] = None
+        self._points: Optional[list[Point]] = None
+        self._external_bounding_box: Optional[Rectangle] = None
+        self._internal_bounding_box: Optional[Rectangle] = None
+
+    @property
+    def center(self) -> Point:
+        if self._center is None:
+            self._center = self.calculate_center()
+        return self._center
+
+    @property
+    def points(self) -> list[Point]:
+        if self._points is None:
+            self._points = self.calculate_points(self.center)
+        return self._points
+
+    @property
+    def external_bounding_box(self) -> Rectangle:
+        if self._external_bounding_box is None:
+            self.calc_bounding_boxes()
+        return self._external_bounding_box
+
+    @property
+    def internal_bounding_box(self) -> Rectangle:
+        if self._internal_bounding_box is None:
+            self.calc_bounding_boxes()
+        return self._internal_bounding_box
+
+    @property
+    def satellite(self) -> Optional[SatelliteDataType]:
+        return self.get_satellite()
+
+    @satellite.setter
+    def satellite(self, data: SatelliteDataType):
+        self.set_satellite(data)
 
     def get_satellite(self):
-        return self.satellite
+        """
+        With satellite columns enabled, this is a live SatelliteView of the hexagon's slot.
+        """
+        columns = self.gridData.satellite_columns
+        if columns is not None:
+            slot = columns.slot_of_key(self.coords.to_packed_key())
+            if slot >= 0:
+                return columns.view(slot)
+        return self._satellite
 
     def set_satellite(self, data: SatelliteDataType):
-        self.satellite = data
+        """
+        With satellite columns enabled, the fields of data are copied into the columns, so
+        later changes to data itself do not reach the hexagon.
+        """
+        columns = self.gridData.satellite_columns
+        slot = -1 if columns is None else columns.slot_of_key(self.coords.to_packed_key())
+        if slot >= 0:
+            old_satellite = columns.snapshot(slot) if self.gridData.satellite_listeners else None
+            columns.write(slot, data)
+        else:
+            old_satellite = self._satellite
+            self._satellite = data
+        if self.gridData.satellite_listeners:
+            self.gridData.notify_satellite_changed(self, old_satellite)
 
     def clear_satellite(self):
-        self.satellite = None
+        columns = self.gridData.satellite_columns
+        slot = -1 if columns is None else columns.slot_of_key(self.coords.to_packed_key())
+        if slot >= 0:
+            old_satellite = columns.snapshot(slot) if self.gridData.satellite_listeners else None
+            columns.reset(slot)
+        else:
+            old_satellite = self._satellite
+            self._satellite = None
+        if self.gridData.satellite_listeners:
+            self.gridData.notify_satellite_changed(self, old_satellite)
 
     def calculate_center(self):
         """
@@ -99,43 +216,33 @@ class HexagonImpl(Hexagon):
         }
         :return:
         """
-        if CubeCoordinate.FLAT_TOP == self.gridData.orientation:
-            return Point.from_position((self.coords.gridX * self.gridData.hexagonWidth) + self.gridData.radius,
-                                       (self.coords.gridZ * self.gridData.hexagonHeight)
-                                       + (self.coords.gridX * self.gridData.hexagonHeight / 2)
-                                       + (self.gridData.hexagonHeight / 2))
-        else:
-            return Point.from_position((self.coords.gridX * self.gridData.hexagonWidth)
-                                       + (self.coords.gridZ * self.gridData.hexagonWidth / 2)
-                                       + (self.gridData.hexagonWidth / 2),
-                                       (self.coords.gridZ * self.gridData.hexagonHeight) + self.gridData.radius)
+        center_x, center_y = self.gridData.calc_center(self.coords.gridX, self.coords.gridZ)
+        return Point.from_position(center_x, center_y)
 
     def calculate_points(self, center: Point):
         points: list[Point] = []
-        for i in range(6):
-            angle: float = 2.0 * math.pi / 6.0 * (i + CubeCoordinate.orientation_offsets[self.gridData.orientation])
-            x = center.coordX + (self.gridData.radius * math.cos(angle))
-            y = center.coordY + (self.gridData.radius * math.sin(angle))
-            points.append(Point(x, y))
+        for offset_x, offset_y in self.gridData.vertex_offsets:
+            points.append(Point(center.coordX + offset_x, center.coordY + offset_y))
         return points
 
     def calc_bounding_boxes(self):
 
-        x1 = self.points[3].coordX
-        y1 = self.points[2].coordY
-        x2 = self.points[0].coordX
-        y2 = self.points[5].coordY
-
         center_x = self.center.coordX
         center_y = self.center.coordY
 
+        left, top, right, bottom = self.gridData.external_box_offsets
+        x1 = center_x + left
+        y1 = center_y + top
+        x2 = center_x + right
+        y2 = center_y + bottom
+
         scale = 1.25 * self.gridData.radius
 
-        self.external_bounding_box = Rectangle(x1, y1, x2-x1, y2-y1)
-        self.internal_bounding_box = Rectangle(center_x - (scale / 2.0),
-                                               center_y - (scale / 2.0),
-                                               1.25 * self.gridData.radius,
-                                               1.25 * self.gridData.radius)
+        self._external_bounding_box = Rectangle(x1, y1, x2-x1, y2-y1)
+        self._internal_bounding_box = Rectangle(center_x - (scale / 2.0),
+                                                center_y - (scale / 2.0),
+                                                1.25 * self.gridData.radius,
+                                                1.25 * self.gridData.radius)
 
     def get_coords(self):
         return self.coords
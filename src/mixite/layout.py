@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from math import floor
+from typing import Iterator, Optional
 
+from mixite._optional import require_numpy
 from mixite.coord import CubeCoordinate, CoordinateConverter
 
 
@@ -15,6 +17,42 @@ class GridLayoutStrategy(ABC):
     def fetch_grid_coords(self, width: int, height: int, orientation: str) -> list[CubeCoordinate]:
         pass
 
+    def iter_grid_coords(self, width: int, height: int, orientation: str) -> Iterator[CubeCoordinate]:
+        """Generator form of fetch_grid_coords. Yields the same coordinates in the same order
+        without building the whole list, so callers can stop early on huge layouts.
+        """
+        return iter(self.fetch_grid_coords(width, height, orientation))
+
+    def fetch_grid_coord_arrays(self, width: int, height: int, orientation: str):
+        """Array form of fetch_grid_coords. Requires NumPy.
+        Returns a tuple (cube_x, cube_z) of int64 NumPy arrays, in the same order as
+        fetch_grid_coords. Subclasses override this to build the arrays without
+        creating any CubeCoordinate objects.
+        """
+        np = require_numpy()
+        coords = self.fetch_grid_coords(width, height, orientation)
+        return (np.fromiter((coord.gridX for coord in coords), dtype=np.int64, count=len(coords)),
+                np.fromiter((coord.gridZ for coord in coords), dtype=np.int64, count=len(coords)))
+
+    def get_row_range(self, width: int, height: int, orientation: str) -> tuple[int, int]:
+        """The smallest and largest cube z value of the layout, inclusive.
+        Subclasses override this (and get_row_bounds) with closed forms; this version
+        derives it from fetch_grid_coords.
+        """
+        grid_zs = [coord.gridZ for coord in self.fetch_grid_coords(width, height, orientation)]
+        return min(grid_zs), max(grid_zs)
+
+    def get_row_bounds(self, z: int, width: int, height: int, orientation: str) -> Optional[tuple[int, int]]:
+        """Every layout covers a run of consecutive cube x values in each cube z row.
+        Returns that run as (first x, last x), inclusive, or None if the layout has no
+        coordinates in row z. This lets callers clip against the layout without looking
+        coordinates up.
+        """
+        grid_xs = [coord.gridX for coord in self.fetch_grid_coords(width, height, orientation) if coord.gridZ == z]
+        if len(grid_xs) == 0:
+            return None
+        return min(grid_xs), max(grid_xs)
+
     @abstractmethod
     def check_size(self, width: int, height: int):
         """Raises an exception if the given parameters are invalid. The exception contains a
@@ -31,13 +69,38 @@ class GridLayoutStrategy(ABC):
 class RectangleGridLayoutStrategy(GridLayoutStrategy):
 
     def fetch_grid_coords(self, width: int, height: int, orientation: str) -> list[CubeCoordinate]:
-        coords: list[CubeCoordinate] = []
+        return list(self.iter_grid_coords(width, height, orientation))
+
+    def iter_grid_coords(self, width: int, height: int, orientation: str) -> Iterator[CubeCoordinate]:
         for y in range(height):
             for x in range(width):
                 grid_x = CoordinateConverter.offset_coords_to_cube_x(x, y, orientation)
                 grid_z = CoordinateConverter.offset_coords_to_cube_z(x, y, orientation)
-                coords.append(CubeCoordinate(grid_x, grid_z))
-        return coords
+                yield CubeCoordinate(grid_x, grid_z)
+
+    def fetch_grid_coord_arrays(self, width: int, height: int, orientation: str):
+        np = require_numpy()
+        offset_y, offset_x = np.divmod(np.arange(width * height, dtype=np.int64), width)
+        # ceil(a - b / 2) == a - floor(b / 2), see CoordinateConverter.
+        if CubeCoordinate.FLAT_TOP == orientation:
+            return offset_x, offset_y - (offset_x >> 1)
+        else:
+            return offset_x - (offset_y >> 1), offset_y
+
+    def get_row_range(self, width: int, height: int, orientation: str) -> tuple[int, int]:
+        if CubeCoordinate.FLAT_TOP == orientation:
+            return -((width - 1) >> 1), height - 1
+        return 0, height - 1
+
+    def get_row_bounds(self, z: int, width: int, height: int, orientation: str) -> Optional[tuple[int, int]]:
+        if CubeCoordinate.FLAT_TOP == orientation:
+            # Column x holds z from -(x >> 1) to height - 1 - (x >> 1).
+            first_x = max(0, -2 * z)
+            last_x = min(width - 1, 2 * (height - 1 - z) + 1)
+            return (first_x, last_x) if first_x <= last_x else None
+        if 0 <= z < height:
+            return -(z >> 1), width - 1 - (z >> 1)
+        return None
 
     def check_size(self, width: int, height: int):
         if not (width > 0 and height > 0):
@@ -52,14 +115,27 @@ class RectangleGridLayoutStrategy(GridLayoutStrategy):
 class TriangleGridLayoutStrategy(GridLayoutStrategy):
 
     def fetch_grid_coords(self, width: int, height: int, orientation: str) -> list[CubeCoordinate]:
-        coords: list[CubeCoordinate] = []
+        return list(self.iter_grid_coords(width, height, orientation))
+
+    def iter_grid_coords(self, width: int, height: int, orientation: str) -> Iterator[CubeCoordinate]:
         # Note: Height and width must be equal for this shape to be valid.
         for z in range(height):
             end_x = height - z
             for x in range(end_x):
-                coords.append(CubeCoordinate(x, z))
+                yield CubeCoordinate(x, z)
 
-        return coords
+    def fetch_grid_coord_arrays(self, width: int, height: int, orientation: str):
+        np = require_numpy()
+        rows = np.arange(height, dtype=np.int64)
+        return _rows_to_coord_arrays(np, rows, np.zeros(height, dtype=np.int64), height - rows)
+
+    def get_row_range(self, width: int, height: int, orientation: str) -> tuple[int, int]:
+        return 0, height - 1
+
+    def get_row_bounds(self, z: int, width: int, height: int, orientation: str) -> Optional[tuple[int, int]]:
+        if 0 <= z < height:
+            return 0, height - z - 1
+        return None
 
     def check_size(self, width: int, height: int):
         # width > 0 and height > 0 and width == height
@@ -76,12 +152,25 @@ class TriangleGridLayoutStrategy(GridLayoutStrategy):
 class TrapezoidGridLayoutStrategy(GridLayoutStrategy):
 
     def fetch_grid_coords(self, width: int, height: int, orientation: str) -> list[CubeCoordinate]:
-        coords: list[CubeCoordinate] = []
+        return list(self.iter_grid_coords(width, height, orientation))
+
+    def iter_grid_coords(self, width: int, height: int, orientation: str) -> Iterator[CubeCoordinate]:
         for z in range(height):
             for x in range(width):
-                coords.append(CubeCoordinate(x, z))
+                yield CubeCoordinate(x, z)
+
+    def fetch_grid_coord_arrays(self, width: int, height: int, orientation: str):
+        np = require_numpy()
+        cube_z, cube_x = np.divmod(np.arange(width * height, dtype=np.int64), width)
+        return cube_x, cube_z
 
-        return coords
+    def get_row_range(self, width: int, height: int, orientation: str) -> tuple[int, int]:
+        return 0, height - 1
+
+    def get_row_bounds(self, z: int, width: int, height: int, orientation: str) -> Optional[tuple[int, int]]:
+        if 0 <= z < height:
+            return 0, width - 1
+        return None
 
     def check_size(self, width: int, height: int):
         if not (width > 0 and height > 0):
@@ -96,8 +185,10 @@ class TrapezoidGridLayoutStrategy(GridLayoutStrategy):
 class HexagonGridLayoutStrategy(GridLayoutStrategy):
 
     def fetch_grid_coords(self, width: int, height: int, orientation: str) -> list[CubeCoordinate]:
+        return list(self.iter_grid_coords(width, height, orientation))
+
+    def iter_grid_coords(self, width: int, height: int, orientation: str) -> Iterator[CubeCoordinate]:
         # Don't ask me what this math means. -Denalid
-        coords: list[CubeCoordinate] = []
         # Note: Dimensions are always equal.
         grid_size = height
         hex_radius = floor(grid_size / 2.0)
@@ -116,10 +207,46 @@ class HexagonGridLayoutStrategy(GridLayoutStrategy):
                     z = y - floor(grid_size / 4.0)
                 else:
                     z = y
-                coords.append(CubeCoordinate(x, z))
+                yield CubeCoordinate(x, z)
             start_x -= 1
 
-        return coords
+    def fetch_grid_coord_arrays(self, width: int, height: int, orientation: str):
+        # The same row bounds as fetch_grid_coords, computed for all rows at once.
+        np = require_numpy()
+        grid_size = height
+        hex_radius = floor(grid_size / 2.0)
+        if CubeCoordinate.FLAT_TOP == orientation:
+            start_x = floor(grid_size / 2.0)
+            z_offset = floor(grid_size / 4.0)
+        else:
+            start_x = round(grid_size / 4.0)
+            z_offset = 0
+        min_x = start_x - hex_radius
+
+        rows = np.arange(grid_size, dtype=np.int64)
+        row_starts = np.maximum(start_x - rows, min_x)
+        row_lengths = 2 * hex_radius - np.abs(hex_radius - rows) + 1
+        return _rows_to_coord_arrays(np, rows - z_offset, row_starts, row_lengths)
+
+    def get_row_range(self, width: int, height: int, orientation: str) -> tuple[int, int]:
+        z_offset = floor(height / 4.0) if CubeCoordinate.FLAT_TOP == orientation else 0
+        return -z_offset, height - 1 - z_offset
+
+    def get_row_bounds(self, z: int, width: int, height: int, orientation: str) -> Optional[tuple[int, int]]:
+        # The bounds of row y = z + z_offset in fetch_grid_coords.
+        grid_size = height
+        hex_radius = floor(grid_size / 2.0)
+        if CubeCoordinate.FLAT_TOP == orientation:
+            start_x = floor(grid_size / 2.0)
+            z_offset = floor(grid_size / 4.0)
+        else:
+            start_x = round(grid_size / 4.0)
+            z_offset = 0
+        y = z + z_offset
+        if not 0 <= y < grid_size:
+            return None
+        first_x = max(start_x - y, start_x - hex_radius)
+        return first_x, first_x + 2 * hex_radius - abs(hex_radius - y)
 
     def check_size(self, width: int, height: int):
         # Again, PyCharm wants to be clever. I'd rather be clear.
@@ -132,3 +259,12 @@ class HexagonGridLayoutStrategy(GridLayoutStrategy):
 
     def get_name(self):
         return 'HEXAGONAL'
+
+
+def _rows_to_coord_arrays(np, row_zs, row_starts, row_lengths):
+    """Expands rows of consecutive x values into flat (cube_x, cube_z) arrays.
+    Row i has z value row_zs[i] and covers x from row_starts[i] to row_starts[i] + row_lengths[i] - 1.
+    """
+    row_ends = np.cumsum(row_lengths)
+    offsets_in_row = np.arange(row_ends[-1], dtype=np.int64) - np.repeat(row_ends - row_lengths, row_lengths)
+    return np.repeat(row_starts, row_lengths) + offsets_in_row, np.repeat(row_zs, row_lengths)
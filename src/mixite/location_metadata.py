@@ -1,4 +1,7 @@
-from typing import TypeVar
+from __future__ import annotations
+
+from array import array
+from typing import Any, Callable, Optional, TypeVar
 
 
 class SatelliteData:
@@ -11,3 +14,267 @@ class SatelliteData:
 
 # This defines a type that is any subclass of SatelliteData.
 SatelliteDataType = TypeVar('SatelliteDataType', bound=SatelliteData)
+
+
+class SatelliteColumns:
+    """
+    Struct-of-arrays satellite store. Instead of one SatelliteData object per hexagon, every
+    field is a typed column indexed by the slots of the grid's GridIndex, so scans such as
+    "every opaque hexagon" or "the sum of the movement costs" read a single array.
+
+    Slots whose present flag is 0 have no satellite and hold the SatelliteData defaults, so
+    they read the same as a hexagon without one. entry_costs is derived from isPassable and
+    movementCost and kept up to date: the movementCost of passable slots, infinity for the rest.
+    Satellites with fields other than the built-in ones and the columns added with add_column
+    are refused, as are SatelliteData subclasses, since a view cannot stand in for them.
+    """
+
+    BOOLEAN_FIELDS: tuple[str, ...] = ('isSelected', 'isPassable', 'isOpaque')
+    BUILT_IN_COLUMNS: tuple[tuple[str, str, Any], ...] = (
+        ('isSelected', 'B', False), ('isPassable', 'B', True), ('isOpaque', 'B', False), ('movementCost', 'd', 1.0))
+
+    def __init__(self, index_source: Callable[[], Any], notify: Optional[Callable[[int, SatelliteData], None]] = None):
+        """
+        :param index_source: Returns the grid's current GridIndex. The columns follow it,
+                             moving the values over whenever the grid rebuilds its index.
+        :param notify: Called as notify(slot, old_satellite) when a field is assigned through
+                       a view, so the grid can tell its satellite listeners.
+        """
+        self.index_source = index_source
+        self.notify = notify
+        self.index = index_source()
+        self.index_version = self.index.version
+        self.original_index: Optional[Callable[[], Any]] = None
+        self.columns: dict[str, array] = {}
+        self.defaults: dict[str, Any] = {}
+        self.present = bytearray(len(self.index))
+        self.entry_costs = array('d', [1.0]) * len(self.index)
+        for name, typecode, default in self.BUILT_IN_COLUMNS:
+            self.add_column(name, typecode, default)
+
+    @classmethod
+    def from_buffers(cls, index_source: Callable[[], Any], present: bytearray, entry_costs: array,
+                     columns: dict[str, array], defaults: dict[str, Any],
+                     index_version: int, original_index: Callable[[], Any]) -> SatelliteColumns:
+        """
+        A store over columns that were filled elsewhere, such as the ones read back by
+        mixite.snapshot. They must be in the slot order of the first index the grid builds at
+        index_version, which is then adopted as is. If the storage changed before that index
+        was built, original_index is called to rebuild it so the values can be moved over.
+        """
+        store = cls.__new__(cls)
+        store.index_source = index_source
+        store.notify = None
+        store.index = None
+        store.index_version = index_version
+        store.original_index = original_index
+        store.present = present
+        store.entry_costs = entry_costs
+        store.columns = columns
+        store.defaults = defaults
+        return store
+
+    def add_column(self, name: str, typecode: str, default: Any) -> array:
+        """
+        Adds a user column. Satellites written to the store contribute their attribute of the
+        same name (the default if they have none), and views expose the column as an attribute.
+        :param typecode: An array module typecode, such as 'i' or 'd'.
+        :return: The new column.
+        """
+        if name in self.columns:
+            raise ValueError(f"Column {name} already exists.")
+        self.columns[name] = array(typecode, [default]) * len(self.present)
+        self.defaults[name] = default
+        return self.columns[name]
+
+    def align(self, index) -> None:
+        """
+        Moves the values over to the given index if the columns still follow an older one.
+        """
+        if index is self.index:
+            return
+        if self.index is None:
+            if index.version == self.index_version:
+                self.index = index
+                return
+            self.index = self.original_index()
+        old_index = self.index
+        old_columns = self.columns
+        old_present = self.present
+        old_entry_costs = self.entry_costs
+        self.index = index
+        self.columns = {name: array(column.typecode, [self.defaults[name]]) * len(index)
+                        for name, column in old_columns.items()}
+        self.present = bytearray(len(index))
+        self.entry_costs = array('d', [1.0]) * len(index)
+        for slot, packed_key in enumerate(index.keys):
+            old_slot = old_index.slot_of_key(packed_key)
+            if old_slot < 0 or not old_present[old_slot]:
+                continue
+            for name, column in self.columns.items():
+                column[slot] = old_columns[name][old_slot]
+            self.present[slot] = 1
+            self.entry_costs[slot] = old_entry_costs[old_slot]
+
+    def slot_of_key(self, packed_key: int) -> int:
+        """
+        :return: The slot of the hexagon with the given key in the grid's current index, or -1.
+        """
+        index = self.index_source()
+        self.align(index)
+        return index.slot_of_key(packed_key)
+
+    def view(self, slot: int) -> Optional[SatelliteView]:
+        """
+        :return: A live view of the slot's satellite, or None if it has none. The view follows
+                 the hexagon rather than the slot, so it stays valid when the index is rebuilt.
+        """
+        if not self.present[slot]:
+            return None
+        return SatelliteView(self, self.index.keys[slot])
+
+    def read(self, slot: int, name: str) -> Any:
+        value = self.columns[name][slot]
+        if name in self.BOOLEAN_FIELDS:
+            return bool(value)
+        return value
+
+    def write(self, slot: int, satellite: SatelliteData):
+        """
+        Copies the satellite's fields into the slot.
+        :raises TypeError: If the satellite is of a SatelliteData subclass.
+        :raises ValueError: If the satellite has attributes without a column, see add_column.
+        """
+        if isinstance(satellite, SatelliteView):
+            fields = [*satellite._columns.columns, *vars(satellite)]
+        elif type(satellite) is SatelliteData:
+            fields = vars(satellite)
+        else:
+            raise TypeError("Satellite columns only hold SatelliteData, not {}.".format(type(satellite).__name__))
+        missing = [name for name in fields if name not in self.columns]
+        if missing:
+            raise ValueError("No column for the satellite attributes {}, see add_column.".format(", ".join(missing)))
+        for name, column in self.columns.items():
+            column[slot] = getattr(satellite, name, self.defaults[name])
+        self.present[slot] = 1
+        self.__update_entry_cost(slot)
+
+    def write_field(self, slot: int, name: str, value: Any):
+        """
+        Assigns one field of the slot's satellite, telling notify about the old values.
+        """
+        old_satellite = self.snapshot(slot) if self.notify is not None else None
+        self.columns[name][slot] = value
+        self.present[slot] = 1
+        self.__update_entry_cost(slot)
+        if old_satellite is not None:
+            self.notify(slot, old_satellite)
+
+    def reset(self, slot: int):
+        """
+        Removes the slot's satellite, putting the defaults back.
+        """
+        for name, column in self.columns.items():
+            column[slot] = self.defaults[name]
+        self.present[slot] = 0
+        self.entry_costs[slot] = 1.0
+
+    def snapshot(self, slot: int) -> Optional[SatelliteData]:
+        """
+        :return: A detached SatelliteData copy of the slot's satellite, or None if it has none.
+        """
+        if not self.present[slot]:
+            return None
+        satellite = SatelliteData()
+        for name in self.columns:
+            setattr(satellite, name, self.read(slot, name))
+        return satellite
+
+    def __update_entry_cost(self, slot: int):
+        if self.columns['isPassable'][slot]:
+            self.entry_costs[slot] = self.columns['movementCost'][slot]
+        else:
+            self.entry_costs[slot] = float('inf')
+
+    def __len__(self) -> int:
+        return len(self.present)
+
+
+class SatelliteView(SatelliteData):
+    """
+    One hexagon's satellite in a SatelliteColumns store, as handed out by get_satellite when
+    the grid keeps its satellites in columns. Fields read from and write to the columns, so
+    unlike a plain SatelliteData, assigning a field is seen by the satellite listeners. User
+    columns show up as attributes too.
+
+    The view holds the hexagon's packed key and looks its slot up on every access, since slots
+    move whenever the grid rebuilds its index. Once the hexagon is removed from the grid, any
+    access raises a ValueError.
+    """
+
+    __slots__ = ('_columns', '_key')
+
+    def __init__(self, columns: SatelliteColumns, packed_key: int):
+        # SatelliteData.__init__ is skipped on purpose, it would overwrite the columns.
+        object.__setattr__(self, '_columns', columns)
+        object.__setattr__(self, '_key', packed_key)
+
+    @property
+    def _slot(self) -> int:
+        slot = self._columns.slot_of_key(self._key)
+        if slot < 0:
+            raise ValueError("The hexagon of this satellite is no longer on the grid.")
+        return slot
+
+    @property
+    def isSelected(self) -> bool:
+        return bool(self._columns.columns['isSelected'][self._slot])
+
+    @isSelected.setter
+    def isSelected(self, value: bool):
+        self._columns.write_field(self._slot, 'isSelected', value)
+
+    @property
+    def isPassable(self) -> bool:
+        return bool(self._columns.columns['isPassable'][self._slot])
+
+    @isPassable.setter
+    def isPassable(self, value: bool):
+        self._columns.write_field(self._slot, 'isPassable', value)
+
+    @property
+    def isOpaque(self) -> bool:
+        return bool(self._columns.columns['isOpaque'][self._slot])
+
+    @isOpaque.setter
+    def isOpaque(self, value: bool):
+        self._columns.write_field(self._slot, 'isOpaque', value)
+
+    @property
+    def movementCost(self) -> float:
+        return self._columns.columns['movementCost'][self._slot]
+
+    @movementCost.setter
+    def movementCost(self, value: float):
+        self._columns.write_field(self._slot, 'movementCost', value)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called when the normal lookup fails, so this only sees user columns.
+        columns = self._columns.columns
+        if name not in columns:
+            raise AttributeError(name)
+        return columns[name][self._slot]
+
+    def __setattr__(self, name: str, value: Any):
+        if name in self._columns.columns:
+            self._columns.write_field(self._slot, name, value)
+        else:
+            object.__setattr__(self, name, value)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, SatelliteView):
+            return self._columns is other._columns and self._key == other._key
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((id(self._columns), self._key))
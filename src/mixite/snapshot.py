@@ -0,0 +1,389 @@
+"""Binary grid snapshots.
+
+A snapshot holds a grid's GridData, the name of its layout, its coordinates and its
+satellites, so that a large map can be loaded without going through GridControlBuilder
+and re-applying the satellites one by one. Everything past the header is a contiguous
+block that is read straight into its array:
+
+    header           SNAPSHOT_HEADER: magic, format version, byte order, GridData fields,
+                     layout name, coordinate bounding box, cell and column counts, flags
+    column headers   COLUMN_HEADER for every satellite column: name, typecode, default
+    occupied         one byte per slot of the bounding box (see DenseHexagonDataStorage),
+                     1 where the grid has a hexagon
+    present          one byte per cell, 1 where the cell has a satellite
+    entry_costs      one double per cell (see SatelliteColumns)
+    columns          every satellite column, cell_count items each
+
+With FLAG_INDEX set, the DenseGridIndex arrays follow as int64 blocks: keys,
+storage_to_slot (one per bounding box slot) and neighbor_slots (six per cell). They let
+load_snapshot skip building the index, and map_snapshot needs them.
+
+Cells are numbered in bounding box order (by z, then x), which is the slot order of the
+DenseGridIndex built over the loaded storage. Each block starts on an 8 byte boundary, so
+that map_snapshot can use every block of the file in place.
+
+The occupied map (and with FLAG_INDEX, storage_to_slot) has an entry for every slot of the
+bounding box, so a sparse grid costs as much as its bounding box filled in. Grids whose
+bounding box has more than MAX_BOX_SIZE slots are refused. Column names are stored in 32
+bytes of UTF-8.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import BinaryIO, NamedTuple, Optional, Union
+
+from mixite._optional import has_numpy, require_numpy
+from mixite.builder import GridControl
+from mixite.calculator import HexagonGridCalculator
+from mixite.coord import CubeCoordinate
+from mixite.grid import DenseGridIndex, GridIndex, HexagonGridImpl
+from mixite.hex import GridData, HexagonImpl
+from mixite.layout import GridLayoutStrategy, HexagonGridLayoutStrategy, RectangleGridLayoutStrategy, \
+    TrapezoidGridLayoutStrategy, TriangleGridLayoutStrategy
+from mixite.location_metadata import SatelliteColumns
+from mixite.storage import LazyDenseHexagonDataStorage, ReadOnlyDenseHexagonDataStorage
+
+MAGIC = b'MIXITEGS'
+FORMAT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<8sHB5x16sdii16siiiiQII')
+COLUMN_HEADER = struct.Struct('<32s1s7x8s')
+FLAG_INDEX = 1
+MAX_BOX_SIZE = 1 << 30
+LAYOUTS: dict[str, type[GridLayoutStrategy]] = {
+    strategy().get_name(): strategy for strategy in (RectangleGridLayoutStrategy, HexagonGridLayoutStrategy,
+                                                     TriangleGridLayoutStrategy, TrapezoidGridLayoutStrategy)}
+BYTE_ORDERS = ('little', 'big')
+
+SnapshotFile = Union[str, os.PathLike, BinaryIO]
+
+
+class SnapshotHeader(NamedTuple):
+    """
+    What _read_header found in a snapshot's header and column headers.
+    """
+
+    grid_data: GridData
+    layout: Optional[GridLayoutStrategy]
+    min_x: int
+    min_z: int
+    span_x: int
+    span_z: int
+    cell_count: int
+    flags: int
+    swap_bytes: bool
+    # (name, typecode, default) of every satellite column.
+    column_types: list[tuple[str, str, object]]
+
+    def new_storage(self, occupied: bytearray) -> LazyDenseHexagonDataStorage:
+        storage = LazyDenseHexagonDataStorage(self.min_x, self.min_z, self.min_x + self.span_x - 1,
+                                              self.min_z + self.span_z - 1, self.new_hexagon)
+        storage.add_pending_slots(occupied)
+        return storage
+
+    def new_hexagon(self, cube_x: int, cube_z: int) -> HexagonImpl:
+        return HexagonImpl(self.grid_data, CubeCoordinate(cube_x, cube_z))
+
+    def column_defaults(self) -> dict[str, object]:
+        return {name: default for name, _, default in self.column_types}
+
+
+def save_snapshot(grid: HexagonGridImpl, file: SnapshotFile, include_index: bool = False):
+    """
+    Writes the hexagons of the grid's index (see HexagonGrid.get_index, or one built for the
+    call if the grid has none) and their satellites.
+    With satellite columns enabled, the user columns are saved too. Otherwise the built-in
+    fields are read from each hexagon's satellite.
+    :param file: A path, or a binary file object open for writing.
+    :param include_index: Also write the index arrays, which map_snapshot requires. This
+                          makes the file about 56 bytes per cell larger.
+    :raises ValueError: If the grid's bounding box has more than MAX_BOX_SIZE slots, or a
+                        satellite column name is longer than 32 bytes in UTF-8.
+    """
+    if not hasattr(file, 'write'):
+        with open(file, 'wb') as opened:
+            save_snapshot(grid, opened, include_index)
+        return
+
+    index = grid.get_index()
+    if index is None:
+        index = GridIndex.for_storage(grid.storage)
+    cell_count = len(index)
+    bounds = _bounds_of(index.keys)
+    min_x, min_z, span_x, span_z = bounds
+    if span_x * span_z > MAX_BOX_SIZE:
+        raise ValueError("The grid's bounding box of {} x {} is too large for a snapshot.".format(span_x, span_z))
+    satellite_columns = grid.grid_data.satellite_columns
+    if satellite_columns is not None:
+        for name in satellite_columns.columns:
+            if len(name.encode()) > 32:
+                raise ValueError("Column name {} is longer than 32 bytes.".format(name))
+    order, occupied = _bounding_box_order(index.keys, bounds)
+
+    if satellite_columns is not None:
+        satellite_columns.align(index)
+        present = _reordered(satellite_columns.present, order)
+        entry_costs = _reordered(satellite_columns.entry_costs, order)
+        columns = {name: _reordered(column, order) for name, column in satellite_columns.columns.items()}
+        defaults = satellite_columns.defaults
+    else:
+        present, entry_costs, columns, defaults = _columns_from_satellites(index, order)
+
+    blocks = [occupied, present, entry_costs] + list(columns.values())
+    if include_index:
+        # Built over a storage like the loaded one, so that its slots are in the file's cell order.
+        storage = LazyDenseHexagonDataStorage(min_x, min_z, min_x + span_x - 1, min_z + span_z - 1,
+                                              lambda cube_x, cube_z: None)
+        storage.add_pending_slots(occupied)
+        loaded_index = GridIndex.for_storage(storage)
+        blocks += [loaded_index.keys, loaded_index._storage_to_slot, loaded_index.neighbor_slots]
+
+    layout_name = grid.layout.get_name() if grid.layout is not None else ''
+    grid_data = grid.grid_data
+    file.write(SNAPSHOT_HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDERS.index(sys.byteorder),
+                                    grid_data.orientation.encode(), grid_data.radius, grid_data.gridWidth,
+                                    grid_data.gridHeight, layout_name.encode(), min_x, min_z, span_x, span_z,
+                                    cell_count, len(columns), FLAG_INDEX if include_index else 0))
+    for name, column in columns.items():
+        file.write(COLUMN_HEADER.pack(name.encode(), column.typecode.encode(),
+                                      array(column.typecode, [defaults[name]]).tobytes()))
+    for block in blocks:
+        file.write(block)
+        file.write(bytes(-len(memoryview(block).cast('B')) % 8))
+
+
+def load_snapshot(file: SnapshotFile) -> GridControl:
+    """
+    Reads a grid written by save_snapshot. The storage is a LazyDenseHexagonDataStorage, so
+    hexagons are only created when they are looked up, and the satellites are kept in
+    satellite columns (see HexagonGridImpl.enable_satellite_columns).
+    :param file: A path, or a binary file object open for reading.
+    :raises ValueError: If the file is not a snapshot, or one of a newer format version.
+    """
+    if not hasattr(file, 'read'):
+        with open(file, 'rb') as opened:
+            return load_snapshot(opened)
+
+    header = _read_header(file)
+    cell_count = header.cell_count
+    occupied = _read_block(file, bytearray(header.span_x * header.span_z))
+    present = _read_block(file, bytearray(cell_count))
+    entry_costs = _read_block(file, array('d', [0.0]) * cell_count)
+    columns = {name: _read_block(file, array(typecode, [default]) * cell_count)
+               for name, typecode, default in header.column_types}
+    index_arrays = []
+    if header.flags & FLAG_INDEX:
+        for length in (cell_count, header.span_x * header.span_z, 6 * cell_count):
+            index_arrays.append(_read_block(file, array('q', [0]) * length))
+    if header.swap_bytes:
+        for block in [entry_costs] + list(columns.values()) + index_arrays:
+            block.byteswap()
+
+    grid_data = header.grid_data
+    storage = header.new_storage(occupied)
+    index = None
+    if index_arrays:
+        keys, storage_to_slot, neighbor_slots = index_arrays
+        index = DenseGridIndex.from_arrays(storage, keys, neighbor_slots, storage_to_slot)
+    grid = HexagonGridImpl(grid_data, storage, layout=header.layout, index=index)
+    storage.factory = lambda cube_x, cube_z: HexagonImpl(grid_data, grid.get_coord(cube_x, cube_z))
+
+    def original_index() -> GridIndex:
+        # The storage was changed before its first index was built, so the cell order is
+        # rebuilt from the occupied map as it was read.
+        return GridIndex.for_storage(header.new_storage(occupied))
+
+    grid.enable_satellite_columns(SatelliteColumns.from_buffers(
+        grid.get_index, present, entry_costs, columns, header.column_defaults(), storage.version, original_index))
+    return GridControl(grid, HexagonGridCalculator(grid), grid_data)
+
+
+def map_snapshot(path: Union[str, os.PathLike]) -> GridControl:
+    """
+    Maps a snapshot saved with include_index=True into memory, read-only. The storage, the
+    index and the satellite columns are memoryviews over the mapped file, so loading copies
+    nothing, and processes mapping the same file share one copy of it through the page cache.
+    Only the hexagon objects that are looked up are created, in each process.
+
+    The grid cannot be changed: the storage is a ReadOnlyDenseHexagonDataStorage, and
+    set_satellite, clear_satellite or assigning a satellite field raise a TypeError.
+    :raises ValueError: If the file is not a snapshot, was saved without its index, or was
+                        saved on a machine with the other byte order.
+    """
+    with open(path, 'rb') as file:
+        header = _read_header(file)
+        offset = file.tell()
+        if not header.flags & FLAG_INDEX:
+            raise ValueError("The snapshot was saved without its index, see save_snapshot(include_index=True).")
+        if header.swap_bytes:
+            raise ValueError("The snapshot was saved with the other byte order, use load_snapshot instead.")
+        # The mapping stays open for as long as a memoryview over it is alive.
+        mapped = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def next_block(length: int, typecode: str) -> Union[memoryview, array]:
+        nonlocal offset
+        size = length * array(typecode).itemsize
+        if offset + size > len(mapped):
+            raise ValueError("Snapshot is truncated.")
+        if size == 0:
+            # memoryview cannot cast an empty view.
+            return array(typecode)
+        block = mapped[offset:offset + size].cast(typecode)
+        offset += size + -size % 8
+        return block
+
+    cell_count = header.cell_count
+    box_size = header.span_x * header.span_z
+    occupied = next_block(box_size, 'B')
+    present = next_block(cell_count, 'B')
+    entry_costs = next_block(cell_count, 'd')
+    columns = {name: next_block(cell_count, typecode) for name, typecode, _ in header.column_types}
+    keys = next_block(cell_count, 'q')
+    storage_to_slot = next_block(box_size, 'q')
+    neighbor_slots = next_block(6 * cell_count, 'q')
+
+    grid_data = header.grid_data
+    storage = ReadOnlyDenseHexagonDataStorage(header.min_x, header.min_z, header.min_x + header.span_x - 1,
+                                              header.min_z + header.span_z - 1, occupied, header.new_hexagon,
+                                              cell_count)
+    index = DenseGridIndex.from_arrays(storage, keys, neighbor_slots, storage_to_slot)
+    grid = HexagonGridImpl(grid_data, storage, layout=header.layout, index=index)
+    storage.factory = lambda cube_x, cube_z: HexagonImpl(grid_data, grid.get_coord(cube_x, cube_z))
+    # The storage cannot change, so the columns always follow the mapped index.
+    grid.enable_satellite_columns(SatelliteColumns.from_buffers(
+        grid.get_index, present, entry_costs, columns, header.column_defaults(), storage.version, grid.get_index))
+    return GridControl(grid, HexagonGridCalculator(grid), grid_data)
+
+
+def _read_header(file: BinaryIO) -> SnapshotHeader:
+    """
+    Reads the snapshot header and the column headers, leaving the file at the first block.
+    """
+    (magic, version, byte_order, orientation, radius, width, height, layout_name, min_x, min_z,
+     span_x, span_z, cell_count, column_count, flags) = SNAPSHOT_HEADER.unpack(
+        _read_exactly(file, SNAPSHOT_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("Not a grid snapshot.")
+    if version > FORMAT_VERSION:
+        raise ValueError("Snapshot format version {} is newer than the supported {}.".format(version, FORMAT_VERSION))
+    swap_bytes = BYTE_ORDERS[byte_order] != sys.byteorder
+
+    column_types: list[tuple[str, str, object]] = []
+    for _ in range(column_count):
+        name, typecode, default = COLUMN_HEADER.unpack(_read_exactly(file, COLUMN_HEADER.size))
+        typecode = typecode.decode()
+        default_item = array(typecode)
+        default_item.frombytes(default[:default_item.itemsize])
+        if swap_bytes:
+            default_item.byteswap()
+        column_types.append((name.rstrip(b'\0').decode(), typecode, default_item[0]))
+
+    layout_class = LAYOUTS.get(layout_name.rstrip(b'\0').decode())
+    return SnapshotHeader(GridData(orientation.rstrip(b'\0').decode(), radius, width, height),
+                          layout_class() if layout_class is not None else None,
+                          min_x, min_z, span_x, span_z, cell_count, flags, swap_bytes, column_types)
+
+
+def _bounds_of(keys: array) -> tuple[int, int, int, int]:
+    """
+    :return: (min_x, min_z, span_x, span_z) of the packed keys, all 0 if there are none.
+    """
+    if len(keys) == 0:
+        return 0, 0, 0, 0
+    if has_numpy():
+        np = require_numpy()
+        packed_keys = np.frombuffer(keys, dtype=np.int64)
+        cube_xs = (packed_keys + 0x80000000) >> 32
+        cube_zs = packed_keys - (cube_xs << 32)
+        min_x, min_z = int(cube_xs.min()), int(cube_zs.min())
+        return min_x, min_z, int(cube_xs.max()) - min_x + 1, int(cube_zs.max()) - min_z + 1
+    cube_xs, cube_zs = zip(*(CubeCoordinate.unpack(packed_key) for packed_key in keys))
+    return min(cube_xs), min(cube_zs), max(cube_xs) - min(cube_xs) + 1, max(cube_zs) - min(cube_zs) + 1
+
+
+def _bounding_box_order(keys: array, bounds: tuple[int, int, int, int]) -> tuple[list[int], bytearray]:
+    """
+    :return: The index slots sorted into bounding box order, and the occupied map.
+    """
+    min_x, min_z, span_x, span_z = bounds
+    occupied = bytearray(span_x * span_z)
+    if has_numpy() and len(keys) > 0:
+        np = require_numpy()
+        packed_keys = np.frombuffer(keys, dtype=np.int64)
+        cube_xs = (packed_keys + 0x80000000) >> 32
+        box_slots = (packed_keys - (cube_xs << 32) - min_z) * span_x + cube_xs - min_x
+        np.frombuffer(occupied, dtype=np.uint8)[box_slots] = 1
+        return np.argsort(box_slots, kind='stable').tolist(), occupied
+
+    box_slots = []
+    for packed_key in keys:
+        cube_x, cube_z = CubeCoordinate.unpack(packed_key)
+        box_slot = (cube_z - min_z) * span_x + cube_x - min_x
+        occupied[box_slot] = 1
+        box_slots.append(box_slot)
+    return sorted(range(len(keys)), key=box_slots.__getitem__), occupied
+
+
+def _reordered(block: Union[bytearray, array], order: list[int]) -> Union[bytearray, array]:
+    """
+    :return: A copy of the block with its items in the given order.
+    """
+    if isinstance(block, bytearray):
+        copy = bytearray(len(order))
+    else:
+        copy = array(block.typecode)
+    if has_numpy():
+        np = require_numpy()
+        items = np.asarray(memoryview(block))[np.asarray(order, dtype=np.int64)]
+        if isinstance(block, bytearray):
+            copy[:] = items.data.cast('B')
+        else:
+            copy.frombytes(items.data.cast('B'))
+        return copy
+    if isinstance(block, bytearray):
+        copy[:] = bytes(block[slot] for slot in order)
+    else:
+        copy.extend(block[slot] for slot in order)
+    return copy
+
+
+def _columns_from_satellites(index: GridIndex, order: list[int]):
+    """
+    The built-in satellite columns, read from the satellite of every hexagon in the index.
+    :return: (present, entry_costs, columns, defaults), in the given slot order.
+    """
+    present = bytearray(len(order))
+    entry_costs = array('d', [1.0]) * len(order)
+    columns = {name: array(typecode, [default]) * len(order)
+               for name, typecode, default in SatelliteColumns.BUILT_IN_COLUMNS}
+    hexagons = index.hexagons
+    for cell, slot in enumerate(order):
+        satellite = hexagons[slot].get_satellite()
+        if satellite is None:
+            continue
+        present[cell] = 1
+        for name, column in columns.items():
+            column[cell] = getattr(satellite, name)
+        entry_costs[cell] = satellite.movementCost if satellite.isPassable else float('inf')
+    return present, entry_costs, columns, {name: default for name, _, default in SatelliteColumns.BUILT_IN_COLUMNS}
+
+
+def _read_exactly(file: BinaryIO, size: int) -> bytes:
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Snapshot is truncated.")
+    return data
+
+
+def _read_block(file: BinaryIO, block: Union[bytearray, array]):
+    """
+    Fills the block from the file, then skips the padding up to the next 8 byte boundary.
+    """
+    view = memoryview(block).cast('B')
+    if file.readinto(view) != len(view):
+        raise ValueError("Snapshot is truncated.")
+    file.read(-len(view) % 8)
+    return block
@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import sqlite3
+import struct
+import weakref
+from collections import OrderedDict
+from typing import Generic, Iterator, Optional
+
+from mixite.coord import CubeCoordinate
+from mixite.hex import GridData, HexagonDataType, HexagonImpl
+from mixite.location_metadata import SatelliteData
+from mixite.storage import HexagonDataStorage
+
+
+class SQLiteHexagonDataStorage(HexagonDataStorage, Generic[HexagonDataType]):
+    """
+    Storage backed by an SQLite database, for maps that do not fit in memory. Each coordinate
+    is a row keyed by its packed key (see CubeCoordinate.pack), which SQLite keeps as the
+    rowid, so the rows of one x column are stored in z order and a column segment is a
+    single range scan.
+
+    Reads go through a page cache. A page is 2 ** page_bits consecutive keys (a run of z
+    values within one x column), loaded with one range query. Its hexagons are decoded as
+    they are asked for. The least recently used pages are evicted once there are more than
+    cache_pages of them. Writes are queued and written batch_size at a time, each batch in a
+    single transaction. Hexagons whose satellite was changed while their page was cached are
+    written back when the page is evicted or on flush. Hexagons that are still in use when
+    their page is evicted, or that were read without going through the cache, are tracked with
+    weak references: looking them up again returns the same object, and flush writes their
+    changes. A change to such a hexagon is lost if the hexagon is let go of before the next
+    flush. Call close (or flush) before the process exits.
+
+    Hexagons are stored as the coordinates of the hexagon and the fields of its SatelliteData
+    (see encode_hexagon). Subclasses can override encode_hexagon and decode_hexagon to store
+    other hexagon or satellite types.
+
+    The statements are fixed strings, so the sqlite3 module compiles each of them once per
+    connection and reuses it.
+    """
+
+    version = 0
+    paged = True
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS hexagons (key INTEGER PRIMARY KEY, data BLOB)"
+    SELECT_RANGE = "SELECT key, data FROM hexagons WHERE key BETWEEN ? AND ?"
+    SELECT_KEYS = "SELECT key FROM hexagons ORDER BY key"
+    SELECT_DATA = "SELECT key, data FROM hexagons WHERE data IS NOT NULL ORDER BY key"
+    COUNT = "SELECT COUNT(*) FROM hexagons"
+    UPSERT = "INSERT OR REPLACE INTO hexagons (key, data) VALUES (?, ?)"
+    # Hexagon x and z, whether it has a satellite, then isSelected, isPassable, isOpaque and movementCost.
+    HEXAGON_ENCODING = struct.Struct('<iiBBBBd')
+
+    def __init__(self, database: str, grid_data: GridData, cache_pages: int = 16384, page_bits: int = 4,
+                 batch_size: int = 10000):
+        """
+        :param database: Path of the database file, created if needed, or ':memory:'.
+        :param grid_data: Shared by the hexagons created by decode_hexagon.
+        :param cache_pages: How many pages the cache holds before evicting.
+        :param page_bits: A page holds 2 ** page_bits keys.
+        :param batch_size: How many queued writes trigger a write to the database.
+        """
+        if cache_pages < 1:
+            raise ValueError("cache_pages must be at least 1.")
+        self.connection = sqlite3.connect(database)
+        if database != ':memory:':
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(self.SCHEMA)
+        self.grid_data = grid_data
+        self.cache_pages = cache_pages
+        self.page_bits = page_bits
+        self.batch_size = batch_size
+        # page id -> packed key -> (hexagon, its data as last read or written). The hexagon is
+        # decoded on first access, so it is None until then as well as when there is no data.
+        self.pages: OrderedDict[int, dict[int, tuple[Optional[HexagonDataType], Optional[bytes]]]] = OrderedDict()
+        # page id -> packed key -> data, for writes that have not reached the database yet.
+        self.pending: dict[int, dict[int, Optional[bytes]]] = {}
+        # packed key -> (weak reference, data as last read or written) of hexagons handed out
+        # that are not in a cached page. Entries go away with their hexagon.
+        self.detached: dict[int, tuple[weakref.KeyedRef, Optional[bytes]]] = {}
+        self.pending_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def encode_hexagon(self, hexagon: HexagonDataType) -> bytes:
+        coords = hexagon.get_coords()
+        satellite = hexagon.get_satellite()
+        if satellite is None:
+            return self.HEXAGON_ENCODING.pack(coords.gridX, coords.gridZ, 0, 0, 1, 0, 1.0)
+        return self.HEXAGON_ENCODING.pack(coords.gridX, coords.gridZ, 1, satellite.isSelected, satellite.isPassable,
+                                          satellite.isOpaque, satellite.movementCost)
+
+    def decode_hexagon(self, data: bytes) -> HexagonDataType:
+        cube_x, cube_z, has_satellite, is_selected, is_passable, is_opaque, movement_cost = \
+            self.HEXAGON_ENCODING.unpack(data)
+        hexagon = HexagonImpl(self.grid_data, CubeCoordinate(cube_x, cube_z))
+        if has_satellite:
+            satellite = SatelliteData()
+            satellite.isSelected = bool(is_selected)
+            satellite.isPassable = bool(is_passable)
+            satellite.isOpaque = bool(is_opaque)
+            satellite.movementCost = movement_cost
+            hexagon.set_satellite(satellite)
+        return hexagon
+
+    def add_coord(self, cube_coordinate: CubeCoordinate):
+        self.add_coord_with_data(cube_coordinate, None)
+
+    def add_coord_with_data(self, cube_coordinate: CubeCoordinate, hexagon: Optional[HexagonDataType]) -> bool:
+        packed_key = cube_coordinate.to_packed_key()
+        page = self.__page_of(packed_key)
+        has_previous = packed_key in page
+        data = None if hexagon is None else self.encode_hexagon(hexagon)
+        page[packed_key] = (hexagon, data)
+        self.detached.pop(packed_key, None)
+        self.__queue_write(packed_key, data)
+        self.version += 1
+        return has_previous
+
+    def add_coord_arrays_with_data(self, cube_xs, cube_zs, hexagons: list[Optional[HexagonDataType]]):
+        """
+        Writes every coordinate in a single transaction, without going through the write queue.
+        """
+        self.flush_writes()
+        rows = [(CubeCoordinate.pack(cube_x, cube_z), None if hexagon is None else self.encode_hexagon(hexagon))
+                for cube_x, cube_z, hexagon in zip(cube_xs.tolist(), cube_zs.tolist(), hexagons)]
+        with self.connection:
+            self.connection.executemany(self.UPSERT, rows)
+        for (packed_key, data), hexagon in zip(rows, hexagons):
+            self.detached.pop(packed_key, None)
+            page = self.pages.get(packed_key >> self.page_bits)
+            if page is not None:
+                page[packed_key] = (hexagon, data)
+        self.version += 1
+
+    def get_data_for(self, cube_coordinate: CubeCoordinate) -> Optional[HexagonDataType]:
+        return self.get_data_for_key(cube_coordinate.to_packed_key())
+
+    def contains(self, cube_coordinate: CubeCoordinate) -> bool:
+        return self.contains_key(cube_coordinate.to_packed_key())
+
+    def has_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
+        return self.get_data_for_key(cube_coordinate.to_packed_key()) is not None
+
+    def clear_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
+        return self.add_coord_with_data(cube_coordinate, None)
+
+    def contains_key(self, packed_key: int) -> bool:
+        return packed_key in self.__page_of(packed_key)
+
+    def get_data_for_key(self, packed_key: int) -> Optional[HexagonDataType]:
+        return self.__decoded(self.__page_of(packed_key), packed_key)
+
+    def get_for_coords(self, cube_x: int, cube_z: int) -> CubeCoordinate | None:
+        if self.contains_key(CubeCoordinate.pack(cube_x, cube_z)):
+            return CubeCoordinate(cube_x, cube_z)
+        return None
+
+    def iter_keys(self) -> Iterator[int]:
+        self.flush_writes()
+        return (packed_key for packed_key, in self.connection.execute(self.SELECT_KEYS))
+
+    def iter_data(self) -> Iterator[HexagonDataType]:
+        self.flush_writes()
+        return (self.__cached_or_decoded(packed_key, data)
+                for packed_key, data in self.connection.execute(self.SELECT_DATA))
+
+    def iter_data_by_cube_range(self, from_coord: CubeCoordinate, to_coord: CubeCoordinate) \
+            -> Iterator[Optional[HexagonDataType]]:
+        """
+        Reads each x column of the range with one range query. Pages that are not cached
+        are not loaded into the cache, so a large range does not flush it.
+        """
+        self.flush_writes()
+        found: dict[int, Optional[HexagonDataType]] = {}
+        for grid_x in range(from_coord.gridX, to_coord.gridX + 1):
+            for packed_key, data in self.connection.execute(
+                    self.SELECT_RANGE, (CubeCoordinate.pack(grid_x, from_coord.gridZ),
+                                        CubeCoordinate.pack(grid_x, to_coord.gridZ))):
+                found[packed_key] = self.__cached_or_decoded(packed_key, data)
+        for grid_z in range(from_coord.gridZ, to_coord.gridZ + 1):
+            for grid_x in range(from_coord.gridX, to_coord.gridX + 1):
+                packed_key = CubeCoordinate.pack(grid_x, grid_z)
+                if packed_key in found:
+                    yield found[packed_key]
+
+    def flush_writes(self):
+        """
+        Writes the queued writes to the database in one transaction.
+        """
+        if self.pending_count == 0:
+            return
+        with self.connection:
+            self.connection.executemany(self.UPSERT, [(packed_key, data) for writes in self.pending.values()
+                                                      for packed_key, data in writes.items()])
+        self.pending.clear()
+        self.pending_count = 0
+
+    def flush(self):
+        """
+        Queues the cached and tracked hexagons that changed since they were read, then writes
+        every queued write.
+        """
+        for page in self.pages.values():
+            self.__write_back(page)
+        for packed_key, (ref, data) in list(self.detached.items()):
+            hexagon = ref()
+            if hexagon is None:
+                continue
+            current = self.encode_hexagon(hexagon)
+            if current == data:
+                continue
+            self.__queue_write(packed_key, current)
+            page = self.pages.get(packed_key >> self.page_bits)
+            if page is not None and packed_key in page:
+                # The page was read before this write, so it takes the hexagon over.
+                page[packed_key] = (hexagon, current)
+                del self.detached[packed_key]
+            else:
+                self.detached[packed_key] = (ref, current)
+        self.flush_writes()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def clear_cache(self):
+        """
+        Evicts every page, writing back the hexagons that changed.
+        """
+        while self.pages:
+            self.__evict()
+
+    def __page_of(self, packed_key: int) -> dict[int, tuple[Optional[HexagonDataType], Optional[bytes]]]:
+        page_id = packed_key >> self.page_bits
+        page = self.pages.get(page_id)
+        if page is not None:
+            self.hits += 1
+            self.pages.move_to_end(page_id)
+            return page
+
+        self.misses += 1
+        first_key = page_id << self.page_bits
+        page = {key: (None, data) for key, data in
+                self.connection.execute(self.SELECT_RANGE, (first_key, first_key + (1 << self.page_bits) - 1))}
+        for key, data in self.pending.get(page_id, {}).items():
+            page[key] = (None, data)
+        self.pages[page_id] = page
+        if len(self.pages) > self.cache_pages:
+            self.__evict()
+        return page
+
+    def __evict(self):
+        _, page = self.pages.popitem(last=False)
+        self.evictions += 1
+        self.__write_back(page)
+        for packed_key, (hexagon, data) in page.items():
+            if hexagon is not None:
+                self.__track(packed_key, hexagon, data)
+
+    def __track(self, packed_key: int, hexagon: HexagonDataType, data: Optional[bytes]):
+        """
+        Keeps a weak reference to a hexagon that is handed out without a cached page holding it.
+        """
+        try:
+            ref = weakref.KeyedRef(hexagon, self.__forget, packed_key)
+        except TypeError:
+            # Hexagon types without weak reference support are not tracked.
+            return
+        self.detached[packed_key] = (ref, data)
+
+    def __forget(self, ref: weakref.KeyedRef):
+        entry = self.detached.get(ref.key)
+        if entry is not None and entry[0] is ref:
+            del self.detached[ref.key]
+
+    def __tracked(self, packed_key: int) -> Optional[HexagonDataType]:
+        entry = self.detached.get(packed_key)
+        return None if entry is None else entry[0]()
+
+    def __write_back(self, page: dict[int, tuple[Optional[HexagonDataType], Optional[bytes]]]):
+        for packed_key, (hexagon, data) in page.items():
+            if hexagon is None:
+                continue
+            current = self.encode_hexagon(hexagon)
+            if current != data:
+                page[packed_key] = (hexagon, current)
+                self.__queue_write(packed_key, current)
+
+    def __queue_write(self, packed_key: int, data: Optional[bytes]):
+        writes = self.pending.setdefault(packed_key >> self.page_bits, {})
+        if packed_key not in writes:
+            self.pending_count += 1
+        writes[packed_key] = data
+        if self.pending_count >= self.batch_size:
+            self.flush_writes()
+
+    def __cached_or_decoded(self, packed_key: int, data: Optional[bytes]) -> Optional[HexagonDataType]:
+        page = self.pages.get(packed_key >> self.page_bits)
+        if page is not None and packed_key in page:
+            return self.__decoded(page, packed_key)
+        if data is None:
+            return None
+        hexagon = self.__tracked(packed_key)
+        if hexagon is None:
+            hexagon = self.decode_hexagon(data)
+            self.__track(packed_key, hexagon, data)
+        return hexagon
+
+    def __decoded(self, page: dict[int, tuple[Optional[HexagonDataType], Optional[bytes]]],
+                  packed_key: int) -> Optional[HexagonDataType]:
+        entry = page.get(packed_key)
+        if entry is None:
+            return None
+        hexagon, data = entry
+        if hexagon is None and data is not None:
+            # A hexagon handed out before is taken back into the page. Changes made to it since
+            # differ from the data, so they are written back like any other.
+            hexagon = self.__tracked(packed_key)
+            if hexagon is None:
+                hexagon = self.decode_hexagon(data)
+            self.detached.pop(packed_key, None)
+            page[packed_key] = (hexagon, data)
+        return hexagon
+
+    def __len__(self) -> int:
+        self.flush_writes()
+        return self.connection.execute(self.COUNT).fetchone()[0]
@@ -1,8 +1,10 @@
 from __future__ import annotations  # This enables us to type hint a class within its own definition.
 
 from abc import ABC, abstractmethod
-from typing import Generic, Optional
+from collections import OrderedDict
+from typing import Callable, Generic, Iterator, Optional
 
+from mixite._optional import require_numpy
 from mixite.coord import CubeCoordinate
 from mixite import HexagonDataType
 
@@ -11,8 +13,20 @@ class HexagonDataStorage(ABC, Generic[HexagonDataType]):
     """ Important: The Kotlin library associates the CubeCoordinate to a SatelliteData object.
     This library associates it with the Hexagon object instead, and the Hexagon will handle
     the SatelliteData.
+
+    version is None for storages that do not track their changes. Storages that set it to
+    an int bump it on every call that adds, replaces or clears data, so that structures
+    derived from the storage (see HexagonGridImpl.get_index) can tell when they are stale.
+    Grids only keep a GridIndex over storages that do, and search the others one key at a time.
+
+    paged is True for storages that only keep part of their contents in memory and load the
+    rest on demand. Grids do not build a GridIndex over them, so searches go through
+    get_data_for_key and only load what they reach.
     """
 
+    version: Optional[int] = None
+    paged: bool = False
+
     @abstractmethod
     def add_coord(self, cube_coordinate: CubeCoordinate):
         pass
@@ -57,46 +71,620 @@ class HexagonDataStorage(ABC, Generic[HexagonDataType]):
     @abstractmethod
     def clear_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
         """
-        Delete the HexagonDataType associated with the given coordinate, if any exists.
+        Delete the HexagonDataType associated with the given coordinate, if any exists. The
+        coordinate stays in the storage, and is added to it if it was not there yet.
         :param cube_coordinate:
-        :return: True if data was deleted; False otherwise.
+        :return: True if the coordinate was already in the storage; False otherwise.
         """
         pass
 
+    def iter_keys(self) -> Iterator[int]:
+        """
+        :return: An iterator over the packed keys (see CubeCoordinate.pack) of every
+                 coordinate in this storage object.
+        :raises TypeError: If the storage does not override this. The other methods can
+                           only look coordinates up, not list them.
+        """
+        raise TypeError("{} does not implement iter_keys, so its coordinates cannot be listed."
+                        .format(type(self).__name__))
+
+    def iter_data(self) -> Iterator[HexagonDataType]:
+        """
+        :return: An iterator over every HexagonDataType object in this storage object.
+                 Coordinates without data are skipped. The default looks up every key of
+                 iter_keys.
+        """
+        get_data_for_key = self.get_data_for_key
+        return (hexagon for hexagon in map(get_data_for_key, self.iter_keys()) if hexagon is not None)
+
+    def contains_key(self, packed_key: int) -> bool:
+        """
+        Same as contains, for a key produced by CubeCoordinate.pack. Implementations
+        that key on packed ints internally should override this to skip the coordinate.
+        """
+        return self.contains(CubeCoordinate.from_packed_key(packed_key))
+
+    def get_data_for_key(self, packed_key: int) -> Optional[HexagonDataType]:
+        """
+        Same as get_data_for, for a key produced by CubeCoordinate.pack. Implementations
+        that key on packed ints internally should override this to skip the coordinate.
+        """
+        return self.get_data_for(CubeCoordinate.from_packed_key(packed_key))
+
+    def add_coord_arrays_with_data(self, cube_xs, cube_zs, hexagons: list[Optional[HexagonDataType]]):
+        """
+        Bulk form of add_coord_with_data for coordinates held in arrays, such as the ones
+        from GridLayoutStrategy.fetch_grid_coord_arrays.
+        :param cube_xs: Array of cube x values.
+        :param cube_zs: Array of cube z values, the same length as cube_xs.
+        :param hexagons: The data for each coordinate, in the same order.
+        """
+        for cube_x, cube_z, hexagon in zip(cube_xs.tolist(), cube_zs.tolist(), hexagons):
+            self.add_coord_with_data(CubeCoordinate(cube_x, cube_z), hexagon)
+
+    def contains_key_array(self, packed_keys):
+        """
+        Vectorized form of contains_key. Requires NumPy.
+        :param packed_keys: NumPy int64 array of keys produced by CubeCoordinate.pack.
+        :return: Boolean NumPy array, True where the key is in this storage object.
+        """
+        np = require_numpy()
+        # Each distinct key is only checked once.
+        unique_keys, inverse = np.unique(packed_keys, return_inverse=True)
+        contains_key = self.contains_key
+        unique_contained = np.fromiter((contains_key(packed_key) for packed_key in unique_keys.tolist()),
+                                       dtype=bool, count=len(unique_keys))
+        return unique_contained[inverse.reshape(np.shape(packed_keys))]
+
+    def iter_data_by_cube_range(self, from_coord: CubeCoordinate, to_coord: CubeCoordinate) \
+            -> Iterator[Optional[HexagonDataType]]:
+        """
+        Yields the data of every stored coordinate in the range, row by row (z, then x), with
+        None for coordinates without data. Storages that can read a range in fewer lookups,
+        such as one backed by a database, override this.
+        """
+        for grid_z in range(from_coord.gridZ, to_coord.gridZ + 1):
+            for grid_x in range(from_coord.gridX, to_coord.gridX + 1):
+                packed_key = CubeCoordinate.pack(grid_x, grid_z)
+                if self.contains_key(packed_key):
+                    yield self.get_data_for_key(packed_key)
+
     @abstractmethod
     def get_for_coords(self, cube_x: int, cube_z: int) -> CubeCoordinate | None:
+        """
+        Implementations should resolve this with a hashed or indexed lookup rather than
+        a scan, since it sits on the pixel picking path.
+        :param cube_x:
+        :param cube_z:
+        :return: The stored coordinate matching the given cube values, or None if the
+                 coordinate is not in this storage object.
+        """
         pass
 
 
 class DefaultHexagonDataStorage(HexagonDataStorage, Generic[HexagonDataType]):
 
+    version = 0
+
     def __init__(self):
         # Initially empty dictionary representing the underlying storage.
-        self.cube_hex_data = dict[CubeCoordinate, Optional[HexagonDataType]]()
+        # Keys are packed coordinates (see CubeCoordinate.pack).
+        self.cube_hex_data = dict[int, Optional[HexagonDataType]]()
+
+    def add_coord(self, cube_coordinate: CubeCoordinate):
+        self.cube_hex_data[cube_coordinate.to_packed_key()] = None
+        self.version += 1
+
+    def add_coord_with_data(self, cube_coordinate: CubeCoordinate, hexagon: Optional[HexagonDataType]) -> bool:
+        packed_key = cube_coordinate.to_packed_key()
+        has_previous = packed_key in self.cube_hex_data
+        self.cube_hex_data[packed_key] = hexagon
+        self.version += 1
+        return has_previous
+
+    def get_data_for(self, cube_coordinate: CubeCoordinate) -> Optional[HexagonDataType]:
+        return self.cube_hex_data.get(cube_coordinate.to_packed_key())
+
+    def contains(self, cube_coordinate: CubeCoordinate) -> bool:
+        return cube_coordinate.to_packed_key() in self.cube_hex_data
+
+    def has_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
+        return self.cube_hex_data.get(cube_coordinate.to_packed_key()) is not None
+
+    def clear_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
+        return self.add_coord_with_data(cube_coordinate, None)
+
+    def iter_keys(self) -> Iterator[int]:
+        return iter(self.cube_hex_data)
+
+    def iter_data(self) -> Iterator[HexagonDataType]:
+        return (hexagon for hexagon in self.cube_hex_data.values() if hexagon is not None)
+
+    def contains_key(self, packed_key: int) -> bool:
+        return packed_key in self.cube_hex_data
+
+    def get_data_for_key(self, packed_key: int) -> Optional[HexagonDataType]:
+        return self.cube_hex_data.get(packed_key)
+
+    def get_for_coords(self, cube_x: int, cube_z: int) -> CubeCoordinate | None:
+        if CubeCoordinate.pack(cube_x, cube_z) in self.cube_hex_data:
+            return CubeCoordinate(cube_x, cube_z)
+        return None
+
+    def __len__(self) -> int:
+        return len(self.cube_hex_data)
+
+
+class DenseHexagonDataStorage(HexagonDataStorage, Generic[HexagonDataType]):
+    """
+    Storage for grids whose coordinates fall in a known bounding box, such as the ones
+    produced by the layouts in mixite.layout. Each coordinate in the box maps to a slot
+    in a flat list, and a parallel occupancy map (one byte per slot) records which
+    coordinates have been added. Lookups are index arithmetic instead of hashing.
+
+    Slot index = (z - min_z) * span_x + (x - min_x)
+    """
+
+    version = 0
+
+    def __init__(self, min_x: int, min_z: int, max_x: int, max_z: int):
+        """
+        The bounds are inclusive. Adding a coordinate outside of them raises a ValueError.
+        """
+        self.min_x = min_x
+        self.min_z = min_z
+        self.span_x = max_x - min_x + 1
+        self.span_z = max_z - min_z + 1
+        self.slots: list[Optional[HexagonDataType]] = [None] * (self.span_x * self.span_z)
+        self.occupied = bytearray(self.span_x * self.span_z)
+        self.coord_count = 0
+
+    @staticmethod
+    def for_coords(coords: list[CubeCoordinate]) -> DenseHexagonDataStorage:
+        """
+        :return: An empty storage object whose bounds are the bounding box of the given coordinates.
+        """
+        if len(coords) == 0:
+            return DenseHexagonDataStorage(0, 0, -1, -1)
+        grid_xs = [coord.gridX for coord in coords]
+        grid_zs = [coord.gridZ for coord in coords]
+        return DenseHexagonDataStorage(min(grid_xs), min(grid_zs), max(grid_xs), max(grid_zs))
+
+    @staticmethod
+    def for_coord_arrays(cube_xs, cube_zs) -> DenseHexagonDataStorage:
+        """
+        Same as for_coords, for coordinates held in NumPy arrays.
+        """
+        if len(cube_xs) == 0:
+            return DenseHexagonDataStorage(0, 0, -1, -1)
+        return DenseHexagonDataStorage(int(cube_xs.min()), int(cube_zs.min()), int(cube_xs.max()), int(cube_zs.max()))
+
+    def slot_of(self, cube_x: int, cube_z: int) -> int:
+        """
+        :return: The slot index for the given coordinate, or -1 if it is outside the bounds.
+        """
+        offset_x = cube_x - self.min_x
+        offset_z = cube_z - self.min_z
+        if 0 <= offset_x < self.span_x and 0 <= offset_z < self.span_z:
+            return offset_z * self.span_x + offset_x
+        return -1
+
+    def slot_of_key(self, packed_key: int) -> int:
+        cube_x = (packed_key + 0x80000000) >> 32
+        offset_x = cube_x - self.min_x
+        offset_z = packed_key - (cube_x << 32) - self.min_z
+        if 0 <= offset_x < self.span_x and 0 <= offset_z < self.span_z:
+            return offset_z * self.span_x + offset_x
+        return -1
+
+    def __checked_slot(self, cube_coordinate: CubeCoordinate) -> int:
+        slot = self.slot_of(cube_coordinate.gridX, cube_coordinate.gridZ)
+        if slot < 0:
+            raise ValueError("Coordinate " + repr(cube_coordinate) + " is outside the storage bounds.")
+        return slot
+
+    def add_coord(self, cube_coordinate: CubeCoordinate):
+        self.add_coord_with_data(cube_coordinate, None)
+
+    def add_coord_with_data(self, cube_coordinate: CubeCoordinate, hexagon: Optional[HexagonDataType]) -> bool:
+        slot = self.__checked_slot(cube_coordinate)
+        has_previous = self.occupied[slot] == 1
+        if not has_previous:
+            self.occupied[slot] = 1
+            self.coord_count += 1
+        self.slots[slot] = hexagon
+        self.version += 1
+        return has_previous
+
+    def add_coord_arrays_with_data(self, cube_xs, cube_zs, hexagons: list[Optional[HexagonDataType]]):
+        np = require_numpy()
+        offset_xs = cube_xs - self.min_x
+        offset_zs = cube_zs - self.min_z
+        if len(cube_xs) > 0 and (offset_xs.min() < 0 or offset_xs.max() >= self.span_x
+                                 or offset_zs.min() < 0 or offset_zs.max() >= self.span_z):
+            raise ValueError("Coordinate arrays extend outside the storage bounds.")
+        slots = offset_zs * self.span_x + offset_xs
+        np.frombuffer(self.occupied, dtype=np.uint8)[slots] = 1
+        self.coord_count = self.occupied.count(1)
+        storage_slots = self.slots
+        for slot, hexagon in zip(slots.tolist(), hexagons):
+            storage_slots[slot] = hexagon
+        self.version += 1
+
+    def get_data_for(self, cube_coordinate: CubeCoordinate) -> Optional[HexagonDataType]:
+        slot = self.slot_of(cube_coordinate.gridX, cube_coordinate.gridZ)
+        return None if slot < 0 else self.slots[slot]
+
+    def contains(self, cube_coordinate: CubeCoordinate) -> bool:
+        slot = self.slot_of(cube_coordinate.gridX, cube_coordinate.gridZ)
+        return slot >= 0 and self.occupied[slot] == 1
+
+    def has_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
+        return self.get_data_for(cube_coordinate) is not None
+
+    def clear_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
+        # Coordinates outside the bounds cannot be added, so there is nothing to clear.
+        if self.slot_of(cube_coordinate.gridX, cube_coordinate.gridZ) < 0:
+            return False
+        return self.add_coord_with_data(cube_coordinate, None)
+
+    def iter_keys(self) -> Iterator[int]:
+        span_x = self.span_x
+        for slot, occupied in enumerate(self.occupied):
+            if occupied:
+                offset_z, offset_x = divmod(slot, span_x)
+                yield CubeCoordinate.pack(self.min_x + offset_x, self.min_z + offset_z)
+
+    def iter_data(self) -> Iterator[HexagonDataType]:
+        return (hexagon for hexagon in self.slots if hexagon is not None)
+
+    # The two key lookups below inline slot_of_key, since they are the grid's hottest calls.
+
+    def contains_key(self, packed_key: int) -> bool:
+        cube_x = (packed_key + 0x80000000) >> 32
+        offset_x = cube_x - self.min_x
+        offset_z = packed_key - (cube_x << 32) - self.min_z
+        if 0 <= offset_x < self.span_x and 0 <= offset_z < self.span_z:
+            return self.occupied[offset_z * self.span_x + offset_x] == 1
+        return False
+
+    def get_data_for_key(self, packed_key: int) -> Optional[HexagonDataType]:
+        cube_x = (packed_key + 0x80000000) >> 32
+        offset_x = cube_x - self.min_x
+        offset_z = packed_key - (cube_x << 32) - self.min_z
+        if 0 <= offset_x < self.span_x and 0 <= offset_z < self.span_z:
+            return self.slots[offset_z * self.span_x + offset_x]
+        return None
+
+    def contains_key_array(self, packed_keys):
+        np = require_numpy()
+        packed_keys = np.asarray(packed_keys, dtype=np.int64)
+        cube_x = (packed_keys + 0x80000000) >> 32
+        offset_x = cube_x - self.min_x
+        offset_z = packed_keys - (cube_x << 32) - self.min_z
+        in_bounds = (offset_x >= 0) & (offset_x < self.span_x) & (offset_z >= 0) & (offset_z < self.span_z)
+        slots = np.where(in_bounds, offset_z * self.span_x + offset_x, 0)
+        return in_bounds & (np.frombuffer(self.occupied, dtype=np.uint8)[slots] == 1)
+
+    def get_for_coords(self, cube_x: int, cube_z: int) -> CubeCoordinate | None:
+        slot = self.slot_of(cube_x, cube_z)
+        if slot >= 0 and self.occupied[slot] == 1:
+            return CubeCoordinate(cube_x, cube_z)
+        return None
+
+    def __len__(self) -> int:
+        return self.coord_count
+
+
+class LazyDenseHexagonDataStorage(DenseHexagonDataStorage, Generic[HexagonDataType]):
+    """
+    DenseHexagonDataStorage that creates its hexagons on first access. Slots marked pending
+    have data that the factory has not been asked for yet, so a storage holding millions
+    of coordinates can be filled with a single byte copy (see add_pending_slots) and only
+    pays for the hexagons that are actually looked up.
+    """
+
+    def __init__(self, min_x: int, min_z: int, max_x: int, max_z: int,
+                 factory: Callable[[int, int], HexagonDataType]):
+        """
+        :param factory: Called as factory(cube_x, cube_z) to create a pending hexagon.
+        """
+        super().__init__(min_x, min_z, max_x, max_z)
+        self.factory = factory
+        self.pending = bytearray(self.span_x * self.span_z)
+
+    def add_pending_slots(self, occupied):
+        """
+        Adds every coordinate whose slot is 1 in occupied, replacing whatever was stored.
+        :param occupied: One byte per slot, in slot order, such as the occupied map of
+                         another storage with the same bounds.
+        """
+        if len(occupied) != len(self.occupied):
+            raise ValueError("Expected {} slots, got {}.".format(len(self.occupied), len(occupied)))
+        self.occupied[:] = occupied
+        self.pending[:] = occupied
+        self.slots = [None] * len(self.occupied)
+        self.coord_count = self.occupied.count(1)
+        self.version += 1
+
+    def hexagon_at(self, slot: int) -> Optional[HexagonDataType]:
+        """
+        :return: The hexagon in the given slot, created first if it is pending.
+        """
+        hexagon = self.slots[slot]
+        if hexagon is None and self.pending[slot]:
+            offset_z, offset_x = divmod(slot, self.span_x)
+            hexagon = self.slots[slot] = self.factory(self.min_x + offset_x, self.min_z + offset_z)
+            self.pending[slot] = 0
+        return hexagon
+
+    def add_coord_with_data(self, cube_coordinate: CubeCoordinate, hexagon: Optional[HexagonDataType]) -> bool:
+        has_previous = super().add_coord_with_data(cube_coordinate, hexagon)
+        self.pending[self.slot_of(cube_coordinate.gridX, cube_coordinate.gridZ)] = 0
+        return has_previous
+
+    def add_coord_arrays_with_data(self, cube_xs, cube_zs, hexagons: list[Optional[HexagonDataType]]):
+        super().add_coord_arrays_with_data(cube_xs, cube_zs, hexagons)
+        np = require_numpy()
+        np.frombuffer(self.pending, dtype=np.uint8)[(cube_zs - self.min_z) * self.span_x + cube_xs - self.min_x] = 0
+
+    def get_data_for(self, cube_coordinate: CubeCoordinate) -> Optional[HexagonDataType]:
+        slot = self.slot_of(cube_coordinate.gridX, cube_coordinate.gridZ)
+        return None if slot < 0 else self.hexagon_at(slot)
+
+    def has_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
+        slot = self.slot_of(cube_coordinate.gridX, cube_coordinate.gridZ)
+        return slot >= 0 and (self.slots[slot] is not None or self.pending[slot] == 1)
+
+    def iter_data(self) -> Iterator[HexagonDataType]:
+        hexagon_at = self.hexagon_at
+        return (hexagon_at(slot) for slot, occupied in enumerate(self.occupied)
+                if occupied and (self.slots[slot] is not None or self.pending[slot]))
+
+    def get_data_for_key(self, packed_key: int) -> Optional[HexagonDataType]:
+        cube_x = (packed_key + 0x80000000) >> 32
+        offset_x = cube_x - self.min_x
+        offset_z = packed_key - (cube_x << 32) - self.min_z
+        if 0 <= offset_x < self.span_x and 0 <= offset_z < self.span_z:
+            slot = offset_z * self.span_x + offset_x
+            hexagon = self.slots[slot]
+            if hexagon is None and self.pending[slot]:
+                return self.hexagon_at(slot)
+            return hexagon
+        return None
+
+
+class ReadOnlyDenseHexagonDataStorage(LazyDenseHexagonDataStorage, Generic[HexagonDataType]):
+    """
+    LazyDenseHexagonDataStorage over an occupied map it does not own, such as a memoryview
+    over a mapped file (see mixite.snapshot.map_snapshot). Every occupied slot has data, so
+    the map doubles as the pending flags, and the hexagons created so far are kept in a dict
+    instead of a list the size of the bounding box. Nothing is copied, and anything that
+    would change the storage raises a TypeError.
+    """
+
+    def __init__(self, min_x: int, min_z: int, max_x: int, max_z: int, occupied,
+                 factory: Callable[[int, int], HexagonDataType], coord_count: Optional[int] = None):
+        """
+        :param occupied: One byte per slot, in slot order, 1 where there is a coordinate.
+        :param coord_count: The number of 1 bytes in occupied, if known, to save counting them.
+        """
+        # DenseHexagonDataStorage.__init__ would allocate the per-slot structures.
+        self.min_x = min_x
+        self.min_z = min_z
+        self.span_x = max_x - min_x + 1
+        self.span_z = max_z - min_z + 1
+        if len(occupied) != self.span_x * self.span_z:
+            raise ValueError("Expected {} slots, got {}.".format(self.span_x * self.span_z, len(occupied)))
+        self.occupied = occupied
+        self.pending = occupied
+        self.slots = None
+        self.created: dict[int, HexagonDataType] = {}
+        self.factory = factory
+        self.coord_count = coord_count if coord_count is not None else bytes(occupied).count(1)
+
+    def hexagon_at(self, slot: int) -> Optional[HexagonDataType]:
+        hexagon = self.created.get(slot)
+        if hexagon is None and self.occupied[slot]:
+            offset_z, offset_x = divmod(slot, self.span_x)
+            hexagon = self.created[slot] = self.factory(self.min_x + offset_x, self.min_z + offset_z)
+        return hexagon
+
+    def get_data_for_key(self, packed_key: int) -> Optional[HexagonDataType]:
+        slot = self.slot_of_key(packed_key)
+        return None if slot < 0 else self.hexagon_at(slot)
+
+    def has_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
+        return self.contains(cube_coordinate)
+
+    def iter_data(self) -> Iterator[HexagonDataType]:
+        hexagon_at = self.hexagon_at
+        return (hexagon_at(slot) for slot, occupied in enumerate(self.occupied) if occupied)
+
+    def add_coord(self, cube_coordinate: CubeCoordinate):
+        raise TypeError("This storage is read-only.")
+
+    def add_coord_with_data(self, cube_coordinate: CubeCoordinate, hexagon: Optional[HexagonDataType]) -> bool:
+        raise TypeError("This storage is read-only.")
+
+    def add_coord_arrays_with_data(self, cube_xs, cube_zs, hexagons: list[Optional[HexagonDataType]]):
+        raise TypeError("This storage is read-only.")
+
+    def add_pending_slots(self, occupied):
+        raise TypeError("This storage is read-only.")
+
+    def clear_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
+        raise TypeError("This storage is read-only.")
+
+
+class ChunkedHexagonDataStorage(HexagonDataStorage, Generic[HexagonDataType]):
+    """
+    Storage for unbounded maps that keeps only the chunks in use in memory. Coordinates are
+    grouped into chunk_size x chunk_size squares of cube x and z, so chunk (chunk_x, chunk_z)
+    holds the coordinates with cube_x // chunk_size == chunk_x and cube_z // chunk_size ==
+    chunk_z. Looking up any coordinate of a chunk that is not loaded calls the loader, which
+    can read the chunk from somewhere or generate it. The memory budget is max_cells, the
+    number of coordinates held by the loaded chunks, since that is what a chunk costs whatever
+    its size and however full it is. Once the loaded chunks hold more than max_cells
+    coordinates, or there are more than max_chunks of them, the least recently used chunks are
+    evicted, each after being passed to the unloader if there is one. The chunk in use is never
+    evicted, even if it holds more than max_cells on its own. Without an unloader, changes to
+    evicted chunks are lost and the loader is asked for them again.
+
+    Every lookup goes through the chunks, so lookups and range reads work across chunk
+    boundaries. iter_keys, iter_data and len only cover the loaded chunks, and loading or
+    evicting a chunk bumps version, like a change to the data does. The storage is paged, so
+    the searches of HexagonGridCalculator look hexagons up one key at a time and load the
+    chunks they reach.
+    """
+
+    version = 0
+    paged = True
+
+    def __init__(self, loader: Callable[[int, int], dict[int, Optional[HexagonDataType]]], chunk_size: int = 32,
+                 max_chunks: int = 256,
+                 unloader: Optional[Callable[[int, int, dict[int, Optional[HexagonDataType]]], None]] = None,
+                 max_cells: Optional[int] = None):
+        """
+        :param loader: Called as loader(chunk_x, chunk_z). Returns the chunk's coordinates as a
+                       dict from packed key to data, None for coordinates without data. The
+                       storage keeps the dict and changes it in place.
+        :param chunk_size: The width and height of a chunk, in cube coordinates.
+        :param max_chunks: How many chunks can be loaded at once.
+        :param unloader: Called as unloader(chunk_x, chunk_z, cells) with the dict of every
+                         chunk that is evicted.
+        :param max_cells: How many coordinates the loaded chunks can hold at once. Defaults to
+                          chunk_size ** 2 * max_chunks, as many as max_chunks full chunks hold.
+        """
+        if max_cells is None:
+            max_cells = chunk_size * chunk_size * max_chunks
+        if chunk_size < 1 or max_chunks < 1 or max_cells < 1:
+            raise ValueError("chunk_size, max_chunks and max_cells must be at least 1.")
+        self.loader = loader
+        self.unloader = unloader
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.max_cells = max_cells
+        # Packed (chunk_x, chunk_z) -> the chunk's cells, least recently used first.
+        self.chunks: OrderedDict[int, dict[int, Optional[HexagonDataType]]] = OrderedDict()
+        # How many coordinates the loaded chunks hold, measured against max_cells.
+        self.loaded_cells = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def chunk_of(self, cube_x: int, cube_z: int) -> dict[int, Optional[HexagonDataType]]:
+        """
+        :return: The cells of the chunk holding the given coordinate, loaded first if needed.
+        """
+        chunk_x = cube_x // self.chunk_size
+        chunk_z = cube_z // self.chunk_size
+        chunk_key = CubeCoordinate.pack(chunk_x, chunk_z)
+        cells = self.chunks.get(chunk_key)
+        if cells is not None:
+            self.hits += 1
+            self.chunks.move_to_end(chunk_key)
+            return cells
+
+        self.misses += 1
+        cells = self.chunks[chunk_key] = self.loader(chunk_x, chunk_z)
+        self.loaded_cells += len(cells)
+        self.__evict_over_budget()
+        self.version += 1
+        return cells
+
+    def is_loaded(self, cube_x: int, cube_z: int) -> bool:
+        """
+        :return: Whether the chunk holding the given coordinate is in memory. Does not load it.
+        """
+        return CubeCoordinate.pack(cube_x // self.chunk_size, cube_z // self.chunk_size) in self.chunks
+
+    def unload_all(self):
+        """
+        Evicts every chunk, passing each one to the unloader.
+        """
+        while self.chunks:
+            self.__evict()
+        self.version += 1
+
+    def __evict_over_budget(self):
+        # The chunk in use was moved to the end, so it is the last one to go.
+        while len(self.chunks) > 1 and (len(self.chunks) > self.max_chunks or self.loaded_cells > self.max_cells):
+            self.__evict()
+
+    def __evict(self):
+        chunk_key, cells = self.chunks.popitem(last=False)
+        self.loaded_cells -= len(cells)
+        self.evictions += 1
+        if self.unloader is not None:
+            chunk_x = (chunk_key + 0x80000000) >> 32
+            self.unloader(chunk_x, chunk_key - (chunk_x << 32), cells)
+
+    def __chunk_of_key(self, packed_key: int) -> dict[int, Optional[HexagonDataType]]:
+        cube_x = (packed_key + 0x80000000) >> 32
+        return self.chunk_of(cube_x, packed_key - (cube_x << 32))
 
     def add_coord(self, cube_coordinate: CubeCoordinate):
-        self.cube_hex_data[cube_coordinate] = None
+        self.add_coord_with_data(cube_coordinate, None)
 
     def add_coord_with_data(self, cube_coordinate: CubeCoordinate, hexagon: Optional[HexagonDataType]) -> bool:
-        has_previous = cube_coordinate in self.cube_hex_data
-        self.cube_hex_data[cube_coordinate] = hexagon
+        cells = self.chunk_of(cube_coordinate.gridX, cube_coordinate.gridZ)
+        packed_key = cube_coordinate.to_packed_key()
+        has_previous = packed_key in cells
+        cells[packed_key] = hexagon
+        if not has_previous:
+            self.loaded_cells += 1
+            self.__evict_over_budget()
+        self.version += 1
         return has_previous
 
     def get_data_for(self, cube_coordinate: CubeCoordinate) -> Optional[HexagonDataType]:
-        return self.cube_hex_data.get(cube_coordinate)
+        return self.chunk_of(cube_coordinate.gridX, cube_coordinate.gridZ).get(cube_coordinate.to_packed_key())
 
     def contains(self, cube_coordinate: CubeCoordinate) -> bool:
-        return cube_coordinate in self.cube_hex_data.keys()
+        return cube_coordinate.to_packed_key() in self.chunk_of(cube_coordinate.gridX, cube_coordinate.gridZ)
 
     def has_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
-        return self.cube_hex_data.get(cube_coordinate) is not None
+        return self.get_data_for(cube_coordinate) is not None
 
     def clear_data_for(self, cube_coordinate: CubeCoordinate) -> bool:
         return self.add_coord_with_data(cube_coordinate, None)
 
+    def iter_keys(self) -> Iterator[int]:
+        return (packed_key for cells in list(self.chunks.values()) for packed_key in cells)
+
+    def iter_data(self) -> Iterator[HexagonDataType]:
+        return (hexagon for cells in list(self.chunks.values()) for hexagon in cells.values() if hexagon is not None)
+
+    def contains_key(self, packed_key: int) -> bool:
+        return packed_key in self.__chunk_of_key(packed_key)
+
+    def get_data_for_key(self, packed_key: int) -> Optional[HexagonDataType]:
+        return self.__chunk_of_key(packed_key).get(packed_key)
+
     def get_for_coords(self, cube_x: int, cube_z: int) -> CubeCoordinate | None:
-        for coord in self.cube_hex_data.keys():
-            if coord.gridX == cube_x and coord.gridZ == cube_z:
-                return coord
+        if CubeCoordinate.pack(cube_x, cube_z) in self.chunk_of(cube_x, cube_z):
+            return CubeCoordinate(cube_x, cube_z)
         return None
 
+    def iter_data_by_cube_range(self, from_coord: CubeCoordinate, to_coord: CubeCoordinate) \
+            -> Iterator[Optional[HexagonDataType]]:
+        """
+        Looks each chunk up once per row instead of once per coordinate.
+        """
+        chunk_size = self.chunk_size
+        for grid_z in range(from_coord.gridZ, to_coord.gridZ + 1):
+            grid_x = from_coord.gridX
+            while grid_x <= to_coord.gridX:
+                cells = self.chunk_of(grid_x, grid_z)
+                segment_end = min(to_coord.gridX, (grid_x // chunk_size + 1) * chunk_size - 1)
+                first_key = CubeCoordinate.pack(grid_x, grid_z)
+                last_key = CubeCoordinate.pack(segment_end, grid_z)
+                # Keys of one row are 1 << 32 apart.
+                for packed_key in range(first_key, last_key + 1, 1 << 32):
+                    if packed_key in cells:
+                        yield cells[packed_key]
+                grid_x = segment_end + 1
+
+    def __len__(self) -> int:
+        return self.loaded_cells
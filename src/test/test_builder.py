@@ -2,7 +2,9 @@ import unittest
 
 from mixite.coord import CubeCoordinate
 from mixite.builder import GridControlBuilder, GridControl
-from mixite.layout import GridLayoutException
+from mixite.layout import GridLayoutException, RectangleGridLayoutStrategy, HexagonGridLayoutStrategy, \
+    TriangleGridLayoutStrategy, TrapezoidGridLayoutStrategy
+from mixite.storage import DefaultHexagonDataStorage, DenseHexagonDataStorage
 
 
 class TestGridControlBuilder(unittest.TestCase):
@@ -17,7 +19,26 @@ class TestGridControlBuilder(unittest.TestCase):
         self.assertEqual(9, grid_control.grid_data.gridWidth)
         self.assertEqual(10, grid_control.grid_data.gridHeight)
         self.assertEqual(CubeCoordinate.POINTY_TOP, grid_control.grid_data.orientation)
-        self.assertEqual(90, len(grid_control.hex_grid.storage.cube_hex_data))
+        self.assertIsInstance(grid_control.hex_grid.storage, DefaultHexagonDataStorage)
+        self.assertEqual(90, len(grid_control.hex_grid.storage))
+        # The default storage takes coordinates anywhere.
+        grid_control.hex_grid.storage.add_coord(CubeCoordinate(-50, 50))
+        self.assertEqual(91, len(grid_control.hex_grid.storage))
+
+    def test_build_all_layouts_dense(self):
+        builder = GridControlBuilder(dense_storage=True)
+        for orientation in [CubeCoordinate.POINTY_TOP, CubeCoordinate.FLAT_TOP]:
+            for build, strategy in [(builder.build_rectangle, RectangleGridLayoutStrategy()),
+                                    (builder.build_hexagon, HexagonGridLayoutStrategy()),
+                                    (builder.build_triangle, TriangleGridLayoutStrategy()),
+                                    (builder.build_trapezoid, TrapezoidGridLayoutStrategy())]:
+                grid_control = build(orientation, 10, 7, 7)
+                storage = grid_control.hex_grid.storage
+                coords = strategy.fetch_grid_coords(7, 7, orientation)
+                self.assertIsInstance(storage, DenseHexagonDataStorage)
+                self.assertEqual(len(coords), len(storage))
+                for coord in coords:
+                    self.assertEqual(coord, storage.get_data_for(coord).get_coords())
 
     def test_build_invalid(self):
         with self.assertRaises(GridLayoutException):
@@ -1,12 +1,16 @@
+import random
 import unittest
 
+from mixite._optional import has_numpy
+
 from mixite.location_metadata import SatelliteData
-from mixite.calculator import HexagonGridCalculator
+from mixite.calculator import ComponentLabels, HexagonGridCalculator
 from mixite.hex import HexagonImpl
 from mixite.storage import DefaultHexagonDataStorage
 from mixite.grid import GridData, HexagonGridImpl
 from mixite.coord import CubeCoordinate, RotationDirection
 from mixite.layout import RectangleGridLayoutStrategy, GridLayoutStrategy
+from mixite.builder import GridControlBuilder
 
 
 class TestHexagonGridCalculator(unittest.TestCase):
@@ -59,6 +63,14 @@ class TestHexagonGridCalculator(unittest.TestCase):
                                        hexagon]
         self.assertListEqual(sorted(expected), sorted(self.calculator.calc_move_range_from(hexagon, 2)))
 
+    def test_iter_move_range(self):
+        self.do_init()
+        hexagon = self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 7))
+        self.assertEqual(self.calculator.calc_move_range_from(hexagon, 2),
+                         list(self.calculator.iter_move_range_from(hexagon, 2)))
+        in_range = self.calculator.iter_move_range_from(hexagon, 2)
+        self.assertEqual(self.grid.get_hex_by_cube_coord(CubeCoordinate(1, 9)), next(in_range))
+
     def test_calc_line_many(self):
         self.do_init()
         actual = self.calculator.draw_line(self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 7)),
@@ -104,6 +116,28 @@ class TestHexagonGridCalculator(unittest.TestCase):
 
         self.assertListEqual([], actual)
 
+    def test_draw_line_matches_interpolation(self):
+        self.do_init()
+        hexagons = list(self.grid.storage.iter_data())
+        for from_hex in hexagons[::7]:
+            for to_hex in hexagons:
+                distance = self.calculator.calc_distance_between(from_hex, to_hex)
+                expected = []
+                for curr_dist in range(distance + 1 if distance else 0):
+                    coord = self.calculator.cube_linear_interpolate(from_hex.get_coords(), to_hex.get_coords(),
+                                                                    1.0 / distance * curr_dist)
+                    if self.grid.get_hex_by_cube_coord(coord) is not None:
+                        expected.append(self.grid.get_hex_by_cube_coord(coord))
+                self.assertListEqual(expected, self.calculator.draw_line(from_hex, to_hex))
+
+    def test_iter_line(self):
+        self.do_init()
+        from_hex = self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 7))
+        to_hex = self.grid.get_hex_by_cube_coord(CubeCoordinate(8, 1))
+        self.assertListEqual(self.calculator.draw_line(from_hex, to_hex),
+                             list(self.calculator.iter_line(from_hex, to_hex)))
+        self.assertEqual(from_hex, next(self.calculator.iter_line(from_hex, to_hex)))
+
     def test_check_visibility(self):
         self.do_init()
         satellite = SatelliteData()
@@ -116,6 +150,116 @@ class TestHexagonGridCalculator(unittest.TestCase):
         self.assertTrue(self.calculator.is_visible(self.grid.get_hex_by_cube_coord(CubeCoordinate(8, 3)), target))
         self.assertTrue(self.calculator.is_visible(self.grid.get_hex_by_cube_coord(CubeCoordinate(7, 1)), target))
 
+    def test_field_of_view_open(self):
+        self.do_init()
+        origin = self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 4))
+        visible = self.calculator.calc_field_of_view(origin, 3)
+        self.assertEqual(origin, visible[0])
+        self.assertListEqual(sorted(self.calculator.calc_move_range_from(origin, 3)), sorted(visible))
+
+    def test_field_of_view_blocked(self):
+        self.do_init()
+        satellite = SatelliteData()
+        satellite.isOpaque = True
+        self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4)).set_satellite(satellite)
+        visible = self.calculator.calc_field_of_view(self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 4)), 3)
+
+        self.assertIn(self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4)), visible)
+        self.assertNotIn(self.grid.get_hex_by_cube_coord(CubeCoordinate(5, 4)), visible)
+        self.assertNotIn(self.grid.get_hex_by_cube_coord(CubeCoordinate(6, 4)), visible)
+        self.assertIn(self.grid.get_hex_by_cube_coord(CubeCoordinate(5, 3)), visible)
+        self.assertIn(self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 5)), visible)
+
+    def test_field_of_view_walled_in(self):
+        self.do_init()
+        origin = self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 4))
+        for neighbor in self.grid.get_neighbors_of(origin):
+            satellite = SatelliteData()
+            satellite.isOpaque = True
+            neighbor.set_satellite(satellite)
+        self.assertListEqual(sorted([origin] + self.grid.get_neighbors_of(origin)),
+                             sorted(self.calculator.calc_field_of_view(origin, 5)))
+
+    def test_field_of_view_sees_what_is_visible(self):
+        rng = random.Random(11)
+        for orientation in [CubeCoordinate.POINTY_TOP, CubeCoordinate.FLAT_TOP]:
+            grid = self.create_rect_grid(12, 12, orientation, RectangleGridLayoutStrategy())
+            calculator = HexagonGridCalculator(grid)
+            hexagons = list(grid.storage.iter_data())
+            for _ in range(100):
+                density = rng.choice([0.1, 0.2, 0.4])
+                for hexagon in hexagons:
+                    if rng.random() < density:
+                        satellite = SatelliteData()
+                        satellite.isOpaque = True
+                        hexagon.set_satellite(satellite)
+                    else:
+                        hexagon.clear_satellite()
+                origin = rng.choice(hexagons)
+                radius = rng.randint(1, 6)
+                visible = set(calculator.calc_field_of_view(origin, radius))
+                for target in calculator.calc_move_range_from(origin, radius):
+                    if calculator.is_visible(origin, target):
+                        self.assertIn(target, visible)
+
+    def test_los_cache_hits(self):
+        self.do_init()
+        cache = self.calculator.enable_los_cache(16)
+        from_hex = self.grid.get_hex_by_cube_coord(CubeCoordinate(8, 1))
+        to_hex = self.grid.get_hex_by_cube_coord(CubeCoordinate(-3, 8))
+        self.assertTrue(self.calculator.is_visible(from_hex, to_hex))
+        self.assertTrue(self.calculator.is_visible(from_hex, to_hex))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_los_cache_invalidation(self):
+        self.do_init()
+        cache = self.calculator.enable_los_cache(16)
+        from_hex = self.grid.get_hex_by_cube_coord(CubeCoordinate(8, 1))
+        target = self.grid.get_hex_by_cube_coord(CubeCoordinate(-3, 8))
+        other = self.grid.get_hex_by_cube_coord(CubeCoordinate(8, 3))
+        self.assertTrue(self.calculator.is_visible(from_hex, target))
+        self.assertTrue(self.calculator.is_visible(other, target))
+
+        # (4, 4) is on the line from (8, 1) but not on the one from (8, 3).
+        satellite = SatelliteData()
+        satellite.isOpaque = True
+        blocker = self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4))
+        blocker.set_satellite(satellite)
+        self.assertEqual(1, len(cache))
+        self.assertFalse(self.calculator.is_visible(from_hex, target))
+        self.assertTrue(self.calculator.is_visible(other, target))
+        self.assertEqual(1, cache.hits)
+
+        # Replacing the satellite without changing opacity keeps the entries.
+        opaque_again = SatelliteData()
+        opaque_again.isOpaque = True
+        blocker.set_satellite(opaque_again)
+        self.assertEqual(2, len(cache))
+        blocker.clear_satellite()
+        self.assertTrue(self.calculator.is_visible(from_hex, target))
+
+    def test_los_cache_eviction(self):
+        self.do_init()
+        cache = self.calculator.enable_los_cache(2)
+        origin = self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 4))
+        targets = [self.grid.get_hex_by_cube_coord(CubeCoordinate(x, 7)) for x in range(4)]
+        for target in targets:
+            self.calculator.is_visible(origin, target)
+        self.assertEqual(2, len(cache))
+        self.assertEqual(2, cache.evictions)
+        self.calculator.is_visible(origin, targets[0])
+        self.assertEqual(0, cache.hits)
+        self.calculator.is_visible(origin, targets[3])
+        self.assertEqual(1, cache.hits)
+
+    def test_los_cache_disable(self):
+        self.do_init()
+        self.calculator.enable_los_cache()
+        self.calculator.disable_los_cache()
+        self.assertIsNone(self.calculator.los_cache)
+        self.assertListEqual([], self.grid.grid_data.satellite_listeners)
+
     def test_rotate_right(self):
         self.do_init()
         start_hex = HexagonImpl(self.grid.grid_data, CubeCoordinate(3, -1))
@@ -195,6 +339,330 @@ class TestHexagonGridCalculator(unittest.TestCase):
         target_hex = HexagonImpl(self.grid.grid_data, CubeCoordinate(4, 4))
         self.assertEqual(6, len(self.calculator.calc_ring_from(target_hex, 1)))
 
+    def test_ring_clipped_by_layout(self):
+        builder = GridControlBuilder()
+        for grid_control in [builder.build_rectangle(CubeCoordinate.FLAT_TOP, 10, 6, 5),
+                             builder.build_hexagon(CubeCoordinate.POINTY_TOP, 10, 7, 7),
+                             builder.build_triangle(CubeCoordinate.POINTY_TOP, 10, 5, 5)]:
+            grid = grid_control.hex_grid
+            layout = grid.layout
+            for center in [CubeCoordinate(0, 0), CubeCoordinate(2, 3), CubeCoordinate(-4, 9)]:
+                center_hex = HexagonImpl(grid.grid_data, center)
+                for radius in range(1, 12):
+                    clipped = grid_control.calculator.calc_ring_from(center_hex, radius)
+                    grid.layout = None
+                    self.assertListEqual(grid_control.calculator.calc_ring_from(center_hex, radius), clipped)
+                    grid.layout = layout
+
+    def test_components(self):
+        self.do_init()
+        self.build_wall(5)
+        components = self.calculator.enable_component_tracking()
+        top = self.grid.get_hex_by_cube_coord(CubeCoordinate(5, 2))
+        bottom = self.grid.get_hex_by_cube_coord(CubeCoordinate(5, 8))
+        self.assertEqual(2, len(components))
+        self.assertFalse(components.are_connected(top, bottom))
+        self.assertTrue(components.are_connected(top, self.grid.get_hex_by_cube_coord(CubeCoordinate(0, 0))))
+        self.assertEqual(ComponentLabels.NO_COMPONENT,
+                         components.component_of(self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 5))))
+        self.assertEqual([], self.calculator.find_path(top, bottom))
+
+    def test_components_follow_satellite_changes(self):
+        self.do_init()
+        self.build_wall(5)
+        components = self.calculator.enable_component_tracking()
+        top = self.grid.get_hex_by_cube_coord(CubeCoordinate(5, 2))
+        bottom = self.grid.get_hex_by_cube_coord(CubeCoordinate(5, 8))
+        gap = self.grid.get_hex_by_cube_coord(CubeCoordinate(0, 5))
+
+        gap.clear_satellite()
+        self.assertEqual(1, len(components))
+        self.assertTrue(components.are_connected(top, bottom))
+        self.assertIn(gap, self.calculator.find_path(top, bottom))
+
+        wall = SatelliteData()
+        wall.isPassable = False
+        gap.set_satellite(wall)
+        self.assertEqual(2, len(components))
+        self.assertFalse(components.are_connected(top, bottom))
+
+    def test_components_match_relabeling(self):
+        self.do_init()
+        components = self.calculator.enable_component_tracking()
+        rng = random.Random(7)
+        hexagons = list(self.grid.storage.iter_data())
+        for _ in range(300):
+            hexagon = rng.choice(hexagons)
+            if hexagon.get_satellite() is None:
+                satellite = SatelliteData()
+                satellite.isPassable = False
+                hexagon.set_satellite(satellite)
+            else:
+                hexagon.clear_satellite()
+            fresh = ComponentLabels(self.grid.get_index())
+            self.assertEqual(len(fresh), len(components))
+            for first in hexagons[::9]:
+                for second in hexagons[::4]:
+                    self.assertEqual(fresh.are_connected(first, second), components.are_connected(first, second))
+
+    def build_wall(self, z: int):
+        # An impassable wall across the whole of row z, which cuts the grid in two.
+        for hexagon in self.grid.storage.iter_data():
+            if hexagon.get_coords().gridZ == z:
+                satellite = SatelliteData()
+                satellite.isPassable = False
+                hexagon.set_satellite(satellite)
+
+    def test_spiral(self):
+        grid_control = GridControlBuilder().build_rectangle(CubeCoordinate.POINTY_TOP, 10, 6, 5)
+        calculator = grid_control.calculator
+        center_hex = grid_control.hex_grid.get_hex_by_cube_coord(CubeCoordinate(2, 2))
+        spiral = list(calculator.iter_spiral_from(center_hex))
+        self.assertEqual(center_hex, spiral[0])
+        self.assertEqual(30, len(spiral))
+        distances = [calculator.calc_distance_between(center_hex, hexagon) for hexagon in spiral]
+        self.assertListEqual(sorted(distances), distances)
+        self.assertEqual(7, len(list(calculator.iter_spiral_from(center_hex, 1))))
+
+    def test_spiral_from_off_grid(self):
+        grid_control = GridControlBuilder().build_rectangle(CubeCoordinate.POINTY_TOP, 10, 6, 5)
+        calculator = grid_control.calculator
+        center_hex = HexagonImpl(grid_control.grid_data, CubeCoordinate(20, 2))
+        nearest = next(calculator.iter_spiral_from(center_hex))
+        self.assertEqual(min(calculator.calc_distance_between(center_hex, hexagon)
+                             for hexagon in grid_control.hex_grid.storage.iter_data()),
+                         calculator.calc_distance_between(center_hex, nearest))
+        self.assertEqual(30, len(list(calculator.iter_spiral_from(center_hex))))
+
+    def test_spiral_without_layout(self):
+        self.do_init()
+        center_hex = self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 4))
+        with self.assertRaises(ValueError):
+            next(self.calculator.iter_spiral_from(center_hex))
+        self.assertEqual(19, len(list(self.calculator.iter_spiral_from(center_hex, 2))))
+
+    def test_find_path_open(self):
+        self.do_init()
+        from_hex = self.grid.get_hex_by_cube_coord(CubeCoordinate(1, 1))
+        to_hex = self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 5))
+        path = self.calculator.find_path(from_hex, to_hex)
+        self.assertEqual(from_hex, path[0])
+        self.assertEqual(to_hex, path[-1])
+        self.assertEqual(self.calculator.calc_distance_between(from_hex, to_hex) + 1, len(path))
+        for index in range(1, len(path)):
+            self.assertIn(path[index], self.grid.get_neighbors_of(path[index - 1]))
+
+    def test_find_path_around_wall(self):
+        self.do_init()
+        # A wall along z = 5, with a single gap at x = 0.
+        for x in range(-2, 8):
+            hexagon = self.grid.get_hex_by_cube_coord(CubeCoordinate(x, 5))
+            if hexagon is not None and x != 0:
+                satellite = SatelliteData()
+                satellite.isPassable = False
+                hexagon.set_satellite(satellite)
+        path = self.calculator.find_path(self.grid.get_hex_by_cube_coord(CubeCoordinate(5, 2)),
+                                         self.grid.get_hex_by_cube_coord(CubeCoordinate(5, 8)))
+        self.assertIn(self.grid.get_hex_by_cube_coord(CubeCoordinate(0, 5)), path)
+        for hexagon in path:
+            self.assertTrue(hexagon.satellite is None or hexagon.satellite.isPassable)
+
+    def test_find_path_prefers_cheap_hexes(self):
+        self.do_init()
+        # Going straight through (4, 4) is expensive, so the path should step around it.
+        satellite = SatelliteData()
+        satellite.movementCost = 10.0
+        self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4)).set_satellite(satellite)
+        path = self.calculator.find_path(self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 3)),
+                                         self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 5)))
+        self.assertEqual(4, len(path))
+        self.assertNotIn(self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4)), path)
+
+    def test_find_path_below_min_cost(self):
+        self.do_init()
+        # A detour through cheap hexagons. Counted at their real cost it beats the straight line.
+        for x, z in [(3, 3), (2, 4), (2, 5), (3, 5)]:
+            satellite = SatelliteData()
+            satellite.movementCost = 0.1
+            self.grid.get_hex_by_cube_coord(CubeCoordinate(x, z)).set_satellite(satellite)
+        from_hex = self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 3))
+        to_hex = self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 5))
+        for min_cost in [None, 0.1, 0.0]:
+            path = self.calculator.find_path(from_hex, to_hex, min_cost)
+            self.assertEqual(6, len(path))
+            self.assertAlmostEqual(1.4, sum(self.calculator.movement_cost_of(step) for step in path[1:]))
+
+    def test_find_path_unreachable(self):
+        self.do_init()
+        target = self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4))
+        for neighbor in self.grid.get_neighbors_of(target):
+            satellite = SatelliteData()
+            satellite.isPassable = False
+            neighbor.set_satellite(satellite)
+        self.assertEqual([], self.calculator.find_path(self.grid.get_hex_by_cube_coord(CubeCoordinate(0, 0)), target))
+
+    def test_find_path_same_hex(self):
+        self.do_init()
+        hexagon = self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4))
+        self.assertEqual([hexagon], self.calculator.find_path(hexagon, hexagon))
+
+    def test_flow_field_matches_find_path(self):
+        self.do_init()
+        for x, z, passable, cost in [(4, 4, False, 1.0), (4, 5, False, 1.0), (2, 3, True, 5.0), (6, 6, True, 3.0)]:
+            satellite = SatelliteData()
+            satellite.isPassable = passable
+            satellite.movementCost = cost
+            self.grid.get_hex_by_cube_coord(CubeCoordinate(x, z)).set_satellite(satellite)
+        goal = self.grid.get_hex_by_cube_coord(CubeCoordinate(5, 5))
+        field = self.calculator.calc_flow_field([goal])
+
+        self.assertEqual(0.0, field.cost_of(goal))
+        self.assertIsNone(field.next_hex(goal))
+        self.assertIsNone(field.cost_of(self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4))))
+        self.assertEqual(98, len(field))
+
+        for hexagon in self.grid.storage.iter_data():
+            if field.cost_of(hexagon) is None:
+                continue
+            path = self.calculator.find_path(hexagon, goal)
+            path_cost = sum(self.calculator.movement_cost_of(step) for step in path[1:])
+            self.assertAlmostEqual(path_cost, field.cost_of(hexagon))
+
+            # Following the field reaches the goal at the same cost.
+            followed_cost = 0.0
+            current = hexagon
+            while current != goal:
+                current = field.next_hex(current)
+                followed_cost += self.calculator.movement_cost_of(current)
+            self.assertAlmostEqual(field.cost_of(hexagon), followed_cost)
+
+    def test_flow_field_many_goals(self):
+        self.do_init()
+        goals = [self.grid.get_hex_by_cube_coord(CubeCoordinate(0, 0)),
+                 self.grid.get_hex_by_cube_coord(CubeCoordinate(5, 9))]
+        field = self.calculator.calc_flow_field(goals)
+        for hexagon in self.grid.storage.iter_data():
+            nearest = min(self.calculator.calc_distance_between(hexagon, goal) for goal in goals)
+            self.assertEqual(nearest, field.cost_of(hexagon))
+        start = self.grid.get_hex_by_cube_coord(CubeCoordinate(1, 1))
+        self.assertIn(field.next_hex(start).get_coords(), [CubeCoordinate(1, 0), CubeCoordinate(0, 1)])
+        self.assertIn(field.direction_of(start), [2, 3])
+
+    def test_flow_field_max_cost(self):
+        self.do_init()
+        goal = self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4))
+        field = self.calculator.calc_flow_field([goal], max_cost=2)
+        self.assertEqual(len(self.calculator.calc_move_range_from(goal, 2)), len(field))
+
+    def test_reachable_open(self):
+        self.do_init()
+        hexagon = self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 7))
+        reachable = self.calculator.calc_reachable_from(hexagon, 2)
+        self.assertEqual((hexagon, 2), reachable[0])
+        self.assertListEqual(sorted(self.calculator.calc_move_range_from(hexagon, 2)),
+                             sorted(reached for reached, _ in reachable))
+        for reached, remaining in reachable:
+            self.assertEqual(2 - self.calculator.calc_distance_between(hexagon, reached), remaining)
+
+    def test_reachable_honors_satellites(self):
+        self.do_init()
+        wall = SatelliteData()
+        wall.isPassable = False
+        swamp = SatelliteData()
+        swamp.movementCost = 2.5
+        self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4)).set_satellite(wall)
+        self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 5)).set_satellite(swamp)
+        start = self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 4))
+        remaining = {reached.get_coords(): left for reached, left in self.calculator.calc_reachable_from(start, 3)}
+
+        self.assertNotIn(CubeCoordinate(4, 4), remaining)
+        self.assertEqual(0.5, remaining[CubeCoordinate(3, 5)])
+        # (5, 4) is two steps away through the wall, so the path has to go around it.
+        self.assertEqual(0.0, remaining[CubeCoordinate(5, 4)])
+        for reached, left in self.calculator.calc_reachable_from(start, 3):
+            path = self.calculator.find_path(start, reached)
+            self.assertAlmostEqual(3 - sum(self.calculator.movement_cost_of(step) for step in path[1:]), left)
+
+    def test_reachable_repeated_queries(self):
+        self.do_init()
+        first = self.grid.get_hex_by_cube_coord(CubeCoordinate(3, 7))
+        second = self.grid.get_hex_by_cube_coord(CubeCoordinate(6, 2))
+        expected = self.calculator.calc_reachable_from(first, 3)
+        self.calculator.calc_reachable_from(second, 4)
+        self.assertListEqual(expected, self.calculator.calc_reachable_from(first, 3))
+
+    def test_satellite_columns_match_objects(self):
+        self.do_init()
+        rng = random.Random(3)
+        for hexagon in self.grid.storage.iter_data():
+            roll = rng.random()
+            if roll < 0.3:
+                satellite = SatelliteData()
+                satellite.isPassable = roll >= 0.1
+                satellite.isOpaque = roll < 0.15
+                satellite.movementCost = rng.choice([1.0, 2.0, 3.5])
+                hexagon.set_satellite(satellite)
+        hexagons = list(self.grid.storage.iter_data())
+        pairs = [(rng.choice(hexagons), rng.choice(hexagons)) for _ in range(40)]
+
+        def run_queries():
+            return ([self.calculator.find_path(start, goal) for start, goal in pairs],
+                    [self.calculator.is_visible(start, goal) for start, goal in pairs],
+                    [self.calculator.calc_reachable_from(start, 4.0) for start, _ in pairs],
+                    [self.calculator.calc_field_of_view(start, 6) for start, _ in pairs],
+                    list(self.calculator.calc_flow_field([goal for _, goal in pairs[:3]]).costs))
+
+        expected = run_queries()
+        self.grid.enable_satellite_columns()
+        self.assertEqual(expected, run_queries())
+
+    def test_untracked_storage_matches_index(self):
+        class UntrackedStorage(DefaultHexagonDataStorage):
+            version = None
+
+        self.do_init()
+        untracked = UntrackedStorage()
+        untracked.cube_hex_data = self.grid.storage.cube_hex_data
+        untracked_grid = HexagonGridImpl(self.grid.grid_data, untracked)
+        untracked_calculator = HexagonGridCalculator(untracked_grid)
+        self.assertIsNone(untracked_grid.get_index())
+        with self.assertRaises(TypeError):
+            untracked_calculator.enable_component_tracking()
+        with self.assertRaises(TypeError):
+            untracked_grid.enable_satellite_columns()
+
+        rng = random.Random(5)
+        for hexagon in self.grid.storage.iter_data():
+            roll = rng.random()
+            if roll < 0.3:
+                satellite = SatelliteData()
+                satellite.isPassable = roll >= 0.1
+                satellite.isOpaque = roll < 0.15
+                satellite.movementCost = rng.choice([1.0, 2.0, 3.5])
+                hexagon.set_satellite(satellite)
+        hexagons = list(self.grid.storage.iter_data())
+        pairs = [(rng.choice(hexagons), rng.choice(hexagons)) for _ in range(40)]
+
+        def path_cost(path):
+            return None if not path else (path[0], path[-1], sum(map(self.calculator.movement_cost_of, path[1:])))
+
+        def run_queries(calculator):
+            # Ties between equally cheap paths may be broken differently, so only costs are compared.
+            field = calculator.calc_flow_field([goal for _, goal in pairs[:3]], max_cost=6.0)
+            return ([path_cost(calculator.find_path(start, goal)) for start, goal in pairs],
+                    [sorted(calculator.calc_reachable_from(start, 4.0)) for start, _ in pairs],
+                    [calculator.calc_field_of_view(start, 6) for start, _ in pairs],
+                    [field.cost_of(hexagon) for hexagon in hexagons], len(field))
+
+        self.assertEqual(run_queries(self.calculator), run_queries(untracked_calculator))
+
+        # The untracked storage shares its dict, so it changes without telling anyone. Without
+        # an index there is nothing to go stale.
+        added = HexagonImpl(self.grid.grid_data, CubeCoordinate(10, 0))
+        self.grid.storage.add_coord_with_data(added.get_coords(), added)
+        self.assertEqual(added, untracked_calculator.find_path(self.grid.get_hex_by_cube_coord(CubeCoordinate(9, 0)),
+                                                               added)[-1])
+
     @staticmethod
     def create_rect_grid(width: int, height: int, orientation: str, layout: GridLayoutStrategy):
         coords = layout.fetch_grid_coords(width, height, orientation)
@@ -206,5 +674,56 @@ class TestHexagonGridCalculator(unittest.TestCase):
         return grid
 
 
+@unittest.skipUnless(has_numpy(), "requires NumPy")
+class TestDistanceKernels(unittest.TestCase):
+
+    def setUp(self):
+        import numpy
+        self.np = numpy
+        grid = TestHexagonGridCalculator.create_rect_grid(7, 6, CubeCoordinate.POINTY_TOP,
+                                                          RectangleGridLayoutStrategy())
+        self.hexagons = list(grid.storage.iter_data())
+        self.cube_xs = numpy.array([hexagon.get_coords().gridX for hexagon in self.hexagons])
+        self.cube_zs = numpy.array([hexagon.get_coords().gridZ for hexagon in self.hexagons])
+
+    def test_distances_from(self):
+        origin = self.hexagons[9]
+        distances = HexagonGridCalculator.calc_distances_from(origin.get_coords().gridX, origin.get_coords().gridZ,
+                                                              self.cube_xs, self.cube_zs)
+        self.assertListEqual([HexagonGridCalculator.calc_distance_between(origin, hexagon)
+                              for hexagon in self.hexagons], distances.tolist())
+
+    def test_pairwise_distances(self):
+        # A tile size that does not divide the count exercises the partial tiles.
+        matrix = HexagonGridCalculator.calc_pairwise_distances(self.cube_xs, self.cube_zs, tile_size=5)
+        self.assertEqual((42, 42), matrix.shape)
+        for row, first in enumerate(self.hexagons):
+            for column, second in enumerate(self.hexagons):
+                self.assertEqual(HexagonGridCalculator.calc_distance_between(first, second), matrix[row, column])
+
+    def test_pairwise_distances_between_sets(self):
+        matrix = HexagonGridCalculator.calc_pairwise_distances(self.cube_xs[:10], self.cube_zs[:10],
+                                                               self.cube_xs[5:], self.cube_zs[5:], tile_size=4)
+        self.assertEqual((10, 37), matrix.shape)
+        self.assertTrue((matrix[7] == HexagonGridCalculator.calc_distances_from(
+            self.cube_xs[7], self.cube_zs[7], self.cube_xs[5:], self.cube_zs[5:])).all())
+        tiles = list(HexagonGridCalculator.iter_pairwise_distance_tiles(self.cube_xs, self.cube_zs, tile_size=16))
+        self.assertEqual(9, len(tiles))
+        self.assertTrue(all(block.shape[0] <= 16 and block.shape[1] <= 16 for _, _, block in tiles))
+
+    def test_pairwise_distances_need_both_other_arrays(self):
+        with self.assertRaises(ValueError):
+            HexagonGridCalculator.calc_pairwise_distances(self.cube_xs, self.cube_zs, other_xs=self.cube_xs[5:])
+        with self.assertRaises(ValueError):
+            next(HexagonGridCalculator.iter_pairwise_distance_tiles(self.cube_xs, self.cube_zs, other_zs=self.cube_zs))
+
+    def test_pairwise_distances_far_apart(self):
+        far = 2 ** 31 - 1
+        matrix = HexagonGridCalculator.calc_pairwise_distances(self.np.array([-far, far]), self.np.array([0, 0]))
+        self.assertEqual(2 * far, matrix[0, 1])
+        self.assertEqual(self.np.int32, HexagonGridCalculator.calc_pairwise_distances(
+            self.cube_xs, self.cube_zs, dtype=self.np.int32).dtype)
+
+
 if __name__ == '__main__':
     unittest.main()
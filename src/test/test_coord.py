@@ -1,6 +1,7 @@
+import pickle
 import unittest
 
-from mixite.coord import CubeCoordinate, CoordinateConverter, RotationDirection
+from mixite.coord import CubeCoordinate, CubeCoordinatePool, CoordinateConverter, RotationDirection
 
 
 def create_incomplete_key():
@@ -42,6 +43,52 @@ class TestCubeCoordinate(unittest.TestCase):
     def test_err_on_malformed_key(self):
         self.assertRaises(ValueError, create_malformed_key)
 
+    def test_equal_and_hash(self):
+        self.assertEqual(CubeCoordinate(-3, 8), CubeCoordinate(-3, 8))
+        self.assertNotEqual(CubeCoordinate(-3, 8), CubeCoordinate(8, -3))
+        self.assertEqual(hash(CubeCoordinate(-3, 8)), hash(CubeCoordinate(-3, 8)))
+        self.assertNotEqual(CubeCoordinate(1, 2), None)
+
+    def test_immutable(self):
+        coord = CubeCoordinate(1, 2)
+        with self.assertRaises(AttributeError):
+            coord.gridX = 5
+        with self.assertRaises(AttributeError):
+            coord.other = 5
+        self.assertEqual(1, coord.gridX)
+
+    def test_packed_key_round_trip(self):
+        for x, z in [(0, 0), (7, 91), (-4, 38), (12, -5), (-2147483648, 2147483647), (2147483647, -2147483648)]:
+            packed_key = CubeCoordinate.pack(x, z)
+            self.assertEqual((x, z), CubeCoordinate.unpack(packed_key))
+            self.assertEqual(packed_key, CubeCoordinate(x, z).to_packed_key())
+            self.assertEqual(CubeCoordinate(x, z), CubeCoordinate.from_packed_key(packed_key))
+
+    def test_packed_key_is_linear(self):
+        self.assertEqual(CubeCoordinate.pack(3, -6), CubeCoordinate.pack(4, -7) + CubeCoordinate.pack(-1, 1))
+
+    def test_pickle(self):
+        coord = pickle.loads(pickle.dumps(CubeCoordinate(-4, 9)))
+        self.assertEqual(CubeCoordinate(-4, 9), coord)
+
+
+class TestCubeCoordinatePool(unittest.TestCase):
+
+    def test_shares_equal_coords(self):
+        pool = CubeCoordinatePool()
+        first = pool.get(3, 4)
+        self.assertIs(first, pool.get(3, 4))
+        self.assertIs(first, pool.intern(CubeCoordinate(3, 4)))
+        self.assertIsNot(first, pool.get(4, 3))
+        self.assertEqual(2, len(pool))
+
+    def test_clear(self):
+        pool = CubeCoordinatePool()
+        first = pool.get(3, 4)
+        pool.clear()
+        self.assertEqual(0, len(pool))
+        self.assertIsNot(first, pool.get(3, 4))
+
 
 class TestRotationDirection(unittest.TestCase):
 
@@ -1,12 +1,16 @@
+import random
 import unittest
+from unittest import mock
 
-from mixite.coord import CubeCoordinate
+from mixite._optional import has_numpy
+from mixite.coord import CubeCoordinate, CubeCoordinatePool
 from mixite.layout import RectangleGridLayoutStrategy
 from mixite.shapes import Point
 from mixite.location_metadata import SatelliteData
-from mixite.storage import DefaultHexagonDataStorage
-from mixite.grid import HexagonGridImpl
+from mixite.storage import ChunkedHexagonDataStorage, DefaultHexagonDataStorage, DenseHexagonDataStorage
+from mixite.grid import DenseGridIndex, GridIndex, HexagonGrid, HexagonGridImpl
 from mixite.hex import HexagonImpl, GridData
+from mixite.calculator import HexagonGridCalculator
 
 
 class TestGridData(unittest.TestCase):
@@ -75,6 +79,15 @@ class TestHexagonImpl(unittest.TestCase):
         self.assertEqual(69, round(target.center.coordX))
         self.assertEqual(55, round(target.center.coordY))
 
+    def test_lazy_geometry(self):
+        target = HexagonImpl(GridData(CubeCoordinate.POINTY_TOP, 10.0, 1, 1), CubeCoordinate(2, 3))
+        self.assertIsNone(target._center)
+        self.assertIsNone(target._points)
+        self.assertIs(target.points, target.points)
+        self.assertEqual(round(target.points[3].coordX), round(target.external_bounding_box.left))
+        self.assertEqual(12.5, target.internal_bounding_box.width)
+        self.assertFalse(hasattr(target, '__dict__'))
+
     def test_center_flat(self):
         target = HexagonImpl(GridData(CubeCoordinate.FLAT_TOP, 10.0, 1, 1), CubeCoordinate(2, 3))
         self.assertEqual(40, round(target.center.coordX))
@@ -124,6 +137,18 @@ class TestHexagonGridImpl(unittest.TestCase):
                 range_z = z + 4
                 self.assertTrue(CubeCoordinate(range_x, range_z) in cubes_in_range)
 
+    def test_iter_ranges_match_lists(self):
+        grid = self.create_rect_grid(10, 10)
+        self.assertEqual(grid.get_hexagons_by_cube_range(CubeCoordinate(2, 3), CubeCoordinate(4, 5)),
+                         list(grid.iter_hexagons_by_cube_range(CubeCoordinate(2, 3), CubeCoordinate(4, 5))))
+        self.assertEqual(grid.get_hexagons_by_offset_range(2, 4, 3, 5),
+                         list(grid.iter_hexagons_by_offset_range(2, 4, 3, 5)))
+
+    def test_iter_range_stops_early(self):
+        grid = self.create_rect_grid(10, 10)
+        hexagons = grid.iter_hexagons_by_cube_range(CubeCoordinate(0, 0), CubeCoordinate(1000000, 1000000))
+        self.assertEqual(CubeCoordinate(0, 0), next(hexagons).get_coords())
+
     def test_valid_contains(self):
         grid = self.create_rect_grid(10, 10)
         self.assertTrue(grid.contains_coord(CubeCoordinate(2, 3)))
@@ -169,6 +194,43 @@ class TestHexagonGridImpl(unittest.TestCase):
         grid = self.create_rect_grid(10, 10)
         self.assertIsNone(grid.get_hex_by_pixel_coord(-50, 122))
 
+    def test_retrieve_by_exact_pixel(self):
+        grid = self.create_rect_grid(10, 10)
+
+        for coord_x, coord_y in [(310.0, 255.0), (300.0, 275.0), (325.0, 275.0)]:
+            hexagon = grid.get_hex_by_pixel_coord_exact(coord_x, coord_y)
+            self.assertIsNotNone(hexagon)
+            self.assertEqual(3, hexagon.get_coords().gridX)
+            self.assertEqual(5, hexagon.get_coords().gridZ)
+
+        self.assertIsNone(grid.get_hex_by_pixel_coord_exact(-50, 122))
+
+    def test_exact_pixel_matches_nearest_center(self):
+        for orientation in [CubeCoordinate.POINTY_TOP, CubeCoordinate.FLAT_TOP]:
+            grid = self.create_rect_grid(10, 10, orientation)
+            hexagons = list(grid.storage.cube_hex_data.values())
+            for pixel_x in range(0, 400, 7):
+                for pixel_y in range(0, 400, 7):
+                    pixel = Point(pixel_x, pixel_y)
+                    nearest = min(hexagons, key=lambda hexagon: pixel.distance_from(hexagon.center))
+                    picked = grid.get_hex_by_pixel_coord_exact(pixel_x, pixel_y)
+                    if picked is not None or pixel.distance_from(nearest.center) < grid.grid_data.innerRadius:
+                        self.assertEqual(nearest, picked)
+
+    @unittest.skipUnless(has_numpy(), "requires NumPy")
+    def test_pixel_arrays_match_exact_pixel(self):
+        rng = random.Random(7)
+        for orientation in [CubeCoordinate.POINTY_TOP, CubeCoordinate.FLAT_TOP]:
+            grid = self.create_rect_grid(10, 10, orientation)
+            pixels_x = [rng.uniform(-100, 500) for _ in range(2000)]
+            pixels_y = [rng.uniform(-100, 500) for _ in range(2000)]
+            cube_x, cube_z, valid = grid.get_coords_by_pixel_arrays(pixels_x, pixels_y)
+
+            for index in range(len(pixels_x)):
+                expected = grid.get_coord_by_pixel_coord(pixels_x[index], pixels_y[index])
+                self.assertEqual(expected, CubeCoordinate(int(cube_x[index]), int(cube_z[index])))
+                self.assertEqual(grid.contains_coord(expected), bool(valid[index]))
+
     def test_retrieve_neighbors(self):
         grid = self.create_rect_grid(10, 10)
         hexagon = grid.get_hex_by_cube_coord(CubeCoordinate(3, 7))
@@ -188,6 +250,284 @@ class TestHexagonGridImpl(unittest.TestCase):
         self.assertTrue(HexagonImpl(grid.grid_data, CubeCoordinate(1, 0)) in neighbors)
         self.assertTrue(HexagonImpl(grid.grid_data, CubeCoordinate(0, 1)) in neighbors)
 
+    def test_interned_neighbor_coords(self):
+        grid = HexagonGridImpl(GridData(CubeCoordinate.POINTY_TOP, 30, 4, 4), DefaultHexagonDataStorage(),
+                               CubeCoordinatePool())
+        grid.storage.add_coord(CubeCoordinate(2, 1))
+        origin = CubeCoordinate(1, 1)
+        self.assertIs(grid.get_coord_by_neighbor_index(origin, 0), grid.get_coord_by_neighbor_index(origin, 0))
+        # Off-grid coordinates are not kept in the pool.
+        self.assertEqual(CubeCoordinate(0, 1), grid.get_coord_by_neighbor_index(origin, 3))
+        self.assertEqual(1, len(grid.coord_pool))
+        self.assertIsNot(self.create_rect_grid(4, 4).get_coord_by_neighbor_index(origin, 0),
+                         self.create_rect_grid(4, 4).get_coord_by_neighbor_index(origin, 0))
+
+    def test_vertex_buffer(self):
+        for orientation in [CubeCoordinate.POINTY_TOP, CubeCoordinate.FLAT_TOP]:
+            grid = self.create_rect_grid(5, 4, orientation)
+            hexagons = list(grid.storage.iter_data())
+            vertices = grid.get_vertex_buffer()
+            self.assertEqual(12 * len(hexagons), len(vertices))
+            for hex_index, hexagon in enumerate(hexagons):
+                for point_index, point in enumerate(hexagon.points):
+                    self.assertEqual(point.coordX, vertices[hex_index * 12 + point_index * 2])
+                    self.assertEqual(point.coordY, vertices[hex_index * 12 + point_index * 2 + 1])
+
+        single = grid.get_vertex_buffer([hexagons[3]])
+        self.assertEqual(12, len(single))
+        self.assertEqual(hexagons[3].points[0].coordX, memoryview(single)[0])
+
+    def test_neighbors_of_hex_off_grid(self):
+        grid = self.create_rect_grid(4, 4)
+        outside = HexagonImpl(grid.grid_data, CubeCoordinate(-1, 0))
+        self.assertListEqual([grid.get_hex_by_cube_coord(CubeCoordinate(0, 0))], grid.get_neighbors_of(outside))
+
+    def test_index_matches_storage(self):
+        for storage_type in [DefaultHexagonDataStorage, DenseHexagonDataStorage]:
+            for numpy_available in [False, True]:
+                if numpy_available and not has_numpy():
+                    continue
+                grid = self.create_rect_grid(6, 5, storage_type=storage_type)
+                with mock.patch('mixite.grid.has_numpy', return_value=numpy_available):
+                    index = grid.get_index()
+                self.assertIsInstance(index, DenseGridIndex if storage_type is DenseHexagonDataStorage else GridIndex)
+                self.assertEqual(30, len(index))
+                for slot, hexagon in enumerate(index.hexagons):
+                    packed_key = hexagon.get_coords().to_packed_key()
+                    self.assertEqual(packed_key, index.keys[slot])
+                    self.assertEqual(slot, index.slot_of_key(packed_key))
+                    for direction, offset in enumerate(HexagonGridImpl.NEIGHBOR_KEY_OFFSETS):
+                        neighbor_slot = index.neighbor_slots[6 * slot + direction]
+                        neighbor = grid.storage.get_data_for_key(packed_key + offset)
+                        if neighbor is None:
+                            self.assertEqual(GridIndex.NO_NEIGHBOR, neighbor_slot)
+                        else:
+                            self.assertIs(neighbor, index.hexagons[neighbor_slot])
+                self.assertEqual(GridIndex.NO_NEIGHBOR, index.slot_of_key(CubeCoordinate.pack(-5, 40)))
+
+    def test_neighbors_come_from_index(self):
+        for storage_type in [DefaultHexagonDataStorage, DenseHexagonDataStorage]:
+            grid = self.create_rect_grid(4, 4, storage_type=storage_type)
+            hexagon = grid.get_hex_by_cube_coord(CubeCoordinate(1, 1))
+            packed_key = hexagon.get_coords().to_packed_key()
+            expected = [grid.storage.get_data_for_key(packed_key + offset) for offset in HexagonGridImpl.NEIGHBOR_KEY_OFFSETS
+                        if grid.storage.contains_key(packed_key + offset)]
+            grid.get_index()
+            with mock.patch.object(grid.storage, 'get_data_for_key') as get_data_for_key:
+                self.assertListEqual(expected, grid.get_neighbors_of(hexagon))
+            get_data_for_key.assert_not_called()
+
+    def test_index_follows_storage_changes(self):
+        grid = self.create_rect_grid(4, 4)
+        index = grid.get_index()
+        self.assertIs(index, grid.get_index())
+        grid.storage.clear_data_for(CubeCoordinate(1, 1))
+        self.assertIsNot(index, grid.get_index())
+        self.assertEqual(15, len(grid.get_index()))
+        self.assertEqual(5, len(grid.get_neighbors_of(grid.get_hex_by_cube_coord(CubeCoordinate(1, 2)))))
+
+    def test_satellite_columns(self):
+        grid = self.create_rect_grid(4, 4)
+        wall = SatelliteData()
+        wall.isPassable = False
+        wall.movementCost = 3.0
+        first = grid.get_hex_by_cube_coord(CubeCoordinate(1, 1))
+        first.set_satellite(wall)
+
+        columns = grid.enable_satellite_columns()
+        slot = grid.get_index().slot_of_key(first.get_coords().to_packed_key())
+        self.assertEqual(0, columns.columns['isPassable'][slot])
+        self.assertEqual(3.0, columns.columns['movementCost'][slot])
+        self.assertEqual(float('inf'), columns.entry_costs[slot])
+        self.assertEqual(1, sum(columns.present))
+        self.assertFalse(first.get_satellite().isPassable)
+        self.assertIsNone(grid.get_hex_by_cube_coord(CubeCoordinate(2, 1)).get_satellite())
+
+        # Views write through, while the satellite handed to set_satellite is copied.
+        first.get_satellite().isPassable = True
+        self.assertEqual(3.0, columns.entry_costs[slot])
+        wall.isOpaque = True
+        self.assertFalse(first.get_satellite().isOpaque)
+
+        first.clear_satellite()
+        self.assertIsNone(first.get_satellite())
+        self.assertEqual(0, sum(columns.present))
+
+    def test_satellite_user_columns(self):
+        grid = self.create_rect_grid(4, 4)
+        columns = grid.enable_satellite_columns()
+        elevation = columns.add_column('elevation', 'i', 0)
+        hexagon = grid.get_hex_by_cube_coord(CubeCoordinate(2, 2))
+        satellite = SatelliteData()
+        satellite.elevation = 7
+        hexagon.set_satellite(satellite)
+        self.assertEqual(7, hexagon.get_satellite().elevation)
+        hexagon.get_satellite().elevation = 9
+        self.assertEqual(9, elevation[grid.get_index().slot_of_key(hexagon.get_coords().to_packed_key())])
+        with self.assertRaises(ValueError):
+            columns.add_column('elevation', 'i', 0)
+
+        grid.disable_satellite_columns()
+        self.assertIsNone(grid.grid_data.satellite_columns)
+        self.assertEqual(9, hexagon.get_satellite().elevation)
+        self.assertIsNone(grid.get_hex_by_cube_coord(CubeCoordinate(1, 2)).get_satellite())
+
+    def test_satellite_columns_refuse_lost_fields(self):
+        grid = self.create_rect_grid(4, 4)
+        tagged = SatelliteData()
+        tagged.owner = 3
+        hexagon = grid.get_hex_by_cube_coord(CubeCoordinate(1, 1))
+        hexagon.set_satellite(tagged)
+        with self.assertRaises(ValueError):
+            grid.enable_satellite_columns()
+        self.assertIsNone(grid.grid_data.satellite_columns)
+        self.assertIs(tagged, hexagon.get_satellite())
+
+        class Unit(SatelliteData):
+            pass
+        hexagon.clear_satellite()
+        columns = grid.enable_satellite_columns()
+        with self.assertRaises(TypeError):
+            hexagon.set_satellite(Unit())
+        with self.assertRaises(ValueError):
+            hexagon.set_satellite(tagged)
+        columns.add_column('owner', 'i', 0)
+        hexagon.set_satellite(tagged)
+        self.assertEqual(3, hexagon.get_satellite().owner)
+
+    def test_satellite_property_setter(self):
+        grid = self.create_rect_grid(4, 4)
+        hexagon = grid.get_hex_by_cube_coord(CubeCoordinate(1, 1))
+        changes = []
+        grid.grid_data.add_satellite_listener(lambda changed, old: changes.append(changed))
+        satellite = SatelliteData()
+        hexagon.satellite = satellite
+        self.assertIs(satellite, hexagon.satellite)
+        self.assertEqual([hexagon], changes)
+
+        grid.enable_satellite_columns()
+        satellite = SatelliteData()
+        satellite.movementCost = 4.0
+        hexagon.satellite = satellite
+        self.assertEqual(4.0, hexagon.satellite.movementCost)
+
+    def test_satellite_columns_follow_storage_changes(self):
+        grid = self.create_rect_grid(4, 4)
+        columns = grid.enable_satellite_columns()
+        kept = grid.get_hex_by_cube_coord(CubeCoordinate(2, 2))
+        satellite = SatelliteData()
+        satellite.movementCost = 2.0
+        kept.set_satellite(satellite)
+
+        added = HexagonImpl(grid.grid_data, CubeCoordinate(9, 9))
+        grid.storage.add_coord_with_data(added.get_coords(), added)
+        added.set_satellite(SatelliteData())
+        self.assertEqual(17, len(columns))
+        self.assertEqual(2.0, kept.get_satellite().movementCost)
+        self.assertIsNotNone(added.get_satellite())
+
+    def test_satellite_view_follows_index_rebuilds(self):
+        grid = self.create_rect_grid(4, 4)
+        grid.enable_satellite_columns()
+        hexagon = grid.get_hex_by_cube_coord(CubeCoordinate(2, 2))
+        hexagon.set_satellite(SatelliteData())
+        view = hexagon.get_satellite()
+        # Removing a hexagon rebuilds the index and moves the other hexagons to new slots.
+        grid.storage.clear_data_for(CubeCoordinate(0, 0))
+        view.isOpaque = True
+        self.assertEqual([hexagon], [other for other in grid.storage.iter_data()
+                                     if other.get_satellite() is not None and other.get_satellite().isOpaque])
+
+        grid.storage.clear_data_for(hexagon.get_coords())
+        with self.assertRaises(ValueError):
+            view.isOpaque = False
+
+    def test_satellite_view_notifies_listeners(self):
+        grid = self.create_rect_grid(4, 4)
+        grid.enable_satellite_columns()
+        hexagon = grid.get_hex_by_cube_coord(CubeCoordinate(2, 2))
+        hexagon.set_satellite(SatelliteData())
+        changes = []
+        grid.grid_data.add_satellite_listener(lambda changed, old: changes.append((changed, old.isOpaque)))
+        hexagon.get_satellite().isOpaque = True
+        self.assertEqual([(hexagon, False)], changes)
+
+    def test_chunked_storage_across_chunks(self):
+        grid_data = GridData(CubeCoordinate.POINTY_TOP, 30, 0, 0)
+
+        def generate_chunk(chunk_x: int, chunk_z: int) -> dict:
+            return {CubeCoordinate.pack(cube_x, cube_z): HexagonImpl(grid_data, CubeCoordinate(cube_x, cube_z))
+                    for cube_x in range(3 * chunk_x, 3 * chunk_x + 3) for cube_z in range(3 * chunk_z, 3 * chunk_z + 3)}
+        storage = ChunkedHexagonDataStorage(generate_chunk, chunk_size=3, max_chunks=2)
+        grid = HexagonGridImpl(grid_data, storage)
+
+        hexagons = grid.get_hexagons_by_cube_range(CubeCoordinate(-1, -1), CubeCoordinate(3, 0))
+        self.assertEqual([CubeCoordinate(cube_x, cube_z) for cube_z in range(-1, 1) for cube_x in range(-1, 4)],
+                         [hexagon.get_coords() for hexagon in hexagons])
+        self.assertGreater(storage.evictions, 0)
+
+        corner = grid.get_hex_by_cube_coord(CubeCoordinate(0, 0))
+        self.assertEqual(sorted([(1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1)]),
+                         sorted((neighbor.get_coords().gridX, neighbor.get_coords().gridZ)
+                                for neighbor in grid.get_neighbors_of(corner)))
+        self.assertLessEqual(len(storage.chunks), 2)
+
+    def test_find_path_through_unloaded_chunks(self):
+        grid_data = GridData(CubeCoordinate.POINTY_TOP, 30, 0, 0)
+
+        def generate_chunk(chunk_x: int, chunk_z: int) -> dict:
+            return {CubeCoordinate.pack(cube_x, cube_z): HexagonImpl(grid_data, CubeCoordinate(cube_x, cube_z))
+                    for cube_x in range(4 * chunk_x, 4 * chunk_x + 4) for cube_z in range(4 * chunk_z, 4 * chunk_z + 4)}
+        storage = ChunkedHexagonDataStorage(generate_chunk, chunk_size=4, max_chunks=4)
+        grid = HexagonGridImpl(grid_data, storage)
+        start = grid.get_hex_by_cube_coord(CubeCoordinate(0, 1))
+        goal = grid.get_hex_by_cube_coord(CubeCoordinate(10, 1))
+        self.assertFalse(storage.is_loaded(5, 1))
+
+        path = HexagonGridCalculator(grid).find_path(start, goal)
+        self.assertEqual([CubeCoordinate(cube_x, 1) for cube_x in range(11)], [hexagon.get_coords() for hexagon in path])
+
+    def test_subclass_with_original_methods(self):
+        wrapped = self.create_rect_grid(3, 3)
+
+        class WrappingGrid(HexagonGrid):
+            """Implements only the methods HexagonGrid started out with."""
+            def get_hexagons_by_cube_range(self, from_coord, to_coord):
+                return wrapped.get_hexagons_by_cube_range(from_coord, to_coord)
+
+            def get_hexagons_by_offset_range(self, from_x, to_x, from_y, to_y):
+                return wrapped.get_hexagons_by_offset_range(from_x, to_x, from_y, to_y)
+
+            def contains_coord(self, coord):
+                return wrapped.contains_coord(coord)
+
+            def get_hex_by_cube_coord(self, coord):
+                return wrapped.get_hex_by_cube_coord(coord)
+
+            def get_hex_by_pixel_coord(self, coord_x, coord_y):
+                return wrapped.get_hex_by_pixel_coord(coord_x, coord_y)
+
+            def get_coord_by_neighbor_index(self, coord, index):
+                return wrapped.get_coord_by_neighbor_index(coord, index)
+
+            def get_hex_by_neighbor_index(self, hexagon, index):
+                return wrapped.get_hex_by_neighbor_index(hexagon, index)
+
+            def get_neighbors_of(self, hexagon):
+                return wrapped.get_neighbors_of(hexagon)
+
+            def get_hex_by_coord_neighbor_index(self, coord, index):
+                return wrapped.get_hex_by_coord_neighbor_index(coord, index)
+
+        grid = WrappingGrid()
+        self.assertEqual(wrapped.get_hexagons_by_cube_range(CubeCoordinate(0, 0), CubeCoordinate(2, 2)),
+                         list(grid.iter_hexagons_by_cube_range(CubeCoordinate(0, 0), CubeCoordinate(2, 2))))
+        self.assertIs(wrapped.get_hex_by_cube_coord(CubeCoordinate(1, 1)),
+                      grid.get_hex_by_packed_key(CubeCoordinate.pack(1, 1)))
+        self.assertIsNone(grid.get_hex_by_packed_key(CubeCoordinate.pack(-5, 1)))
+        self.assertIsNone(grid.get_index())
+        self.assertIsNone(grid.get_row_range())
+
     def test_get_grid_data(self):
         grid = self.create_rect_grid(3, 7)
 
@@ -196,12 +536,16 @@ class TestHexagonGridImpl(unittest.TestCase):
         self.assertEqual(30, grid.grid_data.radius)
 
     @staticmethod
-    def create_rect_grid(width: int, height: int):
-        orientation = CubeCoordinate.POINTY_TOP
+    def create_rect_grid(width: int, height: int, orientation: str = CubeCoordinate.POINTY_TOP,
+                         storage_type: type = DefaultHexagonDataStorage):
         layout = RectangleGridLayoutStrategy()
         coords = layout.fetch_grid_coords(width, height, orientation)
         grid_data = GridData(orientation, 30, width, height)
-        grid: HexagonGridImpl = HexagonGridImpl(grid_data, DefaultHexagonDataStorage())
+        if storage_type is DenseHexagonDataStorage:
+            storage = DenseHexagonDataStorage.for_coords(coords)
+        else:
+            storage = storage_type()
+        grid: HexagonGridImpl = HexagonGridImpl(grid_data, storage)
         for coord in coords:
             grid.storage.add_coord_with_data(coord, HexagonImpl(grid_data, coord))
         return grid
@@ -1,5 +1,6 @@
 import unittest
 
+from mixite._optional import has_numpy
 from mixite.coord import CubeCoordinate
 from mixite.layout import RectangleGridLayoutStrategy, TriangleGridLayoutStrategy, TrapezoidGridLayoutStrategy, \
     HexagonGridLayoutStrategy, GridLayoutException
@@ -339,5 +340,55 @@ class TestHexagonGridLayoutStrategy(unittest.TestCase):
         test_invalid_params(self, strategy, invalid_pairs)
 
 
+class TestRowBounds(unittest.TestCase):
+
+    def test_row_bounds_match_coords(self):
+        cases = [(RectangleGridLayoutStrategy(), [(1, 1), (3, 4), (6, 5), (7, 2)]),
+                 (TriangleGridLayoutStrategy(), [(1, 1), (4, 4), (7, 7)]),
+                 (TrapezoidGridLayoutStrategy(), [(1, 1), (3, 4), (6, 5)]),
+                 (HexagonGridLayoutStrategy(), [(1, 1), (3, 3), (5, 5), (9, 9), (11, 11)])]
+        for strategy, sizes in cases:
+            for orientation in [CubeCoordinate.POINTY_TOP, CubeCoordinate.FLAT_TOP]:
+                for width, height in sizes:
+                    coords = strategy.fetch_grid_coords(width, height, orientation)
+                    min_z, max_z = strategy.get_row_range(width, height, orientation)
+                    self.assertEqual(min(coord.gridZ for coord in coords), min_z)
+                    self.assertEqual(max(coord.gridZ for coord in coords), max_z)
+                    for z in range(min_z - 2, max_z + 3):
+                        row_xs = sorted(coord.gridX for coord in coords if coord.gridZ == z)
+                        bounds = strategy.get_row_bounds(z, width, height, orientation)
+                        if len(row_xs) == 0:
+                            self.assertIsNone(bounds)
+                        else:
+                            self.assertEqual(list(range(bounds[0], bounds[1] + 1)), row_xs)
+
+
+class TestIterGridCoords(unittest.TestCase):
+
+    def test_iter_matches_lists(self):
+        for strategy in [RectangleGridLayoutStrategy(), TriangleGridLayoutStrategy(),
+                         TrapezoidGridLayoutStrategy(), HexagonGridLayoutStrategy()]:
+            for orientation in [CubeCoordinate.POINTY_TOP, CubeCoordinate.FLAT_TOP]:
+                self.assertEqual(strategy.fetch_grid_coords(5, 5, orientation),
+                                 list(strategy.iter_grid_coords(5, 5, orientation)))
+
+
+@unittest.skipUnless(has_numpy(), "requires NumPy")
+class TestGridCoordArrays(unittest.TestCase):
+
+    def test_arrays_match_lists(self):
+        cases = [(RectangleGridLayoutStrategy(), [(1, 1), (3, 3), (4, 7), (8, 2)]),
+                 (TriangleGridLayoutStrategy(), [(1, 1), (4, 4), (9, 9)]),
+                 (TrapezoidGridLayoutStrategy(), [(1, 1), (3, 5), (6, 2)]),
+                 (HexagonGridLayoutStrategy(), [(1, 1), (3, 3), (5, 5), (9, 9), (11, 11)])]
+        for strategy, sizes in cases:
+            for orientation in [CubeCoordinate.POINTY_TOP, CubeCoordinate.FLAT_TOP]:
+                for width, height in sizes:
+                    coords = strategy.fetch_grid_coords(width, height, orientation)
+                    cube_xs, cube_zs = strategy.fetch_grid_coord_arrays(width, height, orientation)
+                    self.assertEqual([(coord.gridX, coord.gridZ) for coord in coords],
+                                     list(zip(cube_xs.tolist(), cube_zs.tolist())))
+
+
 if __name__ == '__main__':
     unittest.main()
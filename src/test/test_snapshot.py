@@ -0,0 +1,160 @@
+import io
+import os
+import tempfile
+import unittest
+
+from mixite.builder import GridControlBuilder
+from mixite.coord import CubeCoordinate
+from mixite.grid import PendingHexagons
+from mixite.hex import HexagonImpl
+from mixite.layout import HexagonGridLayoutStrategy
+from mixite.location_metadata import SatelliteData
+from mixite.snapshot import FORMAT_VERSION, SNAPSHOT_HEADER, load_snapshot, map_snapshot, save_snapshot
+from mixite.storage import ReadOnlyDenseHexagonDataStorage
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.grid_control = GridControlBuilder().build_hexagon(CubeCoordinate.FLAT_TOP, 12.0, 9, 9)
+        self.grid = self.grid_control.hex_grid
+        for hexagon in self.grid.storage.iter_data():
+            coords = hexagon.get_coords()
+            if (coords.gridX + 2 * coords.gridZ) % 5 == 0:
+                satellite = SatelliteData()
+                satellite.isPassable = coords.gridX % 2 == 0
+                satellite.isOpaque = True
+                satellite.movementCost = 2.5
+                hexagon.set_satellite(satellite)
+
+    def round_trip(self, include_index: bool = False):
+        buffer = io.BytesIO()
+        save_snapshot(self.grid, buffer, include_index)
+        buffer.seek(0)
+        return load_snapshot(buffer)
+
+    def save_to_file(self, include_index: bool = True) -> str:
+        handle, path = tempfile.mkstemp(suffix='.snapshot')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        save_snapshot(self.grid, path, include_index)
+        return path
+
+    def assert_same_grid(self, loaded):
+        grid = loaded.hex_grid
+        for hexagon in self.grid.storage.iter_data():
+            loaded_hex = grid.get_hex_by_cube_coord(hexagon.get_coords())
+            self.assertTrue(grid.contains_coord(hexagon.get_coords()))
+            self.assertEqual(hexagon.get_coords(), loaded_hex.get_coords())
+            expected = hexagon.get_satellite()
+            actual = loaded_hex.get_satellite()
+            if expected is None:
+                self.assertIsNone(actual)
+            else:
+                self.assertEqual((expected.isPassable, expected.isOpaque, expected.movementCost),
+                                 (actual.isPassable, actual.isOpaque, actual.movementCost))
+
+        hexagons = list(self.grid.storage.iter_data())
+        expected_path = self.grid_control.calculator.find_path(hexagons[0], hexagons[-1])
+        self.assertNotEqual([], expected_path)
+        self.assertEqual([step.get_coords() for step in expected_path],
+                         [step.get_coords() for step in loaded.calculator.find_path(
+                             grid.get_hex_by_cube_coord(hexagons[0].get_coords()),
+                             grid.get_hex_by_cube_coord(hexagons[-1].get_coords()))])
+        self.assertEqual([hexagon.get_coords() for hexagon in self.grid_control.calculator.calc_field_of_view(
+                             hexagons[30], 4)],
+                         [hexagon.get_coords() for hexagon in loaded.calculator.calc_field_of_view(
+                             grid.get_hex_by_cube_coord(hexagons[30].get_coords()), 4)])
+
+    def test_round_trip(self):
+        loaded = self.round_trip()
+        grid = loaded.hex_grid
+        self.assertEqual(CubeCoordinate.FLAT_TOP, loaded.grid_data.orientation)
+        self.assertEqual(12.0, loaded.grid_data.radius)
+        self.assertEqual((9, 9), (loaded.grid_data.gridWidth, loaded.grid_data.gridHeight))
+        self.assertIsInstance(grid.layout, HexagonGridLayoutStrategy)
+        self.assertEqual(len(self.grid.get_index()), len(grid.get_index()))
+        self.assertIsInstance(grid.get_index().hexagons, PendingHexagons)
+        self.assert_same_grid(loaded)
+
+    def test_round_trip_with_index(self):
+        loaded = self.round_trip(include_index=True)
+        index = loaded.hex_grid.get_index()
+        self.assertEqual(list(self.round_trip().hex_grid.get_index().neighbor_slots), list(index.neighbor_slots))
+        self.assert_same_grid(loaded)
+
+    def test_map(self):
+        mapped = map_snapshot(self.save_to_file())
+        grid = mapped.hex_grid
+        self.assertIsInstance(grid.storage, ReadOnlyDenseHexagonDataStorage)
+        self.assertIsInstance(grid.get_index().neighbor_slots, memoryview)
+        self.assertIsInstance(grid.grid_data.satellite_columns.columns['isOpaque'], memoryview)
+        self.assert_same_grid(mapped)
+        self.assertFalse(grid.contains_coord(CubeCoordinate(-20, 0)))
+
+        hexagon = next(grid.storage.iter_data())
+        with self.assertRaises(TypeError):
+            hexagon.set_satellite(SatelliteData())
+        with self.assertRaises(TypeError):
+            grid.storage.clear_data_for(hexagon.get_coords())
+
+    def test_map_empty_grid(self):
+        for hexagon in list(self.grid.storage.iter_data()):
+            self.grid.storage.clear_data_for(hexagon.get_coords())
+        self.grid.enable_satellite_columns().add_column('elevation', 'i', 0)
+        for include_index in [False, True]:
+            self.assertEqual(0, len(self.round_trip(include_index).hex_grid.get_index()))
+        grid = map_snapshot(self.save_to_file()).hex_grid
+        self.assertEqual(0, len(grid.storage))
+        self.assertEqual(0, len(grid.get_index()))
+        self.assertIsNone(grid.get_hex_by_cube_coord(CubeCoordinate(0, 0)))
+
+    def test_map_requires_index(self):
+        with self.assertRaises(ValueError):
+            map_snapshot(self.save_to_file(include_index=False))
+
+    def test_round_trip_user_columns(self):
+        columns = self.grid.enable_satellite_columns()
+        columns.add_column('elevation', 'i', -1)
+        hexagon = self.grid.get_hex_by_cube_coord(CubeCoordinate(4, 4))
+        hexagon.set_satellite(SatelliteData())
+        hexagon.get_satellite().elevation = 40
+
+        grid = self.round_trip().hex_grid
+        self.assertEqual(40, grid.get_hex_by_cube_coord(CubeCoordinate(4, 4)).get_satellite().elevation)
+        self.assertEqual(-1, grid.grid_data.satellite_columns.defaults['elevation'])
+
+    def test_storage_changed_before_first_query(self):
+        grid = self.round_trip().hex_grid
+        grid.storage.add_coord_with_data(CubeCoordinate(0, 0), HexagonImpl(grid.grid_data, CubeCoordinate(0, 0)))
+        for hexagon in self.grid.storage.iter_data():
+            expected = hexagon.get_satellite()
+            actual = grid.get_hex_by_cube_coord(hexagon.get_coords()).get_satellite()
+            self.assertEqual(expected is None, actual is None)
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            load_snapshot(io.BytesIO(b'not a snapshot' * 20))
+        buffer = io.BytesIO()
+        save_snapshot(self.grid, buffer)
+        data = bytearray(buffer.getvalue())
+        with self.assertRaises(ValueError):
+            load_snapshot(io.BytesIO(data[:SNAPSHOT_HEADER.size + 10]))
+        data[8:10] = (FORMAT_VERSION + 1).to_bytes(2, 'little')
+        with self.assertRaises(ValueError):
+            load_snapshot(io.BytesIO(data))
+
+    def test_rejects_long_column_names(self):
+        self.grid.enable_satellite_columns().add_column('elevation_above_the_sea_in_meters', 'i', 0)
+        with self.assertRaises(ValueError):
+            save_snapshot(self.grid, io.BytesIO())
+
+    def test_rejects_huge_bounding_box(self):
+        far = CubeCoordinate(1 << 20, 1 << 20)
+        self.grid.storage.add_coord_with_data(far, HexagonImpl(self.grid.grid_data, far))
+        with self.assertRaises(ValueError):
+            save_snapshot(self.grid, io.BytesIO())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,30 +1,55 @@
+import os
+import tempfile
 import unittest
+from abc import ABC, abstractmethod
+from typing import Optional
 
+from mixite._optional import has_numpy
+from mixite.calculator import HexagonGridCalculator
+from mixite.grid import HexagonGridImpl
 from mixite.hex import GridData, HexagonImpl
 from mixite.coord import CubeCoordinate
-from mixite.storage import DefaultHexagonDataStorage
+from mixite.storage import ChunkedHexagonDataStorage, DefaultHexagonDataStorage, DenseHexagonDataStorage, \
+    HexagonDataStorage, LazyDenseHexagonDataStorage, ReadOnlyDenseHexagonDataStorage
+from mixite.sqlite_storage import SQLiteHexagonDataStorage
+from mixite.location_metadata import SatelliteData
 
 
-class TestDefaultHexagonDataStorage(unittest.TestCase):
+class HexagonDataStorageTests(ABC):
+    """Tests shared by every HexagonDataStorage implementation. Subclasses provide create_storage."""
+    grid_data = GridData(CubeCoordinate.FLAT_TOP, 1, 10, 10)
     testCoord = CubeCoordinate(4, 5)
-    testData = HexagonImpl(GridData(CubeCoordinate.FLAT_TOP, 1, 10, 10), CubeCoordinate(5, 12))
+    testData = HexagonImpl(grid_data, CubeCoordinate(5, 12))
+
+    @abstractmethod
+    def create_storage(self):
+        pass
+
+    def create_hexagon(self, cube_x: int, cube_z: int, movement_cost: Optional[float] = None) -> HexagonImpl:
+        """A hexagon on grid_data, with a satellite if movement_cost is given."""
+        hexagon = HexagonImpl(self.grid_data, CubeCoordinate(cube_x, cube_z))
+        if movement_cost is not None:
+            satellite = SatelliteData()
+            satellite.movementCost = movement_cost
+            hexagon.set_satellite(satellite)
+        return hexagon
 
     def test_add_coords(self):
-        storage = DefaultHexagonDataStorage()
+        storage = self.create_storage()
         storage.add_coord(self.testCoord)
         self.assertTrue(storage.contains(self.testCoord))
         self.assertIsNone(storage.get_data_for(self.testCoord))
 
     def test_add_coord_with_data(self):
-        storage = DefaultHexagonDataStorage()
+        storage = self.create_storage()
         storage.add_coord_with_data(self.testCoord, self.testData)
         self.assertTrue(storage.contains(self.testCoord))
         self.assertTrue(storage.has_data_for(self.testCoord))
         self.assertEqual(self.testData, storage.get_data_for(self.testCoord))
 
     def test_replace_data(self):
-        storage = DefaultHexagonDataStorage()
-        replacement_data = HexagonImpl(GridData(CubeCoordinate.FLAT_TOP, 1, 10, 10), CubeCoordinate(5, 13))
+        storage = self.create_storage()
+        replacement_data = self.create_hexagon(5, 13)
         self.assertNotEqual(replacement_data, self.testData)
         storage.add_coord(self.testCoord)
         self.assertTrue(storage.add_coord_with_data(self.testCoord, self.testData))
@@ -32,13 +57,320 @@ class TestDefaultHexagonDataStorage(unittest.TestCase):
         self.assertEqual(replacement_data, storage.get_data_for(self.testCoord))
 
     def test_get_nonexistent(self):
-        storage = DefaultHexagonDataStorage()
+        storage = self.create_storage()
         self.assertIsNone(storage.get_data_for(self.testCoord))
 
     def test_not_containing(self):
-        storage = DefaultHexagonDataStorage()
+        storage = self.create_storage()
         self.assertFalse(storage.contains(self.testCoord))
 
+    def test_clear_data(self):
+        storage = self.create_storage()
+        storage.add_coord_with_data(self.testCoord, self.testData)
+        self.assertTrue(storage.clear_data_for(self.testCoord))
+        self.assertTrue(storage.contains(self.testCoord))
+        self.assertFalse(storage.has_data_for(self.testCoord))
+
+    def test_clear_data_of_missing_coordinate(self):
+        storage = self.create_storage()
+        self.assertFalse(storage.clear_data_for(self.testCoord))
+        self.assertTrue(storage.contains(self.testCoord))
+        self.assertFalse(storage.has_data_for(self.testCoord))
+        self.assertEqual(1, len(storage))
+        self.assertTrue(storage.clear_data_for(self.testCoord))
+
+    def test_len(self):
+        storage = self.create_storage()
+        storage.add_coord(self.testCoord)
+        storage.add_coord_with_data(self.testCoord, self.testData)
+        storage.add_coord(CubeCoordinate(-2, 3))
+        self.assertEqual(2, len(storage))
+
+    def test_iterate(self):
+        storage = self.create_storage()
+        storage.add_coord_with_data(self.testCoord, self.testData)
+        storage.add_coord(CubeCoordinate(-2, 3))
+        self.assertEqual(sorted([self.testCoord.to_packed_key(), CubeCoordinate.pack(-2, 3)]),
+                         sorted(storage.iter_keys()))
+        self.assertEqual([self.testData], list(storage.iter_data()))
+
+    def test_packed_key_lookup(self):
+        storage = self.create_storage()
+        storage.add_coord_with_data(self.testCoord, self.testData)
+        self.assertTrue(storage.contains_key(self.testCoord.to_packed_key()))
+        self.assertEqual(self.testData, storage.get_data_for_key(CubeCoordinate.pack(4, 5)))
+        self.assertFalse(storage.contains_key(CubeCoordinate.pack(5, 4)))
+        self.assertIsNone(storage.get_data_for_key(CubeCoordinate.pack(5, 4)))
+
+    def test_get_for_coords(self):
+        storage = self.create_storage()
+        storage.add_coord(self.testCoord)
+        self.assertEqual(self.testCoord, storage.get_for_coords(4, 5))
+        self.assertIsNone(storage.get_for_coords(5, 4))
+
+    @unittest.skipUnless(has_numpy(), "requires NumPy")
+    def test_add_coord_arrays(self):
+        import numpy
+        storage = self.create_storage()
+        storage.add_coord(self.testCoord)
+        storage.add_coord_arrays_with_data(numpy.array([4, -2]), numpy.array([5, 3]), [self.testData, None])
+        self.assertEqual(2, len(storage))
+        self.assertEqual(self.testData, storage.get_data_for(self.testCoord))
+        self.assertTrue(storage.contains(CubeCoordinate(-2, 3)))
+        self.assertFalse(storage.has_data_for(CubeCoordinate(-2, 3)))
+
+    @unittest.skipUnless(has_numpy(), "requires NumPy")
+    def test_contains_key_array(self):
+        import numpy
+        storage = self.create_storage()
+        storage.add_coord(self.testCoord)
+        storage.add_coord(CubeCoordinate(-2, 3))
+        keys = numpy.array([CubeCoordinate.pack(4, 5), CubeCoordinate.pack(5, 4), CubeCoordinate.pack(-2, 3),
+                            CubeCoordinate.pack(4, 5), CubeCoordinate.pack(500, -500)], dtype=numpy.int64)
+        self.assertEqual([True, False, True, True, False], storage.contains_key_array(keys).tolist())
+
+
+class TestHexagonDataStorage(unittest.TestCase):
+
+    def test_storage_with_original_methods(self):
+        class DictStorage(HexagonDataStorage):
+            """Implements only the methods HexagonDataStorage started out with."""
+            def __init__(self):
+                self.data = {}
+
+            def add_coord(self, cube_coordinate):
+                self.data[cube_coordinate] = None
+
+            def add_coord_with_data(self, cube_coordinate, hexagon):
+                has_previous = cube_coordinate in self.data
+                self.data[cube_coordinate] = hexagon
+                return has_previous
+
+            def get_data_for(self, cube_coordinate):
+                return self.data.get(cube_coordinate)
+
+            def contains(self, cube_coordinate):
+                return cube_coordinate in self.data
+
+            def has_data_for(self, cube_coordinate):
+                return self.data.get(cube_coordinate) is not None
+
+            def clear_data_for(self, cube_coordinate):
+                return self.data.pop(cube_coordinate, None) is not None
+
+            def get_for_coords(self, cube_x, cube_z):
+                return CubeCoordinate(cube_x, cube_z) if CubeCoordinate(cube_x, cube_z) in self.data else None
+
+        storage = DictStorage()
+        storage.add_coord(CubeCoordinate(1, 2))
+        self.assertTrue(storage.contains_key(CubeCoordinate.pack(1, 2)))
+        with self.assertRaises(TypeError):
+            list(storage.iter_keys())
+        with self.assertRaises(TypeError):
+            list(storage.iter_data())
+
+
+class TestDefaultHexagonDataStorage(HexagonDataStorageTests, unittest.TestCase):
+
+    def create_storage(self):
+        return DefaultHexagonDataStorage()
+
+
+class TestDenseHexagonDataStorage(HexagonDataStorageTests, unittest.TestCase):
+
+    def create_storage(self):
+        return DenseHexagonDataStorage(-10, -10, 20, 20)
+
+    def test_for_coords_bounds(self):
+        storage = DenseHexagonDataStorage.for_coords([CubeCoordinate(-1, 2), CubeCoordinate(3, 0)])
+        self.assertEqual(0, len(storage))
+        self.assertEqual(0, storage.slot_of(-1, 0))
+        self.assertEqual(14, storage.slot_of(3, 2))
+        self.assertEqual(-1, storage.slot_of(4, 2))
+        self.assertEqual(-1, storage.slot_of(-1, 3))
+
+    def test_outside_bounds(self):
+        storage = DenseHexagonDataStorage(0, 0, 3, 3)
+        with self.assertRaises(ValueError):
+            storage.add_coord(CubeCoordinate(4, 0))
+        self.assertFalse(storage.contains(CubeCoordinate(-1, 0)))
+        self.assertIsNone(storage.get_data_for(CubeCoordinate(0, 4)))
+        self.assertFalse(storage.clear_data_for(CubeCoordinate(0, 4)))
+
+
+class TestLazyDenseHexagonDataStorage(HexagonDataStorageTests, unittest.TestCase):
+
+    def create_storage(self):
+        return LazyDenseHexagonDataStorage(-10, -10, 20, 20, self.create_hexagon)
+
+    def test_pending_hexagons(self):
+        storage = LazyDenseHexagonDataStorage(0, 0, 2, 2, self.create_hexagon)
+        occupied = bytearray(9)
+        occupied[4] = occupied[5] = 1
+        storage.add_pending_slots(occupied)
+        self.assertEqual(2, len(storage))
+        self.assertTrue(storage.has_data_for(CubeCoordinate(1, 1)))
+        self.assertEqual([None] * 9, storage.slots)
+
+        hexagon = storage.get_data_for(CubeCoordinate(1, 1))
+        self.assertEqual(CubeCoordinate(1, 1), hexagon.get_coords())
+        self.assertIs(hexagon, storage.get_data_for_key(CubeCoordinate(1, 1).to_packed_key()))
+        self.assertEqual(1, storage.pending.count(1))
+
+        self.assertTrue(storage.clear_data_for(CubeCoordinate(2, 1)))
+        self.assertFalse(storage.has_data_for(CubeCoordinate(2, 1)))
+        self.assertEqual([hexagon], list(storage.iter_data()))
+        with self.assertRaises(ValueError):
+            storage.add_pending_slots(bytearray(4))
+
+
+class TestSQLiteHexagonDataStorage(HexagonDataStorageTests, unittest.TestCase):
+
+    def create_storage(self):
+        # A tiny cache and batch, so the shared tests go through eviction and flushing.
+        storage = SQLiteHexagonDataStorage(':memory:', self.grid_data, cache_pages=1, page_bits=2, batch_size=2)
+        self.addCleanup(storage.connection.close)
+        return storage
+
+    def test_range_reads(self):
+        storage = self.create_storage()
+        for cube_x in range(4):
+            for cube_z in range(4):
+                storage.add_coord_with_data(CubeCoordinate(cube_x, cube_z), self.create_hexagon(cube_x, cube_z, 1.0))
+        storage.add_coord(CubeCoordinate(2, 2))
+        found = list(storage.iter_data_by_cube_range(CubeCoordinate(1, 1), CubeCoordinate(2, 2)))
+        self.assertEqual([CubeCoordinate(1, 1), CubeCoordinate(2, 1), CubeCoordinate(1, 2)],
+                         [hexagon.get_coords() for hexagon in found[:3]])
+        self.assertIsNone(found[3])
+
+    def test_changed_satellites_are_written_back(self):
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        storage = SQLiteHexagonDataStorage(path, self.grid_data, cache_pages=2, page_bits=2)
+        for cube_z in range(16):
+            storage.add_coord_with_data(CubeCoordinate(0, cube_z), self.create_hexagon(0, cube_z, 1.0))
+        storage.get_data_for(CubeCoordinate(0, 0)).get_satellite().movementCost = 4.0
+        storage.get_data_for(CubeCoordinate(0, 15)).get_satellite().movementCost = 5.0
+        self.assertGreater(storage.evictions, 0)
+        self.assertGreater(storage.misses, 0)
+        storage.close()
+
+        reopened = SQLiteHexagonDataStorage(path, self.grid_data)
+        self.assertEqual(16, len(reopened))
+        self.assertEqual(4.0, reopened.get_data_for(CubeCoordinate(0, 0)).get_satellite().movementCost)
+        self.assertEqual(5.0, reopened.get_data_for(CubeCoordinate(0, 15)).get_satellite().movementCost)
+        self.assertEqual(1.0, reopened.get_data_for(CubeCoordinate(0, 7)).get_satellite().movementCost)
+        reopened.close()
+
+
+    def test_hexagons_from_searches_are_written_back(self):
+        storage = SQLiteHexagonDataStorage(':memory:', self.grid_data, cache_pages=2, page_bits=2)
+        self.addCleanup(storage.connection.close)
+        for cube_x in range(8):
+            for cube_z in range(8):
+                storage.add_coord_with_data(CubeCoordinate(cube_x, cube_z), self.create_hexagon(cube_x, cube_z, 1.0))
+        storage.flush()
+        grid = HexagonGridImpl(self.grid_data, storage)
+        self.assertIsNone(grid.get_index())
+        path = HexagonGridCalculator(grid).find_path(grid.get_hex_by_cube_coord(CubeCoordinate(0, 0)),
+                                                     grid.get_hex_by_cube_coord(CubeCoordinate(7, 7)))
+        self.assertEqual(15, len(path))
+
+        satellite = SatelliteData()
+        satellite.movementCost = 3.0
+        path[1].set_satellite(satellite)
+        self.assertIs(path[1], storage.get_data_for(path[1].get_coords()))
+        storage.clear_cache()
+        storage.flush()
+        data, = storage.connection.execute("SELECT data FROM hexagons WHERE key = ?",
+                                           (path[1].get_coords().to_packed_key(),)).fetchone()
+        self.assertEqual(3.0, storage.decode_hexagon(data).get_satellite().movementCost)
+
+
+class TestChunkedHexagonDataStorage(HexagonDataStorageTests, unittest.TestCase):
+
+    def create_storage(self):
+        # Evicted chunks are kept here, so the shared tests survive eviction.
+        saved: dict[tuple[int, int], dict] = {}
+
+        def unload(chunk_x: int, chunk_z: int, cells: dict):
+            saved[(chunk_x, chunk_z)] = cells
+        return ChunkedHexagonDataStorage(lambda chunk_x, chunk_z: saved.pop((chunk_x, chunk_z), {}), chunk_size=4,
+                                         max_chunks=2, unloader=unload)
+
+    def generate_chunk(self, chunk_x: int, chunk_z: int) -> dict:
+        return {CubeCoordinate.pack(cube_x, cube_z): self.create_hexagon(cube_x, cube_z)
+                for cube_x in range(4 * chunk_x, 4 * chunk_x + 4) for cube_z in range(4 * chunk_z, 4 * chunk_z + 4)}
+
+    def test_loads_and_evicts_chunks(self):
+        unloaded = []
+        storage = ChunkedHexagonDataStorage(self.generate_chunk, chunk_size=4, max_chunks=2,
+                                            unloader=lambda chunk_x, chunk_z, _: unloaded.append((chunk_x, chunk_z)))
+        self.assertFalse(storage.is_loaded(-1, -1))
+        self.assertEqual(CubeCoordinate(-1, -1), storage.get_data_for(CubeCoordinate(-1, -1)).get_coords())
+        self.assertTrue(storage.is_loaded(-4, -4))
+        self.assertTrue(storage.contains(CubeCoordinate(-2, -3)))
+        storage.get_data_for(CubeCoordinate(0, 0))
+        storage.get_data_for(CubeCoordinate(4, 0))
+        self.assertEqual([(-1, -1)], unloaded)
+        self.assertEqual((1, 3, 1), (storage.hits, storage.misses, storage.evictions))
+        self.assertEqual(32, len(storage))
+
+        found = list(storage.iter_data_by_cube_range(CubeCoordinate(2, 1), CubeCoordinate(5, 1)))
+        self.assertEqual([CubeCoordinate(cube_x, 1) for cube_x in range(2, 6)],
+                         [hexagon.get_coords() for hexagon in found])
+        storage.unload_all()
+        self.assertEqual(0, len(storage))
+        self.assertEqual(3, storage.evictions)
+
+
+    def test_evicts_by_cell_budget(self):
+        # Chunks with x >= 0 are full, the others hold a single coordinate.
+        def generate_chunk(chunk_x: int, chunk_z: int) -> dict:
+            cells = self.generate_chunk(chunk_x, chunk_z)
+            return cells if chunk_x >= 0 else dict([next(iter(cells.items()))])
+        storage = ChunkedHexagonDataStorage(generate_chunk, chunk_size=4, max_chunks=100, max_cells=20)
+        for cube_x in [0, -4, -8]:
+            storage.get_data_for(CubeCoordinate(cube_x, 0))
+        self.assertEqual((18, 0), (len(storage), storage.evictions))
+        storage.get_data_for(CubeCoordinate(4, 0))
+        self.assertEqual((18, 1), (len(storage), storage.evictions))
+        self.assertFalse(storage.is_loaded(0, 0))
+
+        storage.add_coord(CubeCoordinate(-7, 1))
+        storage.add_coord(CubeCoordinate(-6, 1))
+        storage.add_coord(CubeCoordinate(-5, 1))
+        self.assertEqual((20, 2), (len(storage), storage.evictions))
+        self.assertFalse(storage.is_loaded(-4, 0))
+        self.assertTrue(storage.is_loaded(-8, 0))
+
+
+class TestReadOnlyDenseHexagonDataStorage(unittest.TestCase):
+    grid_data = GridData(CubeCoordinate.FLAT_TOP, 1, 10, 10)
+
+    def test_reads(self):
+        storage = ReadOnlyDenseHexagonDataStorage(
+            0, 0, 2, 2, memoryview(bytes([0, 0, 0, 0, 1, 1, 0, 0, 0])),
+            lambda cube_x, cube_z: HexagonImpl(self.grid_data, CubeCoordinate(cube_x, cube_z)))
+        self.assertEqual(2, len(storage))
+        self.assertTrue(storage.contains(CubeCoordinate(2, 1)))
+        self.assertFalse(storage.has_data_for(CubeCoordinate(0, 0)))
+        hexagon = storage.get_data_for(CubeCoordinate(1, 1))
+        self.assertEqual(CubeCoordinate(1, 1), hexagon.get_coords())
+        self.assertIs(hexagon, storage.get_data_for_key(CubeCoordinate(1, 1).to_packed_key()))
+        self.assertEqual([CubeCoordinate(1, 1), CubeCoordinate(2, 1)],
+                         [data.get_coords() for data in storage.iter_data()])
+
+    def test_writes_fail(self):
+        storage = ReadOnlyDenseHexagonDataStorage(0, 0, 1, 1, bytes(4), lambda cube_x, cube_z: None)
+        with self.assertRaises(TypeError):
+            storage.add_coord(CubeCoordinate(0, 0))
+        with self.assertRaises(TypeError):
+            storage.clear_data_for(CubeCoordinate(0, 0))
+        with self.assertRaises(ValueError):
+            ReadOnlyDenseHexagonDataStorage(0, 0, 1, 1, bytes(3), lambda cube_x, cube_z: None)
+
 
 if __name__ == '__main__':
     unittest.main()